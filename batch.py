@@ -0,0 +1,182 @@
+"""
+Balance many redox reactions in parallel.
+
+The reactions are balanced in a pool of worker processes. Every worker
+imports SymPy when it starts, so no item pays for the import.
+Results are returned in input order and an item that fails to balance does
+not abort the batch; the error is stored on its BatchResult instead.
+
+Example:
+
+    from batch import balance_many
+
+    results = balance_many([
+        ("FeLp2 + MnO4Ln1 -> FeLp3 + MnLp2", "a"),
+        ("Cu + NO3Ln1 -> CuLp2 + NO", "a"),
+    ])
+"""
+
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import os
+
+import redox_reaction
+from redox_reaction import RedoxReaction
+
+# result is a BalancedReaction, or None when error describes why the
+# reaction could not be balanced
+BatchResult = namedtuple("BatchResult", ["equation", "ph", "result", "error"])
+
+
+def warm_worker():
+    """
+    It imports SymPy in a new worker process
+    """
+    redox_reaction._sympy()
+
+
+def balance_one(equation, ph, solver="fraction", engine="oxidation"):
+    """
+    It balances a single reaction and catches any error it raises
+
+    :param equation: The unbalanced equation
+    :param ph: The pH of the solution ("a", "b" or "n")
+    :param solver: The solver passed to RedoxReaction
+    :param engine: The engine passed to balance_coefficients()
+    :return: A BatchResult
+    """
+    try:
+        result = RedoxReaction(equation, ph, solver).balance_coefficients(
+            engine
+        )
+    except Exception as e:
+        return BatchResult(equation, ph, None, f"{type(e).__name__}: {e}")
+
+    return BatchResult(equation, ph, result, None)
+
+
+def balance_chunk(chunk, solver, engine):
+    """
+    It balances a chunk of reactions in a worker process
+
+    :param chunk: A list of (equation, ph) pairs
+    :param solver: The solver passed to RedoxReaction
+    :param engine: The engine passed to balance_coefficients()
+    :return: A list of BatchResults in the same order as the chunk
+    """
+    return [
+        balance_one(equation, ph, solver, engine) for equation, ph in chunk
+    ]
+
+
+class BatchBalancer:
+    """
+    A warm pool of worker processes that balances reactions in chunks.
+    """
+
+    def __init__(self, workers=None, chunksize=64, solver="fraction",
+                 engine="oxidation"):
+        """
+        It starts the worker processes and waits until every worker has
+        imported SymPy
+
+        :param workers: The number of worker processes, defaults to the
+        number of CPUs
+        :param chunksize: The number of reactions sent to a worker at a time
+        :param solver: The solver passed to RedoxReaction
+        :param engine: The engine passed to balance_coefficients()
+        """
+        if chunksize < 1:
+            raise ValueError("chunksize must be at least 1")
+
+        self.workers = workers or os.cpu_count() or 1
+        self.chunksize = chunksize
+        self.solver = solver
+        self.engine = engine
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=warm_worker
+        )
+
+        # submitting one task per worker makes the pool start all of them
+        warm_up = [
+            self._executor.submit(balance_chunk, [], solver, engine)
+            for _ in range(self.workers)
+        ]
+        for future in warm_up:
+            future.result()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        It shuts the worker processes down
+        """
+        self._executor.shutdown()
+
+    def imap(self, items):
+        """
+        It balances the reactions and yields the results in input order.
+
+        The items are read lazily and at most two chunks per worker are in
+        flight at a time, so memory stays flat for arbitrarily long inputs.
+
+        :param items: An iterable of (equation, ph) pairs
+        :return: An iterator of BatchResults
+        """
+        items = iter(items)
+        in_flight = deque()
+
+        def submit_next():
+            chunk = list(islice(items, self.chunksize))
+            if chunk:
+                in_flight.append(
+                    self._executor.submit(
+                        balance_chunk,
+                        chunk,
+                        self.solver,
+                        self.engine
+                    )
+                )
+
+            return bool(chunk)
+
+        for _ in range(2 * self.workers):
+            if not submit_next():
+                break
+
+        while in_flight:
+            results = in_flight.popleft().result()
+            submit_next()
+
+            yield from results
+
+    def balance(self, items):
+        """
+        :param items: An iterable of (equation, ph) pairs
+        :return: A list of BatchResults in input order
+        """
+        return list(self.imap(items))
+
+
+def balance_many(items, workers=None, chunksize=64, solver="fraction",
+                 engine="oxidation"):
+    """
+    It balances the reactions in a new pool of worker processes
+
+    :param items: An iterable of (equation, ph) pairs
+    :param workers: The number of worker processes, defaults to the
+    number of CPUs
+    :param chunksize: The number of reactions sent to a worker at a time
+    :param solver: The solver passed to RedoxReaction
+    :param engine: The engine passed to balance_coefficients()
+    :return: A list of BatchResults in input order
+    """
+    with BatchBalancer(workers, chunksize, solver, engine) as balancer:
+        return balancer.balance(items)
@@ -0,0 +1,489 @@
+"""
+Benchmark the balancer on the reference corpus and gate regressions.
+
+The corpus in benchmarks/corpus.jsonl holds redox reactions in acid, base
+and neutral solution together with their balanced answer, checked by hand,
+and the engines known to reject them. "answer" is null for a reaction that
+cannot be balanced as written. The script checks that every answer and
+every result conserves each element and the charge, compares every result
+with the answer and then measures:
+
+- the latency of each stage of the "oxidation" engine: parsing, assigning
+  oxidation numbers, balancing the oxidation numbers, balancing the charge,
+  balancing the water and formatting the LaTeX,
+- the p50/p99 latency of RedoxReaction(equation, ph).balance(),
+- the throughput of batch.balance_many() and, if NumPy is installed,
+  vectorized.balance_vectorized().
+
+The measurements are written as JSON (benchmarks/results.json by default).
+When --baseline points to an earlier results file, every metric that got
+worse by more than --threshold is reported and the script exits with 1.
+
+Run from the project directory with `python benchmarks/bench.py`.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import balance_many  # noqa: E402
+from compound import Compound  # noqa: E402
+from redox_reaction import (  # noqa: E402
+    ALGORITHM_VERSION, ENGINES, BalancedReaction, ParsedReaction,
+    RedoxReaction
+)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS = os.path.join(HERE, "corpus.jsonl")
+RESULTS = os.path.join(HERE, "results.json")
+
+RESULTS_VERSION = 1
+
+# The stages of the "oxidation" engine. Every stage method calls the one
+# before it, so a stage is timed as the difference to the previous stage.
+STAGES = ("assign", "oxidation", "charge", "water")
+
+
+def load_corpus(path=CORPUS):
+    """
+    :param path: The path of a JSON Lines corpus
+    :return: A list of dictionaries with "equation", "ph", "answer" and
+    "rejected_by"
+    """
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def signed_coefficients(reactants, products):
+    """
+    :param reactants: (formula, coefficient) pairs
+    :param products: (formula, coefficient) pairs
+    :return: A dictionary of the coefficient of every species, negative for
+    the reactants, so the order of the species does not matter
+    """
+    coefficients = Counter()
+    for side, sign in ((reactants, -1), (products, 1)):
+        for formula, coefficient in side:
+            coefficients[formula] += sign * coefficient
+
+    return {
+        formula: coefficient
+        for formula, coefficient in coefficients.items() if coefficient
+    }
+
+
+def parse_answer(text):
+    """
+    :param text: A balanced reaction like "Mg + 2 HLp1 -> MgLp2 + H2"
+    :return: The signed coefficients of the reaction, see
+    signed_coefficients()
+    """
+    sides = []
+    for side in text.split(" -> "):
+        species = []
+        for term in side.split(" + "):
+            coefficient, _, formula = term.rpartition(" ")
+            species.append((formula, int(coefficient or 1)))
+        sides.append(species)
+
+    return signed_coefficients(*sides)
+
+
+def answer_text(coefficients):
+    """
+    :param coefficients: The signed coefficients of a reaction, see
+    signed_coefficients()
+    :return: The reaction in the notation of the corpus answers
+    """
+    return BalancedReaction(
+        tuple((f, -c) for f, c in coefficients.items() if c < 0),
+        tuple((f, c) for f, c in coefficients.items() if c > 0)
+    ).to_text()
+
+
+def imbalance(coefficients):
+    """
+    :param coefficients: The signed coefficients of a reaction, see
+    signed_coefficients()
+    :return: A dictionary of every element and "charge" that is not
+    conserved, with the excess on the products
+    """
+    totals = Counter()
+    for formula, coefficient in coefficients.items():
+        compound = Compound.from_formula(formula)
+        for element, count in zip(compound.elements, compound.counts):
+            totals[element] += coefficient * count
+        totals["charge"] += coefficient * compound.charge
+
+    return {key: total for key, total in totals.items() if total}
+
+
+def engine_result(equation, ph, engine):
+    """
+    :return: The signed coefficients of the balanced reaction, see
+    signed_coefficients(), or the exception the engine raises
+    """
+    try:
+        balanced = RedoxReaction(equation, ph).balance_coefficients(engine)
+    except Exception as e:
+        return e
+
+    return signed_coefficients(balanced.reactants, balanced.products)
+
+
+def update_corpus(corpus, path=CORPUS):
+    """
+    It fills in the answer of the entries that have none yet from the
+    results of the engines, if they conserve every element and the charge
+    and agree with each other. The answers already in the corpus are kept,
+    and every new one is printed to be checked by hand.
+
+    :return: The number of entries that were filled in
+    """
+    filled = 0
+    for entry in corpus:
+        if "answer" in entry:
+            continue
+
+        results = {
+            engine: engine_result(entry["equation"], entry["ph"], engine)
+            for engine in ENGINES
+        }
+        answers = [
+            result for result in results.values()
+            if isinstance(result, dict) and not imbalance(result)
+        ]
+        if not answers or any(answer != answers[0] for answer in answers):
+            print(f"NO ANSWER {entry['ph']} {entry['equation']}")
+            continue
+
+        entry["answer"] = answer_text(answers[0])
+        entry["rejected_by"] = [
+            engine for engine, result in results.items()
+            if not isinstance(result, dict)
+        ]
+        filled += 1
+        print(f"CHECK {entry['ph']} {entry['answer']}")
+
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in corpus:
+            f.write(json.dumps(entry) + "\n")
+
+    return filled
+
+
+def check_corpus(corpus):
+    """
+    :return: A list of (equation, ph, engine, expected, actual) for every
+    answer or result that does not conserve every element and the charge
+    and every result that differs from the answer
+    """
+    failures = []
+    for entry in corpus:
+        equation, ph = entry["equation"], entry["ph"]
+        answer = entry.get("answer")
+        expected = "no answer" if answer is None else answer
+
+        if answer is not None:
+            answer = parse_answer(answer)
+            if imbalance(answer):
+                failures.append((
+                    equation, ph, "corpus", expected,
+                    f"not conserved: {imbalance(answer)}"
+                ))
+                continue
+
+        rejected_by = entry.get("rejected_by", [])
+        for engine in ENGINES:
+            result = engine_result(equation, ph, engine)
+
+            if not isinstance(result, dict):
+                if answer is not None and engine not in rejected_by:
+                    failures.append((
+                        equation, ph, engine, expected,
+                        f"{type(result).__name__}: {result}"
+                    ))
+            elif imbalance(result):
+                failures.append((
+                    equation, ph, engine, expected,
+                    f"not conserved: {imbalance(result)}"
+                ))
+            elif result != answer or engine in rejected_by:
+                failures.append(
+                    (equation, ph, engine, expected, answer_text(result))
+                )
+
+    return failures
+
+
+def count_unbalanced(batch_results):
+    """
+    :param batch_results: A list of BatchResults
+    :return: The number of results that do not conserve every element and
+    the charge
+    """
+    return sum(
+        1 for item in batch_results
+        if item.result is not None and imbalance(signed_coefficients(
+            item.result.reactants, item.result.products
+        ))
+    )
+
+
+def _best_of(function, repeat):
+    """
+    :return: The lowest time of a call to the function in seconds
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def measure_stages(items, repeat):
+    """
+    Every stage is timed on every reaction that the "oxidation" engine can
+    balance.
+
+    :return: A dictionary of the mean time of each stage per reaction in
+    microseconds
+    """
+    totals = dict.fromkeys(("parse",) + STAGES + ("latex",), 0.0)
+    measured = 0
+
+    for equation, ph in items:
+        reaction = RedoxReaction(equation, ph)
+        parsed = reaction._parse()
+        try:
+            result = reaction.balance_coefficients()
+        except Exception:
+            continue
+
+        measured += 1
+
+        # a new RedoxReaction per call, since a reaction remembers its
+        # oxidation numbers between calls
+        def fresh():
+            return RedoxReaction(equation, ph)
+
+        inclusive = {
+            "assign": lambda: fresh()._assign_oxidation_totals(parsed),
+            "oxidation": lambda: fresh()._balance_oxidation_numbers(
+                parsed, {}
+            ),
+            "charge": lambda: fresh()._balance_charge(parsed, {}),
+            "water": lambda: fresh()._balance_water(parsed, {}),
+        }
+
+        totals["parse"] += _best_of(
+            lambda: ParsedReaction(equation), repeat
+        )
+
+        previous = 0.0
+        for stage in STAGES:
+            seconds = _best_of(inclusive[stage], repeat)
+            totals[stage] += max(seconds - previous, 0.0)
+            previous = seconds
+
+        totals["latex"] += _best_of(
+            lambda: reaction.format_balanced_equation(result), repeat
+        )
+
+    return {
+        stage: seconds / max(measured, 1) * 1e6
+        for stage, seconds in totals.items()
+    }
+
+
+def measure_latency(items, repeat):
+    """
+    :return: The p50, p99 and mean latency of balance() in microseconds
+    """
+    samples = []
+    for _ in range(repeat):
+        for equation, ph in items:
+            start = time.perf_counter()
+            try:
+                RedoxReaction(equation, ph).balance()
+            except Exception:
+                pass
+            samples.append(time.perf_counter() - start)
+
+    percentiles = statistics.quantiles(samples, n=100)
+    return {
+        "p50": percentiles[49] * 1e6,
+        "p99": percentiles[98] * 1e6,
+        "mean": statistics.fmean(samples) * 1e6,
+    }
+
+
+def measure_throughput(items, size, workers):
+    """
+    :return: A dictionary of reactions per second for every batch mode, and
+    a dictionary of the number of results of every batch mode that do not
+    conserve every element and the charge
+    """
+    random.seed(0)
+    batch = [random.choice(items) for _ in range(size)]
+    throughput = {}
+    unbalanced = {}
+
+    start = time.perf_counter()
+    results = balance_many(batch, workers=0)
+    throughput["serial"] = size / (time.perf_counter() - start)
+    unbalanced["serial"] = count_unbalanced(results)
+
+    if workers != 0:
+        start = time.perf_counter()
+        results = balance_many(batch, workers=workers)
+        throughput["processes"] = size / (time.perf_counter() - start)
+        unbalanced["processes"] = count_unbalanced(results)
+
+    try:
+        from vectorized import balance_vectorized
+    except ImportError:
+        return throughput, unbalanced
+
+    start = time.perf_counter()
+    results = balance_vectorized(batch)
+    throughput["vectorized"] = size / (time.perf_counter() - start)
+    unbalanced["vectorized"] = count_unbalanced(results)
+
+    return throughput, unbalanced
+
+
+def compare(results, baseline, threshold):
+    """
+    :return: A list of messages, one for every metric that is more than
+    threshold worse than in the baseline
+    """
+    regressions = []
+    for name, metric in results["metrics"].items():
+        old = baseline.get("metrics", {}).get(name)
+        if old is None or old["value"] <= 0:
+            continue
+
+        ratio = metric["value"] / old["value"]
+        if metric["unit"].endswith("/s"):
+            ratio = 1 / ratio if ratio else float("inf")
+
+        if ratio > 1 + threshold:
+            regressions.append(
+                f"{name}: {old['value']:.2f} -> {metric['value']:.2f} "
+                f"{metric['unit']} ({(ratio - 1) * 100:+.1f}%)"
+            )
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--output", default=RESULTS)
+    parser.add_argument(
+        "--baseline",
+        help="an earlier results file to compare against"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="the relative slowdown reported as a regression"
+    )
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="the worker processes of the batch run, 0 runs it serially only"
+    )
+    parser.add_argument(
+        "--update-corpus",
+        action="store_true",
+        help="fill in the answers missing from the corpus from the "
+        "current results and exit; existing answers are kept"
+    )
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if args.update_corpus:
+        filled = update_corpus(corpus, args.corpus)
+        print(f"Filled in {filled} answers in {args.corpus}, check them "
+              f"by hand")
+        return 0
+
+    failures = check_corpus(corpus)
+    for equation, ph, engine, expected, actual in failures:
+        print(
+            f"MISMATCH {engine} {ph} {equation}\n"
+            f"  expected: {expected}\n  actual:   {actual}"
+        )
+
+    items = [(entry["equation"], entry["ph"]) for entry in corpus]
+
+    metrics = {}
+    for stage, value in measure_stages(items, args.repeat).items():
+        metrics[f"stage.{stage}"] = {"value": value, "unit": "us"}
+    for name, value in measure_latency(items, args.repeat).items():
+        metrics[f"balance.{name}"] = {"value": value, "unit": "us"}
+    throughput, unbalanced = measure_throughput(
+        items, args.batch_size, args.workers
+    )
+    for name, value in throughput.items():
+        metrics[f"throughput.{name}"] = {"value": value, "unit": "reactions/s"}
+
+    results = {
+        "version": RESULTS_VERSION,
+        "algorithm": ALGORITHM_VERSION,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "reactions": len(corpus),
+        "mismatches": len(failures),
+        "metrics": metrics,
+    }
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"{'metric':24} {'value':>12}")
+    for name, metric in metrics.items():
+        print(f"{name:24} {metric['value']:12.2f} {metric['unit']}")
+    print(f"\n{len(failures)} of {len(corpus)} reactions differ from the "
+          f"corpus, results written to {args.output}")
+
+    for name, count in unbalanced.items():
+        if count:
+            print(f"{count} results of the {name} batch do not conserve "
+                  f"every element and the charge")
+
+    status = 1 if failures or any(unbalanced.values()) else 0
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+        regressions = compare(results, baseline, args.threshold)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            status = 1
+        else:
+            print(f"No regressions against {args.baseline}")
+
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Compare balancing a compiled corpus with balancing the same text file.
+
+A text file with one equation per line is generated from the corpus. It is
+balanced once from text, like cli.py does, and once from the file written
+by compiled_corpus.compile_corpus(), with the results written to a text and
+to a binary results file. The compiled runs balance every distinct reaction
+once, while the text run balances every line; a second text run that
+balances every distinct line once separates the gain of the format from
+that of skipping repeated reactions. The parse caches are cleared before
+each run, as for a new process. The compiled corpus is also balanced with
+the vectorized path. The results files of every run are compared, and the
+time to compile, the time of each run and the file sizes are printed. A
+results file marked with an older ALGORITHM_VERSION must be refused.
+
+Run from the project directory with `python benchmarks/bench_compiled.py`.
+"""
+
+import argparse
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import balance_one  # noqa: E402
+from bench import load_corpus  # noqa: E402
+from cache import clear_caches  # noqa: E402
+import compiled_corpus  # noqa: E402
+from compound import Compound  # noqa: E402
+from redox_reaction import ALGORITHM_VERSION  # noqa: E402
+
+
+def cold():
+    """
+    It clears every cache of parsed formulas
+    """
+    clear_caches()
+    Compound._interned.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--reactions", type=int, default=100000)
+    parser.add_argument("--ph", choices=("a", "b", "n"), default="a")
+    args = parser.parse_args()
+
+    random.seed(0)
+    equations = sorted({entry["equation"] for entry in load_corpus()})
+
+    with tempfile.TemporaryDirectory() as directory:
+        text_path = os.path.join(directory, "equations.txt")
+        compiled_path = os.path.join(directory, "equations.rdxc")
+        text_results = os.path.join(directory, "results.txt")
+        binary_results = os.path.join(directory, "results.rdxr")
+
+        with open(text_path, "w", encoding="utf-8") as f:
+            for _ in range(args.reactions):
+                f.write(random.choice(equations) + "\n")
+
+        cold()
+        start = time.perf_counter()
+        with open(text_path, encoding="utf-8") as lines:
+            compiled_corpus.compile_corpus(
+                (line.strip() for line in lines), compiled_path, args.ph
+            )
+        compile_seconds = time.perf_counter() - start
+
+        text_seconds = {}
+        for deduplicate in (False, True):
+            cold()
+            start = time.perf_counter()
+            with open(text_path, encoding="utf-8") as lines, \
+                    open(text_results, "w", encoding="utf-8") as output:
+                expected = []
+                balanced = {}
+                for line in lines:
+                    result = balanced.get(line)
+                    if result is None:
+                        result = balance_one(line.strip(), args.ph)
+                        if deduplicate:
+                            balanced[line] = result
+
+                    expected.append(result)
+                    output.write(
+                        result.result.to_text() + "\n"
+                        if result.error is None
+                        else f"ERROR {result.error}\n"
+                    )
+            text_seconds[deduplicate] = time.perf_counter() - start
+
+        expected = [(result.result, result.error) for result in expected]
+
+        with compiled_corpus.CompiledCorpus(compiled_path) as corpus:
+            reactions = corpus.reactions
+
+        mismatches = 0
+        seconds = {}
+        for vectorized in (False, True):
+            cold()
+            start = time.perf_counter()
+            compiled_corpus.balance_corpus(
+                compiled_path, binary_results, vectorized=vectorized
+            )
+            seconds[vectorized] = time.perf_counter() - start
+
+            with compiled_corpus.CompiledResults(binary_results) as results:
+                mismatches += abs(len(results) - len(expected)) + sum(
+                    result != reference
+                    for result, reference in zip(results, expected)
+                )
+
+        # the algorithm version is the 4 byte field at offset 8
+        with open(binary_results, "r+b") as f:
+            f.seek(8)
+            f.write(struct.pack("<I", ALGORITHM_VERSION - 1))
+        try:
+            compiled_corpus.CompiledResults(binary_results).close()
+        except ValueError:
+            stale_refused = True
+        else:
+            stale_refused = False
+
+        compiled_seconds = seconds[False]
+        vectorized_seconds = seconds[True]
+
+        sizes = {
+            path: os.path.getsize(path) / 1e6 for path in (
+                text_path, compiled_path, text_results, binary_results
+            )
+        }
+
+    print(
+        f"{args.reactions} reactions ({reactions} distinct)"
+        f"  compile: {compile_seconds:6.2f} s"
+        f"  text: {text_seconds[False]:6.2f} s"
+        f"  compiled: {compiled_seconds:6.2f} s"
+        f"  speedup: {text_seconds[False] / compiled_seconds:5.2f}x"
+        f"  vectorized: {vectorized_seconds:6.2f} s"
+        f"  speedup: {text_seconds[False] / vectorized_seconds:5.2f}x"
+        f"  mismatches: {mismatches}"
+        f"  stale results refused: {stale_refused}"
+    )
+    print(
+        f"text balancing every distinct line once: "
+        f"{text_seconds[True]:6.2f} s"
+        f"  compiled speedup: {text_seconds[True] / compiled_seconds:5.2f}x"
+    )
+    print(
+        f"equations: {sizes[text_path]:.2f} MB text,"
+        f" {sizes[compiled_path]:.2f} MB compiled"
+        f"  results: {sizes[text_results]:.2f} MB text,"
+        f" {sizes[binary_results]:.2f} MB binary"
+    )
+
+    if mismatches or not stale_refused:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
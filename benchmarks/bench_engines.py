@@ -0,0 +1,97 @@
+"""
+Compare the "oxidation", "matrix" and "half" balancing engines.
+
+Every reaction of the corpus is balanced with every engine. The script
+prints the mean time per balance_coefficients() call, whether each result
+conserves every element and the charge, and whether the engines agree.
+
+Run from the project directory with `python benchmarks/bench_engines.py`.
+"""
+
+from collections import Counter
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from redox_reaction import ENGINES, RedoxReaction, parse_formula  # noqa: E402
+
+REACTIONS = [
+    "FeLp2 + MnO4Ln1 -> FeLp3 + MnLp2",
+    "Cr2O7Ln2 + FeLp2 -> CrLp3 + FeLp3",
+    "Cu + NO3Ln1 -> CuLp2 + NO",
+    "MnO4Ln1 + SO3Ln2 -> MnO2 + SO4Ln2",
+    "Zn + CuLp2 -> ZnLp2 + Cu",
+    "MnO4Ln1 + ClLn1 -> MnLp2 + Cl2",
+    "Ag + NO3Ln1 -> AgLp1 + NO2",
+    "SnLp2 + FeLp3 -> SnLp4 + FeLp2",
+    "MnO4Ln1 + C2O4Ln2 -> MnLp2 + CO2",
+    "BrLn1 + MnO4Ln1 -> Br2 + MnO2",
+    "Cl2 -> ClLn1 + ClO3Ln1",
+    "As2S3 + NO3Ln1 -> H3AsO4 + SO4Ln2 + NO",
+]
+
+REPEAT = 50
+
+
+def is_balanced(result):
+    """
+    :param result: A BalancedReaction
+    :return: True if every element and the charge are conserved
+    """
+    totals = Counter()
+    for side, sign in ((result.reactants, 1), (result.products, -1)):
+        for compound, coefficient in side:
+            for element, count in parse_formula(compound).items():
+                if element == "Ln":
+                    element, count = "Lp", -count
+
+                totals[element] += sign * coefficient * count
+
+    return not any(totals.values())
+
+
+def main():
+    agree = 0
+    total = 0
+
+    print(f"{'reaction':42} pH " + "".join(f"{e:>22}" for e in ENGINES))
+
+    for equation in REACTIONS:
+        for ph in "abn":
+            results = {}
+            columns = []
+
+            for engine in ENGINES:
+                try:
+                    results[engine] = RedoxReaction(
+                        equation, ph
+                    ).balance_coefficients(engine)
+                except Exception as e:
+                    columns.append(f"{type(e).__name__:>22}")
+                    continue
+
+                seconds = timeit.timeit(
+                    lambda: RedoxReaction(
+                        equation, ph
+                    ).balance_coefficients(engine),
+                    number=REPEAT
+                )
+                balanced = "ok" if is_balanced(results[engine]) else "NOT"
+                columns.append(
+                    f"{seconds / REPEAT * 1e3:10.3f} ms {balanced:>8}"
+                )
+
+            total += 1
+            if len(results) == len(ENGINES) \
+                    and len(set(results.values())) == 1:
+                agree += 1
+
+            print(f"{equation:42} {ph}  " + "".join(columns))
+
+    print(f"\nThe engines agree on {agree} of {total} reactions")
+
+
+if __name__ == "__main__":
+    main()
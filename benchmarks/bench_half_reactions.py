@@ -0,0 +1,114 @@
+"""
+Measure how much the half-reaction cache saves on a large corpus.
+
+A corpus of reactions is generated by combining every oxidation couple with
+every reduction couple below, so each half-reaction recurs in many
+reactions. The corpus is balanced with the "half" engine once with the
+half-reaction cache cleared before every reaction and once with the cache
+kept, for every pH. Every result is checked for conservation of the
+elements and the charge, and the cache statistics are printed.
+
+Run from the project directory with
+`python benchmarks/bench_half_reactions.py`.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_engines import is_balanced  # noqa: E402
+from half_reactions import balance_half_reaction  # noqa: E402
+from redox_reaction import RedoxReaction  # noqa: E402
+
+OXIDATIONS = [
+    ("FeLp2", "FeLp3"), ("Cu", "CuLp2"), ("Zn", "ZnLp2"),
+    ("SnLp2", "SnLp4"), ("SO3Ln2", "SO4Ln2"), ("C2O4Ln2", "CO2"),
+    ("ClLn1", "Cl2"), ("BrLn1", "Br2"), ("ILn1", "I2"), ("Ag", "AgLp1"),
+    ("H2O2", "O2"), ("NO2Ln1", "NO3Ln1"), ("Mg", "MgLp2"), ("Al", "AlLp3"),
+    ("S2O3Ln2", "S4O6Ln2"), ("CoLp2", "CoLp3"), ("CrLp3", "CrO4Ln2"),
+    ("As2S3", "H3AsO4 + SO4Ln2"),
+]
+
+REDUCTIONS = [
+    ("MnO4Ln1", "MnLp2"), ("MnO4Ln1", "MnO2"), ("Cr2O7Ln2", "CrLp3"),
+    ("NO3Ln1", "NO"), ("NO3Ln1", "NO2"), ("ClO3Ln1", "ClLn1"),
+    ("BrO3Ln1", "BrLn1"), ("IO3Ln1", "I2"), ("PbO2", "PbLp2"),
+    ("CeLp4", "CeLp3"), ("O2", "H2O"), ("HLp1", "H2"),
+]
+
+
+def corpus():
+    """
+    :return: A list of every combination of an oxidation and a reduction
+    couple that do not share a species
+    """
+    equations = []
+    for reduced, oxidized in OXIDATIONS:
+        for oxidant, reduct in REDUCTIONS:
+            if {reduced, oxidized} & {oxidant, reduct}:
+                continue
+
+            equations.append(f"{reduced} + {oxidant} -> {oxidized} + {reduct}")
+
+    return equations
+
+
+def run(equations, cached):
+    """
+    :return: A tuple of the seconds, the balanced reactions and the number
+    of reactions that could not be balanced
+    """
+    balance_half_reaction.cache_clear()
+
+    results = []
+    failed = 0
+
+    start = time.perf_counter()
+    for equation in equations:
+        for ph in "abn":
+            if not cached:
+                balance_half_reaction.cache_clear()
+
+            try:
+                results.append(
+                    RedoxReaction(equation, ph).balance_coefficients("half")
+                )
+            except ValueError:
+                failed += 1
+
+    return (time.perf_counter() - start, results, failed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    equations = corpus() * args.repeat
+
+    uncached, results, failed = run(equations, cached=False)
+    cached, cached_results, _ = run(equations, cached=True)
+    info = balance_half_reaction.cache_info()
+
+    unbalanced = sum(not is_balanced(result) for result in results)
+
+    print(
+        f"{len(equations) * 3} reactions ({failed} not balanced)"
+        f"  uncached: {uncached * 1e3:9.2f} ms"
+        f"  cached: {cached * 1e3:9.2f} ms"
+        f"  speedup: {uncached / cached:5.2f}x"
+    )
+    print(
+        f"half-reactions balanced: {info.misses}  reused: {info.hits}"
+        f"  unbalanced results: {unbalanced}"
+    )
+
+    if unbalanced or results != cached_results:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
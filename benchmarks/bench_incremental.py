@@ -0,0 +1,166 @@
+"""
+Check and time incremental re-balancing with RedoxReaction.update().
+
+A random sequence of edits is applied to one RedoxReaction: a new pH, one
+compound replaced by another, or a new equation from the corpus. After
+every edit the time of balance() and format_unbalanced_equation(), the work
+of the web app, is summed for the updated reaction and for a new
+RedoxReaction, per kind of edit. The two are timed in turns, so neither
+always pays for the caches of a formula seen for the first time. Then the
+results of both are compared for every engine and for the LaTeX output.
+
+Run from the project directory with `python benchmarks/bench_incremental.py`.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench import load_corpus  # noqa: E402
+from redox_reaction import ENGINES, RedoxReaction  # noqa: E402
+
+FORMULAS = [
+    "FeLp2", "FeLp3", "MnO4Ln1", "MnLp2", "MnO2", "Cr2O7Ln2", "CrLp3",
+    "SO4Ln2", "SO3Ln2", "NO3Ln1", "NO", "NO2", "CuLp2", "Cu", "Zn",
+    "ZnLp2", "ClLn1", "Cl2", "ClO3Ln1", "H2O2", "C2O4Ln2", "CO2",
+]
+
+
+def outcome(reaction):
+    """
+    :return: Everything the reaction returns, with an exception standing
+    for its type
+    """
+    results = []
+    for engine in ENGINES:
+        try:
+            results.append(reaction.balance_coefficients(engine))
+        except Exception as e:
+            results.append(type(e).__name__)
+
+    for method in (reaction.balance, reaction.format_unbalanced_equation):
+        try:
+            results.append(method())
+        except Exception as e:
+            results.append(type(e).__name__)
+
+    return results
+
+
+def render(reaction):
+    """
+    It does what main.py does on a rerun
+    """
+    try:
+        reaction.balance()
+        reaction.format_unbalanced_equation()
+    except Exception:
+        pass
+
+
+# the kinds of edit, in the order edit() draws them
+KINDS = ("pH", "compound", "equation")
+
+
+def edit(equation, ph, equations):
+    """
+    :return: The kind of a random edit of the equation and the pH, and the
+    edited equation and pH
+    """
+    choice = random.random()
+
+    if choice < 0.4:
+        return "pH", equation, random.choice([p for p in "abn" if p != ph])
+
+    if choice < 0.9:
+        reactants, products = (
+            [c.strip() for c in side.split("+")]
+            for side in equation.split("->")
+        )
+        side = random.choice((reactants, products))
+        side[random.randrange(len(side))] = random.choice(FORMULAS)
+
+        return (
+            "compound",
+            " + ".join(reactants) + " -> " + " + ".join(products),
+            ph
+        )
+
+    return "equation", random.choice(equations), ph
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--edits", type=int, default=5000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    equations = sorted({entry["equation"] for entry in load_corpus()})
+
+    equation, ph = equations[0], "a"
+    reaction = RedoxReaction(equation, ph)
+    outcome(reaction)
+
+    incremental = dict.fromkeys(KINDS, 0.0)
+    full = dict.fromkeys(KINDS, 0.0)
+    counts = dict.fromkeys(KINDS, 0)
+    mismatches = 0
+
+    for index in range(args.edits):
+        kind, equation, ph = edit(equation, ph, equations)
+        counts[kind] += 1
+
+        def update():
+            start = time.perf_counter()
+            reaction.update(equation, ph)
+            render(reaction)
+            incremental[kind] += time.perf_counter() - start
+
+        def recompute():
+            start = time.perf_counter()
+            new = RedoxReaction(equation, ph)
+            render(new)
+            full[kind] += time.perf_counter() - start
+
+            return new
+
+        if index % 2:
+            update()
+            new = recompute()
+        else:
+            new = recompute()
+            update()
+
+        updated = outcome(reaction)
+        expected = outcome(new)
+
+        if updated != expected:
+            mismatches += 1
+            print(f"MISMATCH {ph} {equation}\n  {updated}\n  {expected}")
+
+    for kind in KINDS + ("all",):
+        if kind == "all":
+            count = args.edits
+            updated, new = sum(incremental.values()), sum(full.values())
+        else:
+            count, updated, new = counts[kind], incremental[kind], full[kind]
+
+        print(
+            f"{kind:9} {count:5} edits  incremental: "
+            f"{updated / max(count, 1) * 1e6:7.1f} us"
+            f"  full: {new / max(count, 1) * 1e6:7.1f} us"
+            f"  speedup: {new / updated if updated else 0:5.2f}x"
+        )
+
+    print(f"mismatches: {mismatches}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Measure the cost of the instrumentation hooks.
+
+The corpus is balanced without a recorder, with a Metrics recorder and with
+a recorder that ignores every event, and the mean time per balance() call
+of each run is printed. The run without a recorder is the cost of the
+hooks when instrumentation is disabled.
+
+Run from the project directory with
+`python benchmarks/bench_instrumentation.py`.
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench import load_corpus  # noqa: E402
+from instrumentation import Metrics, Recorder, instrument  # noqa: E402
+from redox_reaction import RedoxReaction  # noqa: E402
+
+
+def balance_all(items):
+    for equation, ph in items:
+        RedoxReaction(equation, ph).balance()
+
+
+def measure(items, number, repeat):
+    """
+    :param items: (equation, ph) pairs the "oxidation" engine balances
+    :return: The lowest mean time of a balance() call in microseconds
+    """
+    best = min(timeit.repeat(
+        lambda: balance_all(items), number=number, repeat=repeat
+    ))
+    return best / number / len(items) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--number", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    items = [
+        (entry["equation"], entry["ph"]) for entry in load_corpus()
+        if entry["answer"] is not None
+        and "oxidation" not in entry["rejected_by"]
+    ]
+
+    disabled = measure(items, args.number, args.repeat)
+    print(f"{'disabled':10} {disabled:9.2f} us")
+
+    for name, recorder in (("ignored", Recorder()), ("metrics", Metrics())):
+        with instrument(recorder):
+            enabled = measure(items, args.number, args.repeat)
+
+        print(
+            f"{name:10} {enabled:9.2f} us "
+            f"({(enabled / disabled - 1) * 100:+.1f}%)"
+        )
+
+
+if __name__ == "__main__":
+    main()
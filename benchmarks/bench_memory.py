@@ -0,0 +1,89 @@
+"""
+Measure the memory held per parsed reaction.
+
+The corpus is parsed into two representations and the memory allocated
+for each is measured with tracemalloc:
+
+    - dicts: a fresh chemparse dictionary of floats per compound, which is
+      how the balancer stored compounds before Compound was added
+    - compounds: a ParsedReaction holding interned Compounds
+
+Run from the project directory with `python benchmarks/bench_memory.py`.
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+import chemparse as cp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from redox_reaction import ParsedReaction  # noqa: E402
+
+REACTIONS = [
+    "FeLp2 + MnO4Ln1 -> FeLp3 + MnLp2",
+    "Cr2O7Ln2 + FeLp2 -> CrLp3 + FeLp3",
+    "Cu + NO3Ln1 -> CuLp2 + NO",
+    "MnO4Ln1 + SO3Ln2 -> MnO2 + SO4Ln2",
+    "MnO4Ln1 + C2O4Ln2 -> MnLp2 + CO2",
+    "As2S3 + NO3Ln1 -> H3AsO4 + SO4Ln2 + NO",
+]
+
+
+def parse_dicts(equation):
+    """
+    :param equation: The unbalanced equation
+    :return: A list of a chemparse dictionary for every compound
+    """
+    reactants, products = equation.split("->")
+
+    return [
+        cp.parse_formula(compound.strip())
+        for side in (reactants, products)
+        for compound in side.split("+")
+    ]
+
+
+def measure(parse, equations):
+    """
+    :param parse: A function that parses one equation
+    :param equations: The equations to parse
+    :return: The number of bytes allocated per equation
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    parsed = [parse(equation) for equation in equations]
+
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del parsed
+
+    return (after - before) / len(equations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--reactions", type=int, default=10000)
+    args = parser.parse_args()
+
+    equations = [
+        REACTIONS[index % len(REACTIONS)]
+        for index in range(args.reactions)
+    ]
+
+    # warm the interned compounds so both runs only measure the reactions
+    for equation in REACTIONS:
+        ParsedReaction(equation)
+
+    for name, parse in (("dicts", parse_dicts), ("compounds", ParsedReaction)):
+        print(f"{name:10} {measure(parse, equations):10.1f} bytes/reaction")
+
+
+if __name__ == "__main__":
+    main()
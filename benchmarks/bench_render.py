@@ -0,0 +1,133 @@
+"""
+Compare the table-driven LaTeX renderer with the former nested loops.
+
+Equations with more and more compounds per side are drawn from a pool of
+formulas and rendered with render.latex_renderer, once with an empty
+fragment cache and once with a warm one, and with the loops that
+RedoxReaction.balance() used before. The outputs are checked for equality
+and the time per equation is printed.
+
+Run from the project directory with `python benchmarks/bench_render.py`.
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from redox_reaction import parse_formula  # noqa: E402
+from render import latex_renderer  # noqa: E402
+
+FORMULAS = [
+    "FeLp2", "FeLp3", "MnO4Ln1", "MnLp2", "Cr2O7Ln2", "CrLp3", "HLp1",
+    "OHLn1", "H2O", "SO4Ln2", "SO3Ln2", "NO3Ln1", "NO", "CuLp2", "Cu",
+    "As2S3", "H3AsO4", "C2O4Ln2", "CO2", "[Fe(CN)6]Ln3", "Ce(NO3)4",
+]
+
+
+def reference_side(compounds):
+    """
+    The loop of the former RedoxReaction.balance(), with the charge of the
+    anions written the same way on both sides and the subscripts braced
+    """
+    parts = []
+    for compound, coefficient in compounds:
+        if coefficient != 1:
+            parts.append(f"{coefficient}")
+
+        for element, count in parse_formula(compound).items():
+            if element == "Lp":
+                if count != 1:
+                    parts.append(fr"^{{{int(count)}+}}")
+                else:
+                    parts.append(r"^+")
+
+            elif element == "Ln":
+                if count != 1:
+                    parts.append(fr"^{{{int(count)}-}}")
+                else:
+                    parts.append(r"^-")
+
+            else:
+                parts.append(f"{element}")
+
+                if count != 1:
+                    parts.append(fr"_{{{int(count)}}}")
+
+        parts.append("+")
+
+    parts.pop()
+
+    return parts
+
+
+def reference_equation(reactants, products):
+    parts = ["$ "]
+    parts += reference_side(reactants)
+    parts.append(r" \rightarrow ")
+    parts += reference_side(products)
+    parts.append(" $")
+
+    return "".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[2, 10, 100, 1000]
+    )
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(0)
+
+    for size in args.sizes:
+        reactants, products = (
+            [
+                (random.choice(FORMULAS), random.randint(1, 12))
+                for _ in range(size)
+            ]
+            for _ in range(2)
+        )
+
+        expected = reference_equation(reactants, products)
+
+        latex_renderer.fragment.cache_clear()
+        if latex_renderer.equation(reactants, products) != expected:
+            sys.exit(f"The outputs differ for {size} compounds per side")
+
+        number = max(args.number // size, 5)
+
+        def cold():
+            latex_renderer.fragment.cache_clear()
+            latex_renderer.equation(reactants, products)
+
+        times = {
+            "loops": timeit.timeit(
+                lambda: reference_equation(reactants, products),
+                number=number
+            ),
+            "cold": timeit.timeit(cold, number=number),
+            "warm": timeit.timeit(
+                lambda: latex_renderer.equation(reactants, products),
+                number=number
+            ),
+        }
+
+        print(
+            f"{size:5} compounds per side  " + "  ".join(
+                f"{name}: {seconds / number * 1e6:9.1f} us"
+                for name, seconds in times.items()
+            )
+            + f"  speedup: {times['loops'] / times['warm']:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
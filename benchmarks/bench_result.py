@@ -0,0 +1,107 @@
+"""
+Check and time the structured ReactionResult.
+
+Every reaction of the corpus with an answer is balanced by
+balance_result() with every engine that does not reject it. The electrons
+are compared with the numbers counted by hand where there is one, and
+otherwise the engines must agree on them. The compact form is checked to
+restore an equal result, and the time per balance_result() call and the
+mean size of to_compact() are printed.
+
+Run from the project directory with `python benchmarks/bench_result.py`.
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench import load_corpus  # noqa: E402
+from reaction_result import ReactionResult  # noqa: E402
+from redox_reaction import ENGINES, RedoxReaction  # noqa: E402
+
+# the electrons of the balanced reaction, counted by hand. They do not
+# depend on the pH.
+ELECTRONS = {
+    # 5 Fe 2+ -> 5 Fe 3+, Mn +7 -> +2
+    "FeLp2 + MnO4Ln1 -> FeLp3 + MnLp2": 5,
+    # 2 Cr +6 -> +3, 6 Fe 2+ -> 6 Fe 3+
+    "Cr2O7Ln2 + FeLp2 -> CrLp3 + FeLp3": 6,
+    # 3 Cu 0 -> +2, 2 N +5 -> +2
+    "Cu + NO3Ln1 -> CuLp2 + NO": 6,
+    # 6 Cl 0 -> 5 Cl -1 and 1 Cl +5
+    "Cl2 -> ClLn1 + ClO3Ln1": 5,
+    # 6 As +3 -> +5 and 9 S -2 -> +6 give 12 + 72, 28 N +5 -> +2
+    "As2S3 + NO3Ln1 -> H3AsO4 + SO4Ln2 + NO": 84,
+    # 3 Fe +8/3 -> 0, 4 C +2 -> +4
+    "Fe3O4 + CO -> Fe + CO2": 8,
+    # 2 O -1 -> 0 and 2 O -1 -> -2
+    "H2O2 -> H2O + O2": 2,
+    # H -1 -> 0 and H +1 -> 0
+    "NaH + H2O -> NaOH + H2": 1,
+}
+
+REPEAT = 50
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--repeat", type=int, default=REPEAT,
+        help="balance_result() calls per reaction and engine"
+    )
+    args = parser.parse_args()
+
+    failures = 0
+    sizes = []
+
+    for entry in load_corpus():
+        if entry["answer"] is None:
+            continue
+
+        equation, ph = entry["equation"], entry["ph"]
+        expected = ELECTRONS.get(equation)
+
+        columns = []
+        for engine in ENGINES:
+            if engine in entry["rejected_by"]:
+                columns.append(f"{'rejected':>21}")
+                continue
+
+            result = RedoxReaction(equation, ph).balance_result(engine)
+            compact = result.to_compact()
+            sizes.append(len(compact))
+
+            if expected is None:
+                expected = result.electrons
+            if result.electrons != expected:
+                print(f"{engine} gives {result.electrons} electrons for "
+                      f"{result.to_text()}, expected {expected}")
+                failures += 1
+
+            if ReactionResult.from_compact(compact) != result:
+                print(f"{engine}: to_compact() does not restore "
+                      f"{result.to_text()}")
+                failures += 1
+
+            seconds = timeit.timeit(
+                lambda: RedoxReaction(equation, ph).balance_result(engine),
+                number=args.repeat
+            )
+            columns.append(
+                f"{seconds / args.repeat * 1e3:10.3f} ms {result.electrons:4}"
+                f" e-"
+            )
+
+        print(f"{equation:50} {ph}  " + "".join(columns))
+
+    print(f"\nto_compact() averages {sum(sizes) / len(sizes):.0f} bytes")
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Compare the "fraction" and "sympy" oxidation number solvers.
+
+Every reaction is balanced with both solvers, the results are checked for
+equality and the time per balance() call is printed. The oxidation state
+table is consulted before either solver, so it is left empty here to make
+both solvers find every oxidation number.
+
+Run from the project directory with `python benchmarks/bench_solver.py`.
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from oxidation_states import OxidationStateTable  # noqa: E402
+from redox_reaction import SOLVERS, RedoxReaction  # noqa: E402
+
+REACTIONS = [
+    ("FeLp2 + MnO4Ln1 -> FeLp3 + MnLp2", "a"),
+    ("Cu + NO3Ln1 -> CuLp2 + NO", "a"),
+    ("MnO4Ln1 + SO3Ln2 -> MnO2 + SO4Ln2", "b"),
+    ("MnO4Ln1 + ClLn1 -> MnLp2 + Cl2", "n"),
+    ("Fe3O4 + CO -> Fe + CO2", "a"),
+]
+
+REPEAT = 20
+
+
+def main():
+    table = OxidationStateTable()
+
+    for equation, ph in REACTIONS:
+        results = {
+            solver: RedoxReaction(equation, ph, solver, table).balance()
+            for solver in SOLVERS
+        }
+
+        if len(set(results.values())) != 1:
+            sys.exit(f"Solvers disagree on {equation!r}: {results}")
+
+        timings = []
+        for solver in SOLVERS:
+            seconds = timeit.timeit(
+                lambda: RedoxReaction(
+                    equation, ph, solver, table
+                ).balance(),
+                number=REPEAT
+            )
+            timings.append(f"{solver}: {seconds / REPEAT * 1e3:8.3f} ms")
+
+        print(f"{equation:40} {ph}  " + "  ".join(timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Measure the cold start cost of redox_reaction.
+
+Every run starts a fresh Python interpreter and measures the time it takes
+to `import redox_reaction` and the time to the first balance() call. The
+reaction is balanced with an empty OxidationStateTable, as the default
+table covers its species and no solver would run. The median of all runs
+is printed for each solver, together with whether SymPy ended up being
+imported, which must be the case for the "sympy" solver only.
+
+Run from the project directory with `python benchmarks/bench_startup.py`.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import redox_reaction
+imported = time.perf_counter()
+from oxidation_states import OxidationStateTable
+redox_reaction.RedoxReaction(
+    "FeLp2 + MnO4Ln1 -> FeLp3 + MnLp2", "a", {solver!r},
+    OxidationStateTable()
+).balance()
+balanced = time.perf_counter()
+print(json.dumps({{
+    "import": imported - start,
+    "first_balance": balanced - imported,
+    "sympy_loaded": "sympy" in sys.modules,
+}}))
+"""
+
+
+def measure(solver):
+    """
+    It runs the snippet in a new interpreter and returns its measurements
+
+    :param solver: The solver passed to RedoxReaction
+    :return: A dictionary of the measurements of one run
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", SNIPPET.format(solver=solver)],
+        cwd=PROJECT_DIR,
+        capture_output=True,
+        check=True,
+        text=True
+    ).stdout
+
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    failures = 0
+    for solver in ("fraction", "sympy"):
+        runs = [measure(solver) for _ in range(args.runs)]
+
+        import_ms = statistics.median(r["import"] for r in runs) * 1e3
+        balance_ms = statistics.median(r["first_balance"] for r in runs) * 1e3
+
+        print(
+            f"{solver:8}  import: {import_ms:8.2f} ms"
+            f"  first balance(): {balance_ms:8.2f} ms"
+            f"  sympy loaded: {runs[0]['sympy_loaded']}"
+        )
+
+        if any(r["sympy_loaded"] != (solver == "sympy") for r in runs):
+            print(f"FAIL the {solver} solver "
+                  f"{'did not import' if solver == 'sympy' else 'imported'}"
+                  f" SymPy")
+            failures += 1
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
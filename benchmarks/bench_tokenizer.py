@@ -0,0 +1,100 @@
+"""
+Compare formula.tokenize_formula() with chemparse.parse_formula().
+
+A large corpus of random formulas is generated in the subset of the
+notation that chemparse understands: element symbols with optional counts,
+at most one level of parentheses and an optional Lp/Ln charge. Every
+formula is parsed by both parsers and the results are checked for
+equality, ignoring the order of the elements, then both parsers are timed
+on the corpus.
+
+Run from the project directory with `python benchmarks/bench_tokenizer.py`.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import chemparse as cp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from formula import tokenize_formula  # noqa: E402
+
+ELEMENTS = [
+    "H", "C", "N", "O", "F", "Na", "Mg", "Al", "Si", "P", "S", "Cl", "K",
+    "Ca", "Cr", "Mn", "Fe", "Co", "Ni", "Cu", "Zn", "Br", "Ag", "Sn", "I",
+]
+
+
+def random_count():
+    return random.choice(["", "", str(random.randint(1, 12))])
+
+
+def random_part():
+    """
+    :return: A random element with a count
+    """
+    return random.choice(ELEMENTS) + random_count()
+
+
+def random_formula():
+    """
+    :return: A random formula
+    """
+    parts = [random_part() for _ in range(random.randint(1, 4))]
+
+    if random.random() < 0.3:
+        group = "".join(random_part() for _ in range(random.randint(1, 3)))
+        parts.append(f"({group}){random.randint(2, 4)}")
+
+    if random.random() < 0.5:
+        parts.append(random.choice(["Lp", "Ln"]) + str(random.randint(1, 4)))
+
+    return "".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--formulas", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    corpus = [random_formula() for _ in range(args.formulas)]
+
+    mismatches = [
+        formula for formula in corpus
+        if tokenize_formula(formula) != cp.parse_formula(formula)
+    ]
+
+    for formula in mismatches[:10]:
+        print(
+            f"MISMATCH {formula!r}: {tokenize_formula(formula)} != "
+            f"{cp.parse_formula(formula)}"
+        )
+
+    print(f"{len(corpus)} formulas, {len(mismatches)} mismatches")
+
+    timings = {}
+    for name, parse in (
+        ("chemparse", cp.parse_formula),
+        ("tokenizer", tokenize_formula),
+    ):
+        start = time.perf_counter()
+        for formula in corpus:
+            parse(formula)
+        timings[name] = time.perf_counter() - start
+
+        print(f"{name:10} {timings[name] / len(corpus) * 1e6:8.2f} us/formula")
+
+    print(f"speedup: {timings['chemparse'] / timings['tokenizer']:.1f}x")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
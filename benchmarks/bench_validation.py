@@ -0,0 +1,175 @@
+"""
+Measure the throughput of balancing a mix of valid and invalid equations.
+
+Invalid equations are made from the valid equations of the corpus by
+removing the arrow, breaking a formula, adding an unknown element or an
+element on one side only, by keeping one compound on both sides, or by a
+precipitation of the sulfate of an element that is not in the equation. An
+oxidation without a reduction and a couple that cannot be balanced are
+made from an element that is not in the equation. Every one of them is
+checked to be rejected with the expected code, by
+validation.validate_equation() for the codes it checks and by the
+balancing for the others, and an unknown pH by validate_equation().
+
+For every share of invalid equations a batch is balanced with
+batch.balance_one(), and the throughput, the time per valid and per invalid
+equation and the time of validate_equation() alone are printed.
+
+Run from the project directory with
+`python benchmarks/bench_validation.py`.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import balance_one  # noqa: E402
+from bench import load_corpus  # noqa: E402
+from redox_reaction import RedoxReaction  # noqa: E402
+import validation  # noqa: E402
+from validation import ValidationError, validate_equation  # noqa: E402
+
+# elements that are added to make an equation invalid
+EXTRA_ELEMENTS = ("Ba", "Sr", "Cs", "Rb", "Li")
+
+
+def extra_element(equation):
+    """
+    :return: An element of EXTRA_ELEMENTS that is not in the equation
+    """
+    return next(
+        element for element in EXTRA_ELEMENTS if element not in equation
+    )
+
+
+# the codes that only show while the equation is balanced
+BALANCING_CODES = (
+    validation.UNBALANCED_COUPLE,
+    validation.UNPAIRED_ELECTRONS,
+)
+
+
+def rejection(equation, code):
+    """
+    :param equation: An invalid equation
+    :param code: The code it is expected to be rejected with
+    :return: The ValidationError of validate_equation(), or of the
+    balancing for the codes that only show then, or None
+    """
+    if code not in BALANCING_CODES:
+        return validate_equation(equation)
+
+    try:
+        RedoxReaction(equation, "a").balance_coefficients()
+    except ValidationError as e:
+        return e
+
+    return None
+
+
+def invalid(equation):
+    """
+    :param equation: A valid equation
+    :return: A list of (invalid equation, expected code) pairs
+    """
+    reactants, products = equation.split("->")
+    element = extra_element(equation)
+
+    return [
+        (equation.replace("->", "+"), validation.MISSING_ARROW),
+        (f"{reactants}-> {products} -> {products}",
+         validation.MULTIPLE_ARROWS),
+        (f"{reactants}+ ->{products}", validation.INVALID_FORMULA),
+        (f"Qx + {equation}", validation.UNKNOWN_ELEMENT),
+        (f"{equation} + {element}", validation.ONE_SIDED_ELEMENT),
+        (f"{element} -> {element}Lp2", validation.UNPAIRED_ELECTRONS),
+        (f"{element} -> {element}Lp1 + {element}Lp2",
+         validation.UNBALANCED_COUPLE),
+        (f"{reactants.split('+')[0].strip()} -> "
+         f"{reactants.split('+')[0].strip()}",
+         validation.NO_OXIDATION_CHANGE),
+        (f"{element}Lp2 + SO4Ln2 -> {element}SO4",
+         validation.NO_OXIDATION_CHANGE),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--reactions", type=int, default=20000)
+    parser.add_argument(
+        "--invalid",
+        type=float,
+        nargs="+",
+        default=[0.0, 0.1, 0.5, 0.9]
+    )
+    args = parser.parse_args()
+
+    random.seed(0)
+
+    valid = sorted({
+        entry["equation"] for entry in load_corpus()
+        if entry["ph"] == "a" and entry["answer"] is not None
+        and "oxidation" not in entry["rejected_by"]
+    })
+
+    bad = []
+    failures = 0
+
+    error = validate_equation(valid[0], "x")
+    if error is None or error.code != validation.INVALID_PH:
+        failures += 1
+        print(f"FAIL pH 'x'\n  expected {validation.INVALID_PH}, got {error}")
+
+    for equation in valid:
+        for item, code in invalid(equation):
+            error = rejection(item, code)
+            if error is None or error.code != code:
+                failures += 1
+                print(f"FAIL {item}\n  expected {code}, got {error}")
+
+            bad.append(item)
+
+    print(f"{len(valid)} valid and {len(bad)} invalid equations")
+
+    for share in args.invalid:
+        items = [
+            (random.choice(bad), True) if random.random() < share
+            else (random.choice(valid), False)
+            for _ in range(args.reactions)
+        ]
+
+        seconds = {False: 0.0, True: 0.0}
+        counts = {False: 0, True: 0}
+        for equation, rejected in items:
+            start = time.perf_counter()
+            result = balance_one(equation, "a")
+            seconds[rejected] += time.perf_counter() - start
+            counts[rejected] += 1
+
+            if (result.error is not None) != rejected:
+                failures += 1
+                print(f"FAIL {equation}\n  {result}")
+
+        start = time.perf_counter()
+        for equation, _ in items:
+            validate_equation(equation)
+        validate_seconds = time.perf_counter() - start
+
+        total = seconds[False] + seconds[True]
+        print(
+            f"{share:4.0%} invalid  {len(items) / total:9.0f} reactions/s"
+            f"  valid: {seconds[False] / max(counts[False], 1) * 1e6:7.1f} us"
+            f"  invalid: {seconds[True] / max(counts[True], 1) * 1e6:7.1f} us"
+            f"  validate only: {validate_seconds / len(items) * 1e6:7.1f} us"
+        )
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Compare balancing reactions one at a time with the NumPy batch mode.
+
+For every batch size a batch is drawn from the corpus, balanced with
+batch.balance_one() in a loop and with vectorized.balance_vectorized(), and
+the results are checked for equality. The time per batch and the speedup
+are printed.
+
+Run from the project directory with `python benchmarks/bench_vectorized.py`.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import balance_one  # noqa: E402
+from vectorized import balance_vectorized  # noqa: E402
+
+REACTIONS = [
+    "FeLp2 + MnO4Ln1 -> FeLp3 + MnLp2",
+    "Cr2O7Ln2 + FeLp2 -> CrLp3 + FeLp3",
+    "Cu + NO3Ln1 -> CuLp2 + NO",
+    "MnO4Ln1 + SO3Ln2 -> MnO2 + SO4Ln2",
+    "Zn + CuLp2 -> ZnLp2 + Cu",
+    "MnO4Ln1 + ClLn1 -> MnLp2 + Cl2",
+    "Ag + NO3Ln1 -> AgLp1 + NO2",
+    "SnLp2 + FeLp3 -> SnLp4 + FeLp2",
+    "MnO4Ln1 + C2O4Ln2 -> MnLp2 + CO2",
+    "BrLn1 + MnO4Ln1 -> Br2 + MnO2",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000, 10000]
+    )
+    args = parser.parse_args()
+
+    random.seed(0)
+
+    for size in args.sizes:
+        items = [
+            (random.choice(REACTIONS), random.choice("abn"))
+            for _ in range(size)
+        ]
+
+        start = time.perf_counter()
+        expected = [balance_one(equation, ph) for equation, ph in items]
+        scalar = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = balance_vectorized(items)
+        vectorized = time.perf_counter() - start
+
+        if results != expected:
+            sys.exit(f"The results differ for a batch of {size}")
+
+        print(
+            f"{size:6} reactions  scalar: {scalar * 1e3:9.2f} ms"
+            f"  vectorized: {vectorized * 1e3:9.2f} ms"
+            f"  speedup: {scalar / vectorized:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
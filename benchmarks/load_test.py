@@ -0,0 +1,193 @@
+"""
+Load test the HTTP balancing service.
+
+A number of concurrent clients send requests over keep-alive connections to
+a running service.py, or to one started by the script with --spawn. Every
+request balances a reaction drawn from the corpus, or with --batch a list of
+them. The throughput, the latency percentiles and the number of rejected
+(503) and failed requests are printed.
+
+Run from the project directory with
+`python benchmarks/load_test.py --spawn --workers 4`.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, ROOT)
+
+from bench import load_corpus  # noqa: E402
+
+
+async def request(reader, writer, host, method, path, payload):
+    """
+    It sends one request over an open connection
+
+    :return: A tuple of the status code and the decoded JSON response
+    """
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if not line.strip():
+            break
+
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(host, port, items, count, batch, latencies, statuses):
+    """
+    One client that sends count requests one after another
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(count):
+            if batch:
+                path = "/balance/batch"
+                payload = {"items": [
+                    {"equation": equation, "ph": ph}
+                    for equation, ph in random.sample(items, batch)
+                ]}
+            else:
+                path = "/balance"
+                equation, ph = random.choice(items)
+                payload = {"equation": equation, "ph": ph}
+
+            start = time.perf_counter()
+            status, _ = await request(
+                reader, writer, host, "POST", path, payload
+            )
+            latencies.append(time.perf_counter() - start)
+            statuses.append(status)
+    finally:
+        writer.close()
+
+
+async def wait_until_ready(host, port, timeout=60.0):
+    """
+    It waits until the service answers /health
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+            continue
+
+        try:
+            await request(reader, writer, host, "GET", "/health", None)
+        finally:
+            writer.close()
+        return
+
+
+async def run(args, items):
+    await wait_until_ready(args.host, args.port)
+
+    latencies = []
+    statuses = []
+    # the first clients send one more request each when the requests do
+    # not divide evenly
+    per_client, remainder = divmod(args.requests, args.concurrency)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(
+            args.host, args.port, items, per_client + (index < remainder),
+            args.batch, latencies, statuses
+        )
+        for index in range(args.concurrency)
+    ))
+    seconds = time.perf_counter() - start
+
+    ok = statuses.count(200)
+    rejected = statuses.count(503)
+    reactions = ok * (args.batch or 1)
+    percentiles = statistics.quantiles(latencies, n=100)
+
+    print(f"{len(statuses)} requests from {args.concurrency} clients "
+          f"in {seconds:.2f} s")
+    print(f"throughput   {ok / seconds:10.1f} requests/s "
+          f"{reactions / seconds:10.1f} reactions/s")
+    print(f"latency p50  {percentiles[49] * 1e3:10.2f} ms")
+    print(f"latency p90  {percentiles[89] * 1e3:10.2f} ms")
+    print(f"latency p99  {percentiles[98] * 1e3:10.2f} ms")
+    print(f"latency max  {max(latencies) * 1e3:10.2f} ms")
+    print(f"rejected     {rejected:10}")
+    print(f"failed       {len(statuses) - ok - rejected:10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument(
+        "--batch",
+        type=int,
+        default=0,
+        help="send this many reactions per request to /balance/batch"
+    )
+    parser.add_argument(
+        "--spawn",
+        action="store_true",
+        help="start service.py for the duration of the test"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="the worker processes of the spawned service"
+    )
+    args = parser.parse_args()
+
+    random.seed(0)
+    items = [(entry["equation"], entry["ph"]) for entry in load_corpus()]
+    args.batch = min(args.batch, len(items))
+
+    service = None
+    if args.spawn:
+        command = [
+            sys.executable, os.path.join(ROOT, "service.py"),
+            "--host", args.host, "--port", str(args.port),
+        ]
+        if args.workers is not None:
+            command += ["--workers", str(args.workers)]
+
+        service = subprocess.Popen(command)
+
+    try:
+        asyncio.run(run(args, items))
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Stress the exact coefficient arithmetic with many changing elements.
+
+Reactions are generated with a growing number of elements that change
+oxidation number, large counts, large changes in oxidation number and
+optionally fractional counts, e.g. "Fe12Lp1 + V3Ln11 -> Fe12Lp7 + V3Ln12".
+Each element is a redox couple of its own, with at least one oxidation and
+one reduction among them.
+Every reaction is balanced with the "oxidation" engine and checked:
+
+- every coefficient is a Python int,
+- the coefficients have no common divisor,
+- the vectorized batch mode gives the same result where it applies.
+
+The largest coefficient an element gets from the least common multiple of
+the differences, see redox_couples.balance_couples(), is compared with the
+one the former product of all differences gave, and the time per reaction
+and the largest coefficient of the balanced reactions are printed.
+
+Run from the project directory with
+`python benchmarks/stress_coefficients.py`.
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compound import PERIODIC_TABLE  # noqa: E402
+from redox_reaction import RedoxReaction  # noqa: E402
+from vectorized import balance_vectorized  # noqa: E402
+
+# elements other than H and O to draw the changing elements from
+ELEMENTS = [
+    element for element in PERIODIC_TABLE[:90] if element not in ("H", "O")
+]
+
+
+def charge(value):
+    """
+    :return: The charge as written in a formula, e.g. "Lp3", or "" for 0
+    """
+    if value > 0:
+        return f"Lp{value}"
+    if value < 0:
+        return f"Ln{-value}"
+
+    return ""
+
+
+def count(value):
+    return "" if value == 1 else f"{value}"
+
+
+def generate(element_count, fractional):
+    """
+    :param element_count: The number of elements that change oxidation
+    number
+    :param fractional: True to use counts like 0.5 and 2.25
+    :return: A tuple of the equation and the differences in oxidation
+    number of its elements
+    """
+    reactants = []
+    products = []
+    differences = []
+
+    for index, element in enumerate(random.sample(ELEMENTS, element_count)):
+        atoms = random.choice((0.5, 1.5, 2.25)) if fractional \
+            else random.randint(1, 40)
+        before, after = random.sample(range(-12, 13), 2)
+
+        # the first element is oxidized and the second reduced, so the
+        # electrons of the others can always be paired
+        if index < 2 and (before < after) != (index == 0):
+            before, after = after, before
+
+        reactants.append(f"{element}{count(atoms)}{charge(before)}")
+        products.append(f"{element}{count(atoms)}{charge(after)}")
+        differences.append(before - after)
+
+    return (" + ".join(reactants) + " -> " + " + ".join(products), differences)
+
+
+def check(equation, result):
+    """
+    :return: A list of the problems with the result
+    """
+    coefficients = [
+        coefficient for side in (result.reactants, result.products)
+        for _, coefficient in side
+    ]
+
+    problems = []
+    if not all(type(coefficient) is int for coefficient in coefficients):
+        problems.append(f"not ints: {coefficients}")
+    elif math.gcd(*coefficients) != 1:
+        problems.append(f"common divisor: {coefficients}")
+
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--elements",
+        type=int,
+        nargs="+",
+        default=[2, 5, 10, 20, 40, 80]
+    )
+    parser.add_argument("--reactions", type=int, default=50)
+    args = parser.parse_args()
+
+    random.seed(0)
+    failures = 0
+
+    for element_count in args.elements:
+        for fractional in (False, True):
+            items = [
+                generate(element_count, fractional)
+                for _ in range(args.reactions)
+            ]
+
+            start = time.perf_counter()
+            results = [
+                RedoxReaction(equation, ph).balance_coefficients()
+                for (equation, _), ph in zip(items, "abn" * len(items))
+            ]
+            seconds = time.perf_counter() - start
+
+            vectorized = balance_vectorized(
+                (equation, ph)
+                for (equation, _), ph in zip(items, "abn" * len(items))
+            )
+
+            largest = 0
+            element_largest = 0
+            former = 0
+            for (equation, differences), result, batch in zip(
+                items, results, vectorized
+            ):
+                problems = check(equation, result)
+                if batch.result != result:
+                    problems.append(f"vectorized: {batch}")
+
+                for problem in problems:
+                    failures += 1
+                    print(f"FAIL {equation}\n  {problem}")
+
+                largest = max(
+                    largest,
+                    *(c for side in result for _, c in side)
+                )
+                multiple = math.lcm(*differences)
+                reductions = sum(value > 0 for value in differences)
+                oxidations = len(differences) - reductions
+                element_largest = max(
+                    element_largest,
+                    *(
+                        multiple * (oxidations if value > 0 else reductions)
+                        // abs(value) for value in differences
+                    )
+                )
+
+                product = math.prod(abs(value) for value in differences)
+                former = max(
+                    former,
+                    *(product // abs(value) for value in differences)
+                )
+
+            print(
+                f"{element_count:3} elements"
+                f"{' fractional' if fractional else '           '}"
+                f"  {seconds / len(items) * 1e6:9.1f} us per reaction"
+                f"  largest coefficient: {len(str(largest)):3} digits"
+                f"  element coefficient with the LCM:"
+                f" {len(str(element_largest)):3} digits,"
+                f" with the product: {len(str(former)):3} digits"
+            )
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Balance many different reactions from many threads at once.
+
+The expected result of every reaction is computed sequentially first. The
+reactions are then balanced concurrently, both with a new RedoxReaction per
+call and with RedoxReaction objects shared between threads, and every
+result is compared with the expected one. The script exits with an error
+if any result differs.
+
+Run from the project directory with `python benchmarks/stress_threads.py`.
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from redox_reaction import RedoxReaction  # noqa: E402
+
+REACTIONS = [
+    "FeLp2 + MnO4Ln1 -> FeLp3 + MnLp2",
+    "Cr2O7Ln2 + FeLp2 -> CrLp3 + FeLp3",
+    "Cu + NO3Ln1 -> CuLp2 + NO",
+    "MnO4Ln1 + SO3Ln2 -> MnO2 + SO4Ln2",
+    "Zn + CuLp2 -> ZnLp2 + Cu",
+    "MnO4Ln1 + ClLn1 -> MnLp2 + Cl2",
+    "Ag + NO3Ln1 -> AgLp1 + NO2",
+    "SnLp2 + FeLp3 -> SnLp4 + FeLp2",
+    "MnO4Ln1 + C2O4Ln2 -> MnLp2 + CO2",
+    "BrLn1 + MnO4Ln1 -> Br2 + MnO2",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--calls", type=int, default=5000)
+    args = parser.parse_args()
+
+    # switch threads as often as possible to provoke races
+    sys.setswitchinterval(1e-6)
+
+    jobs = [(equation, ph) for equation in REACTIONS for ph in "abn"]
+    expected = {
+        job: (
+            RedoxReaction(*job).balance_coefficients(),
+            RedoxReaction(*job).balance()
+        )
+        for job in jobs
+    }
+    shared = {job: RedoxReaction(*job) for job in jobs}
+
+    work = [random.choice(jobs) for _ in range(args.calls)]
+
+    def run(job):
+        reaction = shared[job] if random.random() < 0.5 \
+            else RedoxReaction(*job)
+
+        return (job, (reaction.balance_coefficients(), reaction.balance()))
+
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        results = list(executor.map(run, work))
+
+    failures = [
+        (job, result) for job, result in results if result != expected[job]
+    ]
+
+    for job, result in failures[:10]:
+        print(f"MISMATCH {job}: {result} != {expected[job]}")
+
+    print(
+        f"{len(results)} calls on {args.threads} threads, "
+        f"{len(failures)} mismatches"
+    )
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
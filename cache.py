@@ -0,0 +1,240 @@
+"""
+Cache balanced reactions in memory.
+
+The same few hundred reactions make up most requests, so the balanced
+result of each reaction is kept in a bounded LRU cache. The key is the
+canonical form of the equation together with the pH, so equations that only
+differ in whitespace share an entry.
+
+Example:
+
+    from cache import balance_cached, default_cache
+
+    result = balance_cached("FeLp2 + MnO4Ln1 -> FeLp3 + MnLp2", "a")
+    print(default_cache.cache_info())
+"""
+
+from collections import OrderedDict, namedtuple
+import threading
+
+from half_reactions import balance_half_reaction
+import instrumentation
+from redox_reaction import RedoxReaction, parse_formula
+from render import html_renderer, latex_renderer
+from validation import split_equation
+
+CacheInfo = namedtuple(
+    "CacheInfo",
+    ["hits", "misses", "evictions", "currsize", "maxsize"]
+)
+
+
+def canonical_equation(equation, normalize_order=False):
+    """
+    It normalizes the whitespace of an equation, e.g.
+    "FeLp2+MnO4Ln1 ->FeLp3 +  MnLp2" becomes
+    "FeLp2 + MnO4Ln1 -> FeLp3 + MnLp2"
+
+    :param equation: The unbalanced equation
+    :param normalize_order: Sort the compounds on each side, so that
+    equations that only differ in the order of the compounds share a key
+    :return: The canonical form of the equation
+    :raises ValidationError: If there is not exactly one "->"
+    """
+    reactants, products = split_equation(equation)
+
+    sides = []
+    for side in (reactants, products):
+        compounds = ["".join(c.split()) for c in side.split("+")]
+
+        if normalize_order:
+            compounds.sort()
+
+        sides.append(" + ".join(compounds))
+
+    return " -> ".join(sides)
+
+
+class LRUCache:
+    """
+    A thread safe mapping that holds at most maxsize items and evicts the
+    least recently used item when it is full.
+    """
+
+    def __init__(self, maxsize=1024):
+        """
+        :param maxsize: The maximum number of items in the cache
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key, default=None):
+        """
+        :param key: The key of the item
+        :param default: The value returned if the key is not cached
+        :return: The cached value, or default
+        """
+        with self._lock:
+            try:
+                value = self._items[key]
+            except KeyError:
+                self._misses += 1
+                return default
+
+            self._items.move_to_end(key)
+            self._hits += 1
+
+            return value
+
+    def put(self, key, value):
+        """
+        It stores a value and evicts the least recently used item if the
+        cache is full
+
+        :param key: The key of the item
+        :param value: The value to store
+        """
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        """
+        It removes every item and resets the statistics
+        """
+        with self._lock:
+            self._items.clear()
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+    def cache_info(self):
+        """
+        :return: A CacheInfo with the hits, misses and evictions so far
+        """
+        with self._lock:
+            return CacheInfo(
+                self._hits,
+                self._misses,
+                self._evictions,
+                len(self._items),
+                self.maxsize
+            )
+
+    def __len__(self):
+        return len(self._items)
+
+
+class ReactionCache(LRUCache):
+    """
+    An LRU cache of BalancedReactions keyed on the canonical equation and
+    the pH. Only the default "oxidation" engine is cached; use
+    RedoxReaction directly for the other engines.
+    """
+
+    def __init__(self, maxsize=1024, normalize_order=False, store=None):
+        """
+        :param maxsize: The maximum number of reactions in the cache
+        :param normalize_order: Sort the compounds of the equation when
+        building the key. The equation of the key is what gets balanced,
+        so every result, cached or not, then has its compounds in sorted
+        order rather than in the order of the caller's equation.
+        :param store: An optional second level cache, e.g. a
+        disk_cache.DiskCache, that is checked on a miss and updated with
+        every newly balanced reaction
+        """
+        super().__init__(maxsize)
+        self.normalize_order = normalize_order
+        self.store = store
+
+    def key(self, equation, ph):
+        """
+        :param equation: The unbalanced equation
+        :param ph: The pH of the solution ("a", "b" or "n")
+        :return: The key of the reaction in the cache
+        """
+        return (canonical_equation(equation, self.normalize_order), ph)
+
+    def balance(self, equation, ph, solver="fraction"):
+        """
+        It returns the cached result of the reaction, balancing it first if
+        it is not cached. Reactions that cannot be balanced are not cached.
+
+        :param equation: The unbalanced equation
+        :param ph: The pH of the solution ("a", "b" or "n")
+        :param solver: The solver passed to RedoxReaction on a miss
+        :return: A BalancedReaction
+        """
+        key = self.key(equation, ph)
+
+        result = self.get(key)
+        if instrumentation.recorders:
+            instrumentation.count(
+                "reaction_cache_misses" if result is None
+                else "reaction_cache_hits"
+            )
+
+        if result is None and self.store is not None:
+            result = self.store.get(key)
+
+            if instrumentation.recorders:
+                instrumentation.count(
+                    "store_misses" if result is None else "store_hits"
+                )
+
+            if result is not None:
+                self.put(key, result)
+
+        if result is None:
+            result = RedoxReaction(key[0], ph, solver).balance_coefficients()
+            self.put(key, result)
+
+            if self.store is not None:
+                self.store.put(key, result)
+
+        return result
+
+
+default_cache = ReactionCache()
+
+
+def balance_cached(equation, ph, solver="fraction"):
+    """
+    It balances a reaction through default_cache
+
+    :param equation: The unbalanced equation
+    :param ph: The pH of the solution ("a", "b" or "n")
+    :param solver: The solver passed to RedoxReaction on a miss
+    :return: A BalancedReaction
+    """
+    return default_cache.balance(equation, ph, solver)
+
+
+def formula_cache_info():
+    """
+    :return: The statistics of the per formula parse cache
+    """
+    return parse_formula.cache_info()
+
+
+def clear_caches():
+    """
+    It clears default_cache, the per formula parse cache, the balanced
+    half-reactions and the rendered formulas
+    """
+    default_cache.clear()
+    parse_formula.cache_clear()
+    balance_half_reaction.cache_clear()
+    latex_renderer.fragment.cache_clear()
+    html_renderer.fragment.cache_clear()
@@ -0,0 +1,258 @@
+"""
+Balance redox reactions from the command line.
+
+Equations are read line by line from a file or from stdin and the balanced
+equations are written to stdout as soon as they are ready, in the same
+format as the input. A summary of the throughput and the number of failed
+equations is written to stderr at the end.
+
+Formats:
+
+    text   one equation per line, the pH is given with --ph
+    csv    a header with an "equation" column and an optional "ph" column;
+           "balanced" and "error" columns are added to the output
+    jsonl  one JSON object per line with an "equation" key and an optional
+           "ph" key; "balanced" and "error" keys are added to the output
+
+A line that cannot be read, like invalid JSON or a row without an
+equation, is written with an error like any equation that fails, and the
+lines after it are still balanced. A jsonl line that is not a JSON object
+is written as {"input": line}.
+
+Example:
+
+    python cli.py equations.csv --format csv --workers 4 > balanced.csv
+"""
+
+import argparse
+from collections import deque
+import csv
+import json
+import sys
+import time
+
+from batch import BatchBalancer, BatchResult, balance_one
+from redox_reaction import ENGINES, SOLVERS
+
+
+# The readers yield (record, equation, ph, error) for every line. error is
+# None, or the reason the line cannot be balanced, in the format of
+# BatchResult.error, and equation is then None.
+
+def _read_text(lines, ph):
+    for line in lines:
+        equation = line.strip()
+        if equation and not equation.startswith("#"):
+            yield (None, equation, ph, None)
+
+
+def _read_csv(lines, ph):
+    for row in csv.DictReader(lines):
+        equation = row.get("equation")
+        if None in row:
+            # DictReader puts the fields past the header under None
+            del row[None]
+            yield (row, None, ph, "ValueError: unexpected extra columns")
+        elif equation is None:
+            yield (row, None, ph, "KeyError: 'equation'")
+        else:
+            yield (row, equation, row.get("ph") or ph, None)
+
+
+def _read_jsonl(lines, ph):
+    for line in lines:
+        if not line.strip():
+            continue
+
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield ({"input": line.strip()}, None, ph,
+                   f"{type(e).__name__}: {e}")
+            continue
+
+        if not isinstance(record, dict):
+            yield ({"input": line.strip()}, None, ph,
+                   "TypeError: expected a JSON object")
+        elif not isinstance(record.get("equation"), str):
+            yield (record, None, ph, "KeyError: 'equation'")
+        else:
+            yield (record, record["equation"], record.get("ph") or ph, None)
+
+
+class _Writer:
+    """
+    It writes one result at a time to the output in the chosen format.
+    """
+
+    def __init__(self, output, output_format):
+        self.output = output
+        self.output_format = output_format
+        self._csv_writer = None
+
+    def write(self, record, result):
+        balanced = result.result.to_text() if result.error is None else ""
+        error = result.error or ""
+
+        if self.output_format == "text":
+            if result.error is None:
+                self.output.write(balanced + "\n")
+            else:
+                self.output.write(f"ERROR {error}\n")
+
+        elif self.output_format == "csv":
+            if self._csv_writer is None:
+                self._csv_writer = csv.DictWriter(
+                    self.output,
+                    fieldnames=list(record) + ["balanced", "error"],
+                    extrasaction="ignore"
+                )
+                self._csv_writer.writeheader()
+
+            self._csv_writer.writerow(
+                {**record, "balanced": balanced, "error": error}
+            )
+
+        else:
+            record = {**record, "balanced": balanced or None,
+                      "error": error or None}
+            self.output.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+READERS = {"text": _read_text, "csv": _read_csv, "jsonl": _read_jsonl}
+
+
+def run(lines, output, output_format="text", ph="a", workers=0,
+        chunksize=64, solver="fraction", engine="oxidation"):
+    """
+    It balances every equation in lines and writes the results to output
+
+    :param lines: An iterable of input lines
+    :param output: A text file the results are written to
+    :param output_format: "text", "csv" or "jsonl"
+    :param ph: The pH used when a line does not give one
+    :param workers: The number of worker processes, 0 balances in this
+    process
+    :param chunksize: The number of equations sent to a worker at a time
+    :param solver: The solver passed to RedoxReaction
+    :param engine: The engine passed to balance_coefficients()
+    :return: A tuple of the number of equations and the number of failures
+    """
+    records = READERS[output_format](lines, ph)
+    writer = _Writer(output, output_format)
+
+    # the records of the equations that are being balanced and of the lines
+    # that failed to be read after them, in input order
+    pending = deque()
+
+    def pairs():
+        for record, equation, record_ph, error in records:
+            if error is None:
+                pending.append((record, None))
+                yield (equation, record_ph)
+                continue
+
+            result = BatchResult(equation, record_ph, None, error)
+            if pending:
+                # it has to wait for the equations before it
+                pending.append((record, result))
+            else:
+                write(record, result)
+
+    count = 0
+    failures = 0
+
+    def write(record, result):
+        nonlocal count, failures
+
+        writer.write(record, result)
+
+        count += 1
+        if result.error is not None:
+            failures += 1
+
+    def write_unread():
+        while pending and pending[0][1] is not None:
+            write(*pending.popleft())
+
+    def write_all(results):
+        for result in results:
+            write_unread()
+            write(pending.popleft()[0], result)
+
+        write_unread()
+
+    if workers:
+        with BatchBalancer(workers, chunksize, solver, engine) as balancer:
+            write_all(balancer.imap(pairs()))
+    else:
+        write_all(
+            balance_one(equation, record_ph, solver, engine)
+            for equation, record_ph in pairs()
+        )
+
+    return (count, failures)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Balance redox reactions line by line."
+    )
+    parser.add_argument(
+        "input",
+        nargs="?",
+        default="-",
+        help="the file to read equations from, defaults to stdin"
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(READERS),
+        default="text",
+        help="the format of the input and output"
+    )
+    parser.add_argument(
+        "--ph",
+        choices=("a", "b", "n"),
+        default="a",
+        help="the pH used when a line does not give one"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="the number of worker processes, 0 balances in this process"
+    )
+    parser.add_argument("--chunksize", type=int, default=64)
+    parser.add_argument("--solver", choices=SOLVERS, default="fraction")
+    parser.add_argument("--engine", choices=ENGINES, default="oxidation")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+
+    if args.input == "-":
+        lines = sys.stdin
+        count, failures = run(
+            lines, sys.stdout, args.format, args.ph,
+            args.workers, args.chunksize, args.solver, args.engine
+        )
+    else:
+        with open(args.input, newline="", encoding="utf-8") as lines:
+            count, failures = run(
+                lines, sys.stdout, args.format, args.ph,
+                args.workers, args.chunksize, args.solver, args.engine
+            )
+
+    seconds = time.perf_counter() - start
+    rate = count / seconds if seconds else 0.0
+
+    print(
+        f"{count} equations in {seconds:.2f} s ({rate:.1f} equations/s), "
+        f"{failures} failed",
+        file=sys.stderr
+    )
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
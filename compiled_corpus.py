@@ -0,0 +1,887 @@
+"""
+Compile equation files into a binary format that is balanced through mmap.
+
+Reading a large corpus from text splits every equation and parses every
+formula again on each run. compile_corpus() does that once and writes the
+interned species, their integer compositions and every distinct reaction
+to a binary file; each line of the corpus is only the 4 byte index of its
+reaction. CompiledCorpus maps the file into memory and reads the arrays
+through memoryviews without copying them, and balance_corpus() balances
+every distinct reaction once, straight from those arrays, and streams a
+binary results file in the same layout.
+
+Layout
+------
+
+Both files are little-endian and consist of a header followed by arrays:
+
+    offset  size  field
+    0       4     magic, b"RDXC" for a corpus and b"RDXR" for results
+    4       2     FORMAT_VERSION
+    6       2     the number of arrays
+    8       4     redox_reaction.ALGORITHM_VERSION of the results, 0 in a
+                  corpus; CompiledResults refuses results of another
+                  version
+    12      4     reserved, 0
+    16      16n   for every array its offset from the start of the file
+                  and its number of items, both 8 byte unsigned
+
+Every array starts at a multiple of 8 bytes. The arrays and their types
+("B", "i", "I" and "Q" are 1, 4, 4 and 8 byte integers, "i" is signed) are
+listed in CORPUS_ARRAYS and RESULT_ARRAYS in file order:
+
+    item_reaction        I  the reaction of every line of the corpus
+    pool                 B  UTF-8 text of the symbols, formulas, equations
+                            and error messages; the text of an item is
+                            pool[start:start + length]
+    element_*            I  the element symbols used by the species
+    species_start/length I  the formula of every species
+    species_first/size   I  the slice of the composition arrays of every
+                            species, in formula order
+    species_charge       i  the charge of every species
+    composition_element  I  an index into the element symbols
+    composition_count    i  the count of the element
+    reaction_start/length I the equation as it was read
+    reaction_first       I  the index of the first compound of every
+                            reaction in compound_species
+    reaction_reactants   I  the number of reactants, followed by
+    reaction_products    I  the number of products
+    reaction_ph          B  ord("a"), ord("b") or ord("n")
+    reaction_flags       B  FLAG_TEXT if the reaction could not be compiled,
+                            e.g. because of fractional counts, and is
+                            balanced from its equation instead
+    compound_species     I  the species of every compound of every reaction
+
+A reaction is an equation with its pH, so a line that repeats an earlier
+one only adds to item_reaction. A results file has the same pool and
+species arrays, without compositions, and for every distinct result:
+
+    item_result          I  the result of every line of the corpus
+    result_error_start/length I  the error message, length 0 if balanced
+    result_first         I  the index of the first term in the term arrays
+    result_reactants     I  the number of reactant terms, followed by
+    result_products      I  the number of product terms
+    term_species         I  the species of every term
+    term_coefficient     Q  the coefficient of every term
+
+The per line array comes first, so both files are written while the lines
+are read or balanced, and only the distinct reactions and results are kept
+in memory.
+
+Example:
+
+    from compiled_corpus import balance_corpus, compile_corpus
+
+    with open("equations.txt") as lines:
+        compile_corpus(lines, "equations.rdxc", ph="a")
+
+    balance_corpus("equations.rdxc", "results.rdxr")
+
+or from the command line:
+
+    python compiled_corpus.py compile equations.txt equations.rdxc --ph a
+    python compiled_corpus.py balance equations.rdxc results.rdxr
+    python compiled_corpus.py show results.rdxr
+"""
+
+import argparse
+from array import array
+from itertools import islice
+import mmap
+import os
+import struct
+import sys
+
+from batch import BatchResult
+from compound import Compound
+from redox_reaction import (
+    ALGORITHM_VERSION, BalancedReaction, ENGINES, ParsedReaction,
+    RedoxReaction, SOLVERS
+)
+
+FORMAT_VERSION = 2
+
+CORPUS_MAGIC = b"RDXC"
+RESULT_MAGIC = b"RDXR"
+
+FLAG_TEXT = 1
+
+_HEADER = struct.Struct("<4sHHII")
+_ARRAY = struct.Struct("<QQ")
+
+CORPUS_ARRAYS = (
+    ("item_reaction", "I"),
+    ("pool", "B"),
+    ("element_start", "I"),
+    ("element_length", "I"),
+    ("species_start", "I"),
+    ("species_length", "I"),
+    ("species_first", "I"),
+    ("species_size", "I"),
+    ("species_charge", "i"),
+    ("composition_element", "I"),
+    ("composition_count", "i"),
+    ("reaction_start", "I"),
+    ("reaction_length", "I"),
+    ("reaction_first", "I"),
+    ("reaction_reactants", "I"),
+    ("reaction_products", "I"),
+    ("reaction_ph", "B"),
+    ("reaction_flags", "B"),
+    ("compound_species", "I"),
+)
+
+RESULT_ARRAYS = (
+    ("item_result", "I"),
+    ("pool", "B"),
+    ("species_start", "I"),
+    ("species_length", "I"),
+    ("result_error_start", "I"),
+    ("result_error_length", "I"),
+    ("result_first", "I"),
+    ("result_reactants", "I"),
+    ("result_products", "I"),
+    ("term_species", "I"),
+    ("term_coefficient", "Q"),
+)
+
+_ITEM_SIZES = {"B": 1, "i": 4, "I": 4, "Q": 8}
+
+# the number of items of a streamed array that are written at a time
+_CHUNK = 8192
+
+# the largest coefficient a results file can hold
+MAX_COEFFICIENT = 2 ** 64 - 1
+
+
+class _Pool:
+    """
+    The interned text of a file.
+    """
+
+    def __init__(self):
+        self.data = bytearray()
+        self._offsets = {}
+
+    def add(self, text):
+        """
+        :return: A tuple of the start and the length of the text in the pool
+        """
+        span = self._offsets.get(text)
+
+        if span is None:
+            encoded = text.encode("utf-8")
+            span = (len(self.data), len(encoded))
+            self.data += encoded
+            self._offsets[text] = span
+
+        return span
+
+
+class _Species:
+    """
+    The interned species of a file and the pool their formulas are in.
+    """
+
+    def __init__(self):
+        self.pool = _Pool()
+        self.index = {}
+        self.start = array("I")
+        self.length = array("I")
+
+    def add(self, formula):
+        """
+        :return: The index of the species and True if it is new
+        """
+        index = self.index.get(formula)
+        if index is not None:
+            return (index, False)
+
+        index = self.index[formula] = len(self.index)
+        start, length = self.pool.add(formula)
+        self.start.append(start)
+        self.length.append(length)
+
+        return (index, True)
+
+
+def _write(path, magic, layout, arrays, algorithm=0):
+    """
+    It writes the header and the arrays of a file. The arrays are written
+    in layout order and the header last, so the first array can be an
+    iterator that fills the others while it is written.
+
+    :param path: The file to write
+    :param magic: CORPUS_MAGIC or RESULT_MAGIC
+    :param layout: CORPUS_ARRAYS or RESULT_ARRAYS
+    :param arrays: A dictionary of the arrays by name. An array can also
+    be an iterable of integers, which is written in chunks.
+    :param algorithm: The ALGORITHM_VERSION of the results
+    :return: A dictionary of the number of items of every array
+    """
+    with open(path, "wb") as f:
+        try:
+            return _write_arrays(f, magic, layout, arrays, algorithm)
+        except BaseException:
+            # do not leave a file that looks complete
+            f.close()
+            os.remove(path)
+            raise
+
+
+def _write_arrays(f, magic, layout, arrays, algorithm):
+    """
+    It writes the arrays to an open file, see _write()
+    """
+    offset = _HEADER.size + _ARRAY.size * len(layout)
+    f.write(b"\0" * offset)
+
+    entries = []
+    counts = {}
+    for name, typecode in layout:
+        f.write(b"\0" * (-offset % 8))
+        offset += -offset % 8
+
+        values = arrays[name]
+        if isinstance(values, (array, bytearray)):
+            chunks = [values]
+        else:
+            values = iter(values)
+            chunks = iter(lambda: array(typecode, islice(values, _CHUNK)),
+                          array(typecode))
+
+        items = 0
+        for chunk in chunks:
+            if sys.byteorder != "little" and typecode != "B":
+                chunk = array(typecode, chunk)
+                chunk.byteswap()
+
+            f.write(chunk)
+            items += len(chunk)
+
+        entries.append(_ARRAY.pack(offset, items))
+        counts[name] = items
+        offset += items * _ITEM_SIZES[typecode]
+
+    f.seek(0)
+    f.write(_HEADER.pack(magic, FORMAT_VERSION, len(layout), algorithm, 0))
+    f.write(b"".join(entries))
+
+    return counts
+
+
+class _MappedFile:
+    """
+    A file written by _write(), mapped into memory. Its arrays are
+    memoryviews of the mapping.
+    """
+
+    def __init__(self, path, magic, layout):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self._view = memoryview(self._mmap)
+            self._arrays = {}
+            self._read_header(path, magic, layout)
+        except BaseException:
+            self.close()
+            raise
+
+    def _read_header(self, path, magic, layout):
+        if len(self._view) < _HEADER.size:
+            raise ValueError(f"{path} is not a compiled file")
+
+        (file_magic, version, count, algorithm, _) = _HEADER.unpack_from(
+            self._view
+        )
+
+        if file_magic != magic:
+            raise ValueError(
+                f"{path} starts with {file_magic!r}, expected {magic!r}"
+            )
+        if version != FORMAT_VERSION:
+            raise ValueError(
+                f"{path} has format version {version}, expected "
+                f"{FORMAT_VERSION}; compile it again"
+            )
+        if count != len(layout):
+            raise ValueError(
+                f"{path} has {count} arrays, expected {len(layout)}"
+            )
+
+        self.algorithm = algorithm
+
+        for index, (name, typecode) in enumerate(layout):
+            offset, items = _ARRAY.unpack_from(
+                self._view, _HEADER.size + index * _ARRAY.size
+            )
+            end = offset + items * _ITEM_SIZES[typecode]
+            if end > len(self._view):
+                raise ValueError(f"{path} is truncated")
+
+            view = self._view[offset:end]
+            if typecode != "B" and sys.byteorder != "little":
+                # big-endian machines read a swapped copy
+                swapped = array(typecode, view)
+                swapped.byteswap()
+                view = memoryview(swapped)
+
+            self._arrays[name] = view.cast(typecode)
+
+    def text(self, start, length):
+        """
+        :return: The text at start in the pool
+        """
+        start = int(start)
+
+        return str(self._arrays["pool"][start:start + int(length)], "utf-8")
+
+    def close(self):
+        """
+        It releases the arrays and unmaps the file
+        """
+        for view in getattr(self, "_arrays", {}).values():
+            view.release()
+        self._arrays = {}
+
+        if getattr(self, "_view", None) is not None:
+            self._view.release()
+            self._view = None
+
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _add_reaction(arrays, species, elements, equation, ph):
+    """
+    It parses an equation and appends the reaction to the arrays of a
+    corpus
+
+    :param arrays: The arrays of the corpus by name
+    :param species: The _Species of the corpus
+    :param elements: A dictionary of the index of every element symbol
+    :param equation: The equation
+    :param ph: The pH of the reaction
+    :return: The index of the reaction
+    """
+    pool = species.pool
+
+    start, length = pool.add(equation)
+    arrays["reaction_start"].append(start)
+    arrays["reaction_length"].append(length)
+    arrays["reaction_ph"].append(ord(ph))
+    arrays["reaction_first"].append(len(arrays["compound_species"]))
+
+    try:
+        parsed = ParsedReaction(equation)
+        compiled = all(
+            compound.integral for compound in parsed.compounds.values()
+        )
+    except Exception:
+        compiled = False
+
+    if not compiled:
+        arrays["reaction_reactants"].append(0)
+        arrays["reaction_products"].append(0)
+        arrays["reaction_flags"].append(FLAG_TEXT)
+        return len(arrays["reaction_start"]) - 1
+
+    arrays["reaction_reactants"].append(len(parsed.reactant_compounds))
+    arrays["reaction_products"].append(len(parsed.product_compounds))
+    arrays["reaction_flags"].append(0)
+
+    for formula in parsed.reactant_compounds + parsed.product_compounds:
+        index, new = species.add(formula)
+        arrays["compound_species"].append(index)
+
+        if not new:
+            continue
+
+        compound = parsed.compounds[formula]
+        arrays["species_first"].append(len(arrays["composition_element"]))
+        arrays["species_size"].append(len(compound.elements))
+        arrays["species_charge"].append(compound.charge)
+
+        for element, count in zip(compound.elements, compound.counts):
+            if element not in elements:
+                elements[element] = len(elements)
+                element_start, element_length = pool.add(element)
+                arrays["element_start"].append(element_start)
+                arrays["element_length"].append(element_length)
+
+            arrays["composition_element"].append(elements[element])
+            arrays["composition_count"].append(count)
+
+    return len(arrays["reaction_start"]) - 1
+
+
+def compile_corpus(records, path, ph="a"):
+    """
+    It parses every distinct equation once and writes the compiled corpus
+    while the records are read
+
+    :param records: An iterable of equations or of (equation, ph) pairs
+    :param path: The file to write
+    :param ph: The pH of the equations given without one
+    :return: The number of records
+    """
+    species = _Species()
+    elements = {}
+    reactions = {}  # (equation, ph) -> index of the reaction
+
+    arrays = {
+        name: array(typecode) if typecode != "B" else bytearray()
+        for name, typecode in CORPUS_ARRAYS
+    }
+    arrays["pool"] = species.pool.data
+    arrays["species_start"] = species.start
+    arrays["species_length"] = species.length
+
+    def items():
+        for record in records:
+            equation, record_ph = (record, ph) if isinstance(record, str) \
+                else record
+
+            reaction = reactions.get((equation, record_ph))
+            if reaction is None:
+                if record_ph not in ("a", "b", "n"):
+                    raise ValueError(
+                        f"Unknown pH {record_ph!r}, expected 'a', 'b' or 'n'"
+                    )
+
+                reaction = reactions[(equation, record_ph)] = _add_reaction(
+                    arrays, species, elements, equation, record_ph
+                )
+
+            yield reaction
+
+    arrays["item_reaction"] = items()
+
+    return _write(path, CORPUS_MAGIC, CORPUS_ARRAYS, arrays)["item_reaction"]
+
+
+class CompiledCorpus(_MappedFile):
+    """
+    A compiled corpus mapped into memory. Every species is turned into a
+    Compound once, from its composition arrays, the first time a reaction
+    needs it. Reactions are addressed by their index in the reaction
+    arrays; len() and iteration cover the lines of the corpus.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: A file written by compile_corpus()
+        """
+        super().__init__(path, CORPUS_MAGIC, CORPUS_ARRAYS)
+
+        arrays = self._arrays
+        self._elements = [
+            self.text(start, length) for start, length in zip(
+                arrays["element_start"], arrays["element_length"]
+            )
+        ]
+        self._compounds = [None] * len(arrays["species_start"])
+
+    def __len__(self):
+        return len(self._arrays["item_reaction"])
+
+    @property
+    def reactions(self):
+        """
+        :return: The number of distinct reactions
+        """
+        return len(self._arrays["reaction_start"])
+
+    def equation(self, reaction):
+        """
+        :return: The equation of a reaction as it was compiled
+        """
+        arrays = self._arrays
+
+        return self.text(
+            arrays["reaction_start"][reaction],
+            arrays["reaction_length"][reaction]
+        )
+
+    def ph(self, reaction):
+        """
+        :return: The pH of a reaction ("a", "b" or "n")
+        """
+        return chr(self._arrays["reaction_ph"][reaction])
+
+    def compound(self, species):
+        """
+        :param species: The index of a species
+        :return: The interned Compound of the species
+        """
+        compound = self._compounds[species]
+
+        if compound is None:
+            arrays = self._arrays
+            first = arrays["species_first"][species]
+            end = first + arrays["species_size"][species]
+
+            elements = self._elements
+            counts = {
+                elements[element]: count for element, count in zip(
+                    arrays["composition_element"][first:end],
+                    arrays["composition_count"][first:end]
+                )
+            }
+
+            charge = arrays["species_charge"][species]
+            if charge > 0:
+                counts["Lp"] = charge
+            elif charge < 0:
+                counts["Ln"] = -charge
+
+            compound = self._compounds[species] = Compound.from_formula(
+                self.text(
+                    arrays["species_start"][species],
+                    arrays["species_length"][species]
+                ),
+                counts
+            )
+
+        return compound
+
+    def parsed(self, reaction):
+        """
+        :return: The ParsedReaction of a reaction, or None if it was not
+        compiled and has to be parsed from its equation
+        """
+        arrays = self._arrays
+        if arrays["reaction_flags"][reaction] & FLAG_TEXT:
+            return None
+
+        first = arrays["reaction_first"][reaction]
+        middle = first + arrays["reaction_reactants"][reaction]
+        end = middle + arrays["reaction_products"][reaction]
+
+        species = arrays["compound_species"]
+        compound = self.compound
+
+        return ParsedReaction.from_compounds(
+            [compound(s) for s in species[first:middle]],
+            [compound(s) for s in species[middle:end]]
+        )
+
+    def balance(self, reaction, solver="fraction", engine="oxidation"):
+        """
+        It balances one reaction and catches any error it raises, like
+        batch.balance_one()
+
+        :return: A BatchResult
+        """
+        equation = self.equation(reaction)
+        ph = self.ph(reaction)
+
+        try:
+            result = RedoxReaction(
+                equation, ph, solver, parsed=self.parsed(reaction)
+            ).balance_coefficients(engine)
+        except Exception as e:
+            return BatchResult(equation, ph, None, f"{type(e).__name__}: {e}")
+
+        return BatchResult(equation, ph, result, None)
+
+    def results(self, solver="fraction", engine="oxidation",
+                vectorized=False):
+        """
+        It balances every reaction once, when the first line that uses it
+        is reached, and yields the BatchResult of every line
+
+        :param solver: The solver passed to RedoxReaction
+        :param engine: The engine passed to balance_coefficients()
+        :param vectorized: True to balance every reaction up front with
+        vectorized.balance_vectorized(), see balance_corpus()
+        """
+        if vectorized:
+            from vectorized import balance_vectorized
+
+            reactions = range(self.reactions)
+            balanced = balance_vectorized(
+                [(self.equation(r), self.ph(r)) for r in reactions],
+                [self.parsed(r) for r in reactions]
+            )
+        else:
+            balanced = [None] * self.reactions
+
+        for reaction in self._arrays["item_reaction"]:
+            result = balanced[reaction]
+            if result is None:
+                result = balanced[reaction] = self.balance(
+                    reaction, solver, engine
+                )
+
+            yield result
+
+    def __iter__(self):
+        return self.results()
+
+
+def _add_result(arrays, species, result, error):
+    """
+    It appends a result to the arrays of a results file
+
+    :param arrays: The arrays of the results file by name
+    :param species: The _Species of the results file
+    :param result: A BalancedReaction, None if error is given
+    :param error: The error message, None if the reaction is balanced
+    :return: The index of the result
+    """
+    arrays["result_first"].append(len(arrays["term_species"]))
+
+    if error is not None:
+        start, length = species.pool.add(error)
+        arrays["result_error_start"].append(start)
+        arrays["result_error_length"].append(length)
+        arrays["result_reactants"].append(0)
+        arrays["result_products"].append(0)
+        return len(arrays["result_first"]) - 1
+
+    arrays["result_error_start"].append(0)
+    arrays["result_error_length"].append(0)
+    arrays["result_reactants"].append(len(result.reactants))
+    arrays["result_products"].append(len(result.products))
+
+    for side in result:
+        for formula, coefficient in side:
+            arrays["term_species"].append(species.add(formula)[0])
+            arrays["term_coefficient"].append(coefficient)
+
+    return len(arrays["result_first"]) - 1
+
+
+def write_results(results, path):
+    """
+    It writes BatchResults to a binary results file while they are
+    produced, storing every distinct result once. A coefficient larger
+    than MAX_COEFFICIENT is written as an error.
+
+    :param results: An iterable of BatchResults
+    :param path: The file to write
+    :return: A tuple of the number of results and the number of errors
+    """
+    species = _Species()
+    distinct = {}  # (BalancedReaction, error) -> index of the result
+    errors = []  # True for every distinct result that is an error
+    failed = 0
+
+    arrays = {name: array(typecode) for name, typecode in RESULT_ARRAYS}
+    arrays["pool"] = species.pool.data
+    arrays["species_start"] = species.start
+    arrays["species_length"] = species.length
+
+    def items():
+        nonlocal failed
+
+        for result in results:
+            key = (result.result, result.error)
+
+            index = distinct.get(key)
+            if index is None:
+                error = result.error
+                if error is None and any(
+                    coefficient > MAX_COEFFICIENT
+                    for side in result.result for _, coefficient in side
+                ):
+                    error = "OverflowError: a coefficient is too large to " \
+                        "be written"
+
+                index = distinct[key] = _add_result(
+                    arrays, species, result.result, error
+                )
+                errors.append(error is not None)
+
+            failed += errors[index]
+            yield index
+
+    arrays["item_result"] = items()
+
+    count = _write(
+        path, RESULT_MAGIC, RESULT_ARRAYS, arrays, ALGORITHM_VERSION
+    )["item_result"]
+
+    return (count, failed)
+
+
+class CompiledResults(_MappedFile):
+    """
+    A results file mapped into memory. len() and iteration cover the lines
+    of the corpus that was balanced.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: A file written by write_results()
+        :raises ValueError: If the results were balanced with another
+        ALGORITHM_VERSION
+        """
+        super().__init__(path, RESULT_MAGIC, RESULT_ARRAYS)
+
+        if self.algorithm != ALGORITHM_VERSION:
+            self.close()
+            raise ValueError(
+                f"{path} was balanced with algorithm version "
+                f"{self.algorithm}, expected {ALGORITHM_VERSION}; balance it "
+                f"again"
+            )
+
+        arrays = self._arrays
+        self._formulas = [
+            self.text(start, length) for start, length in zip(
+                arrays["species_start"], arrays["species_length"]
+            )
+        ]
+
+    def __len__(self):
+        return len(self._arrays["item_result"])
+
+    def error(self, index):
+        """
+        :return: The error message of a line, or None if it is balanced
+        """
+        arrays = self._arrays
+        result = arrays["item_result"][index]
+        length = arrays["result_error_length"][result]
+
+        return self.text(arrays["result_error_start"][result], length) \
+            if length else None
+
+    def result(self, index):
+        """
+        :return: The BalancedReaction of a line, or None if it is an error
+        """
+        arrays = self._arrays
+        result = arrays["item_result"][index]
+        if arrays["result_error_length"][result]:
+            return None
+
+        first = arrays["result_first"][result]
+        middle = first + arrays["result_reactants"][result]
+        end = middle + arrays["result_products"][result]
+
+        formulas = self._formulas
+        terms = [
+            (formulas[species], coefficient) for species, coefficient in zip(
+                arrays["term_species"][first:end],
+                arrays["term_coefficient"][first:end]
+            )
+        ]
+
+        return BalancedReaction(
+            tuple(terms[:middle - first]), tuple(terms[middle - first:])
+        )
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield (self.result(index), self.error(index))
+
+
+def balance_corpus(corpus_path, results_path, solver="fraction",
+                   engine="oxidation", vectorized=False):
+    """
+    It balances every distinct reaction of a compiled corpus once and
+    streams the result of every line to a results file
+
+    :param corpus_path: A file written by compile_corpus()
+    :param results_path: The results file to write
+    :param solver: The solver passed to RedoxReaction
+    :param engine: The engine passed to balance_coefficients()
+    :param vectorized: True to balance the reactions at once with
+    vectorized.balance_vectorized(), which gives the same results for the
+    "oxidation" engine and the "fraction" solver
+    :return: A tuple of the number of lines and the number that failed
+    """
+    if vectorized and (engine != "oxidation" or solver != "fraction"):
+        raise ValueError(
+            "Only the oxidation engine with the fraction solver can be "
+            "vectorized"
+        )
+
+    with CompiledCorpus(corpus_path) as corpus:
+        return write_results(
+            corpus.results(solver, engine, vectorized), results_path
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compile equation files and balance them from the "
+        "compiled file."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compile_parser = commands.add_parser(
+        "compile", help="compile a text file with one equation per line"
+    )
+    compile_parser.add_argument("input")
+    compile_parser.add_argument("output")
+    compile_parser.add_argument("--ph", choices=("a", "b", "n"), default="a")
+
+    balance_parser = commands.add_parser(
+        "balance", help="balance a compiled corpus into a results file"
+    )
+    balance_parser.add_argument("input")
+    balance_parser.add_argument("output")
+    balance_parser.add_argument(
+        "--solver", choices=SOLVERS, default="fraction"
+    )
+    balance_parser.add_argument(
+        "--engine", choices=ENGINES, default="oxidation"
+    )
+    balance_parser.add_argument(
+        "--vectorized",
+        action="store_true",
+        help="balance with NumPy, see vectorized.py"
+    )
+
+    show_parser = commands.add_parser(
+        "show", help="print a results file in the text format of cli.py"
+    )
+    show_parser.add_argument("input")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compile":
+        with open(args.input, encoding="utf-8") as lines:
+            count = compile_corpus(
+                (
+                    line.strip() for line in lines
+                    if line.strip() and not line.startswith("#")
+                ),
+                args.output,
+                args.ph
+            )
+
+        print(f"{count} equations compiled", file=sys.stderr)
+        return 0
+
+    if args.command == "balance":
+        count, failures = balance_corpus(
+            args.input, args.output, args.solver, args.engine,
+            args.vectorized
+        )
+
+        print(
+            f"{count} equations balanced, {failures} failed",
+            file=sys.stderr
+        )
+        return 1 if failures else 0
+
+    with CompiledResults(args.input) as results:
+        for result, error in results:
+            print(result.to_text() if error is None else f"ERROR {error}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""
+A compact, immutable representation of a parsed formula.
+
+Every element symbol is stored as a small integer index into a fixed
+periodic table and the counts are stored in an array of machine integers,
+instead of a dictionary of strings to floats as returned by chemparse. The
+charge, given by the "Lp" and "Ln" pseudo-elements, is computed once.
+
+Compounds are interned: Compound.from_formula() returns the same instance
+every time it is called with the same formula.
+"""
+
+from array import array
+from collections.abc import Mapping
+import sys
+import threading
+
+import instrumentation
+
+PERIODIC_TABLE = (
+    "H", "He", "Li", "Be", "B", "C", "N", "O", "F", "Ne",
+    "Na", "Mg", "Al", "Si", "P", "S", "Cl", "Ar", "K", "Ca",
+    "Sc", "Ti", "V", "Cr", "Mn", "Fe", "Co", "Ni", "Cu", "Zn",
+    "Ga", "Ge", "As", "Se", "Br", "Kr", "Rb", "Sr", "Y", "Zr",
+    "Nb", "Mo", "Tc", "Ru", "Rh", "Pd", "Ag", "Cd", "In", "Sn",
+    "Sb", "Te", "I", "Xe", "Cs", "Ba", "La", "Ce", "Pr", "Nd",
+    "Pm", "Sm", "Eu", "Gd", "Tb", "Dy", "Ho", "Er", "Tm", "Yb",
+    "Lu", "Hf", "Ta", "W", "Re", "Os", "Ir", "Pt", "Au", "Hg",
+    "Tl", "Pb", "Bi", "Po", "At", "Rn", "Fr", "Ra", "Ac", "Th",
+    "Pa", "U", "Np", "Pu", "Am", "Cm", "Bk", "Cf", "Es", "Fm",
+    "Md", "No", "Lr", "Rf", "Db", "Sg", "Bh", "Hs", "Mt", "Ds",
+    "Rg", "Cn", "Nh", "Fl", "Mc", "Lv", "Ts", "Og",
+)
+
+# the index of every symbol that is not in the periodic table. Only the
+# elements are interned, so arbitrary input cannot grow the symbol table.
+UNKNOWN_INDEX = len(PERIODIC_TABLE)
+
+_indices = {symbol: index for index, symbol in enumerate(PERIODIC_TABLE)}
+_lock = threading.Lock()
+
+# the interned compounds are dropped when there are more than this many, so
+# arbitrary input cannot grow the table without bound
+MAX_INTERNED = 65536
+
+
+def element_index(symbol):
+    """
+    :param symbol: An element symbol, e.g. "Fe"
+    :return: The index of the element, its atomic number minus one, or
+    UNKNOWN_INDEX if the symbol is not in the periodic table
+    """
+    return _indices.get(symbol, UNKNOWN_INDEX)
+
+
+def element_symbol(index):
+    """
+    :param index: An index returned by element_index() other than
+    UNKNOWN_INDEX
+    :return: The interned element symbol
+    """
+    return PERIODIC_TABLE[index]
+
+
+def is_known_element(symbol):
+    """
+    :param symbol: An element symbol
+    :return: True if the symbol is in the periodic table
+    """
+    return symbol in _indices
+
+
+class Compound(Mapping):
+    """
+    An immutable parsed formula. It reads like the dictionary returned by
+    chemparse: the keys are the element symbols in the order they appear in
+    the formula, followed by "Lp" or "Ln" if the compound is charged.
+
+    elements holds the symbols, indices their element indices and counts
+    the count of each element, all in formula order. The symbols of the
+    periodic table are interned; a symbol that is not in it, e.g. a typo,
+    is kept as written and has the index UNKNOWN_INDEX.
+    """
+
+    __slots__ = ("formula", "elements", "indices", "counts", "charge")
+
+    _interned = {}
+
+    def __init__(self, formula, counts):
+        """
+        Use Compound.from_formula() to get an interned compound.
+
+        :param formula: The formula of the compound, e.g. "MnO4Ln1"
+        :param counts: The dictionary of elements and counts returned by
+        redox_reaction.parse_formula() for the formula
+        """
+        charge = 0
+        elements = []
+        indices = array("H")
+        values = []
+
+        for key, value in counts.items():
+            if key == "Lp":
+                charge = value
+            elif key == "Ln":
+                charge = -value
+            else:
+                index = element_index(key)
+                elements.append(
+                    key if index == UNKNOWN_INDEX else PERIODIC_TABLE[index]
+                )
+                indices.append(index)
+                values.append(value)
+
+        if all(value == int(value) for value in values + [charge]):
+            values = [int(value) for value in values]
+            charge = int(charge)
+            typecode = "l"
+        else:
+            typecode = "d"
+
+        set_slot = object.__setattr__
+        set_slot(self, "formula", sys.intern(formula))
+        set_slot(self, "elements", tuple(elements))
+        set_slot(self, "indices", indices)
+        set_slot(self, "counts", array(typecode, values))
+        set_slot(self, "charge", charge)
+
+    @classmethod
+    def from_formula(cls, formula, counts=None):
+        """
+        It returns the interned compound of the formula, creating it the
+        first time the formula is seen
+
+        :param formula: The formula of the compound, e.g. "MnO4Ln1"
+        :param counts: The parsed formula, parsed with
+        redox_reaction.parse_formula() if omitted
+        :return: The Compound
+        """
+        compound = cls._interned.get(formula)
+
+        if compound is None:
+            if counts is None:
+                from redox_reaction import parse_formula
+
+                counts = parse_formula(formula)
+
+                if instrumentation.recorders:
+                    instrumentation.count("parse_formula_calls")
+
+            compound = cls(formula, counts)
+
+            with _lock:
+                if len(cls._interned) >= MAX_INTERNED:
+                    cls._interned.clear()
+
+                compound = cls._interned.setdefault(formula, compound)
+
+        return compound
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Compound is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Compound is immutable")
+
+    @property
+    def integral(self):
+        """
+        :return: True if every count and the charge are whole numbers
+        """
+        return self.counts.typecode == "l"
+
+    def _charge_key(self):
+        if self.charge > 0:
+            return "Lp"
+        elif self.charge < 0:
+            return "Ln"
+
+        return None
+
+    def __getitem__(self, key):
+        value = self.get(key)
+
+        if value is None:
+            raise KeyError(key)
+
+        return value
+
+    def get(self, key, default=None):
+        if key == "Lp":
+            return self.charge if self.charge > 0 else default
+        elif key == "Ln":
+            return -self.charge if self.charge < 0 else default
+
+        if key in self.elements:
+            return self.counts[self.elements.index(key)]
+
+        return default
+
+    def __contains__(self, key):
+        if key in self.elements:
+            return True
+
+        return self.get(key) is not None
+
+    def items(self):
+        items = list(zip(self.elements, self.counts))
+
+        charge_key = self._charge_key()
+        if charge_key is not None:
+            items.append((charge_key, abs(self.charge)))
+
+        return items
+
+    def __iter__(self):
+        yield from self.elements
+
+        charge_key = self._charge_key()
+        if charge_key is not None:
+            yield charge_key
+
+    def __len__(self):
+        return len(self.indices) + (self.charge != 0)
+
+    def __repr__(self):
+        return f"Compound({self.formula!r})"
+
+    def __reduce__(self):
+        return (Compound.from_formula, (self.formula, dict(self)))
@@ -0,0 +1,273 @@
+"""
+Store balanced reactions in a SQLite database on disk.
+
+Unlike cache.ReactionCache, the results survive restarts and are shared by
+every process that opens the same file, e.g. several Streamlit workers. The
+database runs in WAL mode so readers and writers in different processes do
+not block each other.
+
+The database records the layout of its tables (SCHEMA_VERSION) and every
+result records the version of the balancing algorithm that produced it
+(redox_reaction.ALGORITHM_VERSION). A database with another layout is
+rebuilt and results from another algorithm are discarded, so stale results
+are never returned after the balancing changes.
+
+Example:
+
+    from cache import ReactionCache
+    from disk_cache import DiskCache
+
+    cache = ReactionCache(store=DiskCache("results.sqlite3"))
+    result = cache.balance("FeLp2 + MnO4Ln1 -> FeLp3 + MnLp2", "a")
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+from redox_reaction import ALGORITHM_VERSION, BalancedReaction
+
+SCHEMA_VERSION = 1
+
+# the number of hits whose access times are written to the database at once
+ACCESS_BATCH = 64
+
+
+def dump_result(result):
+    """
+    :param result: A BalancedReaction
+    :return: The result as a compact JSON string
+    """
+    return json.dumps(
+        [result.reactants, result.products],
+        separators=(",", ":")
+    )
+
+
+def load_result(data):
+    """
+    :param data: A string returned by dump_result()
+    :return: The BalancedReaction
+    """
+    reactants, products = json.loads(data)
+
+    return BalancedReaction(
+        tuple((compound, coeff) for compound, coeff in reactants),
+        tuple((compound, coeff) for compound, coeff in products)
+    )
+
+
+class DiskCache:
+    """
+    A size capped store of BalancedReactions in a SQLite database, keyed on
+    the canonical equation and the pH. The least recently used results are
+    evicted when there are more than max_entries.
+
+    A hit only reads the database: the access times of hits are kept in
+    memory and written ACCESS_BATCH at a time, and the results over
+    max_entries are evicted once every max_entries // 100 puts instead of
+    on every put. The table can therefore hold up to 1% more results than
+    max_entries between two evictions.
+    """
+
+    def __init__(self, path, max_entries=100_000, timeout=30.0):
+        """
+        It opens the database and creates or upgrades its tables
+
+        :param path: The path of the database file
+        :param max_entries: The maximum number of stored results
+        :param timeout: The number of seconds to wait for a lock held by
+        another process
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+
+        self.path = path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+
+        # sqlite3 connections must not be shared between threads
+        self._local = threading.local()
+
+        # guards the statistics and everything below
+        self._lock = threading.Lock()
+        self._accessed = {}  # key -> time of a hit that is not written yet
+        self._puts = 0  # the puts since the last eviction
+        self._eviction_interval = max(1, max_entries // 100)
+
+        with self._connection() as connection:
+            self._create_tables(connection)
+
+    def _connection(self):
+        """
+        :return: The connection of the current thread
+        """
+        connection = getattr(self._local, "connection", None)
+
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+
+        return connection
+
+    def _create_tables(self, connection):
+        """
+        It creates the tables, rebuilds them if they were made with another
+        SCHEMA_VERSION and deletes results from another ALGORITHM_VERSION
+
+        :param connection: A sqlite3 connection
+        """
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS meta "
+            "(key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+
+        row = connection.execute(
+            "SELECT value FROM meta WHERE key = 'schema_version'"
+        ).fetchone()
+
+        if row is None or row[0] != SCHEMA_VERSION:
+            connection.execute("DROP TABLE IF EXISTS results")
+            connection.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)",
+                (SCHEMA_VERSION,)
+            )
+
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "equation TEXT NOT NULL, "
+            "ph TEXT NOT NULL, "
+            "algorithm INTEGER NOT NULL, "
+            "result TEXT NOT NULL, "
+            "accessed REAL NOT NULL, "
+            "PRIMARY KEY (equation, ph))"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS results_accessed "
+            "ON results (accessed)"
+        )
+        connection.execute(
+            "DELETE FROM results WHERE algorithm != ?",
+            (ALGORITHM_VERSION,)
+        )
+
+    def get(self, key, default=None):
+        """
+        :param key: A tuple of the canonical equation and the pH
+        :param default: The value returned if the key is not stored
+        :return: The stored BalancedReaction, or default
+        """
+        equation, ph = key
+
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT result FROM results "
+                "WHERE equation = ? AND ph = ? AND algorithm = ?",
+                (equation, ph, ALGORITHM_VERSION)
+            ).fetchone()
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self._accessed[(equation, ph)] = time.time()
+            full = len(self._accessed) >= ACCESS_BATCH
+
+        if full:
+            self._write_accessed()
+
+        return load_result(row[0])
+
+    def _write_accessed(self):
+        """
+        It writes the access times of the hits that have not been written
+        yet
+        """
+        with self._lock:
+            accessed, self._accessed = self._accessed, {}
+
+        if not accessed:
+            return
+
+        with self._connection() as connection:
+            connection.executemany(
+                "UPDATE results SET accessed = ? "
+                "WHERE equation = ? AND ph = ?",
+                [
+                    (when, equation, ph)
+                    for (equation, ph), when in accessed.items()
+                ]
+            )
+
+    def put(self, key, value):
+        """
+        It stores a result and, once every max_entries // 100 puts, evicts
+        the least recently used results over max_entries
+
+        :param key: A tuple of the canonical equation and the pH
+        :param value: A BalancedReaction
+        """
+        equation, ph = key
+
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (equation, ph, ALGORITHM_VERSION, dump_result(value),
+                 time.time())
+            )
+
+        with self._lock:
+            self._puts += 1
+            evict = self._puts >= self._eviction_interval
+            if evict:
+                self._puts = 0
+
+        if not evict:
+            return
+
+        # the eviction must see the recent hits
+        self._write_accessed()
+
+        with self._connection() as connection:
+            connection.execute(
+                "DELETE FROM results WHERE rowid IN ("
+                "SELECT rowid FROM results ORDER BY accessed LIMIT max(0, "
+                "(SELECT COUNT(*) FROM results) - ?))",
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        """
+        It deletes every stored result
+        """
+        with self._lock:
+            self._accessed = {}
+
+        with self._connection() as connection:
+            connection.execute("DELETE FROM results")
+
+    def __len__(self):
+        with self._connection() as connection:
+            return connection.execute(
+                "SELECT COUNT(*) FROM results"
+            ).fetchone()[0]
+
+    def close(self):
+        """
+        It writes the pending access times and closes the connection of the
+        current thread
+        """
+        self._write_accessed()
+
+        connection = getattr(self._local, "connection", None)
+
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
@@ -0,0 +1,139 @@
+"""
+A single pass tokenizer for the formulas used by this project.
+
+Grammar:
+
+    formula := group+
+    group   := (element | "(" formula ")" | "[" formula "]") count?
+    element := an uppercase letter followed by lowercase letters
+    count   := digits, optionally followed by "." and digits
+
+The pseudo-elements "Lp" and "Ln" give the positive and negative charge,
+e.g. "MnO4Ln1" is MnO4^-. Counts are returned as ints, except for decimal
+counts such as "C0.5", which are returned as floats like chemparse does.
+Elements are returned in the order they first appear in the formula.
+"""
+
+
+class FormulaError(ValueError):
+    """
+    The formula could not be parsed. position is the index of the offending
+    character in formula.
+    """
+
+    def __init__(self, message, formula, position):
+        self.message = message
+        self.formula = formula
+        self.position = position
+
+        super().__init__(
+            f"{message} at position {position} in {formula!r}"
+        )
+
+
+_CLOSING = {"(": ")", "[": "]"}
+
+
+def _read_count(formula, position):
+    """
+    It reads the count that starts at position, if there is one
+
+    :param formula: The formula
+    :param position: The index right after an element or a closing bracket
+    :return: A tuple of the count and the index after it
+    """
+    end = position
+    length = len(formula)
+
+    while end < length and "0" <= formula[end] <= "9":
+        end += 1
+
+    if end == position:
+        return (1, position)
+
+    if end < length and formula[end] == ".":
+        fraction_end = end + 1
+
+        while fraction_end < length and "0" <= formula[fraction_end] <= "9":
+            fraction_end += 1
+
+        if fraction_end == end + 1:
+            raise FormulaError("Expected a digit after '.'", formula, end + 1)
+
+        return (float(formula[position:fraction_end]), fraction_end)
+
+    return (int(formula[position:end]), end)
+
+
+def tokenize_formula(formula):
+    """
+    It parses a formula into its elements and their counts
+
+    :param formula: The formula of a compound, e.g. "Fe2(SO4)3" or "OHLn1"
+    :return: A dictionary of elements and their counts
+    :raises FormulaError: If the formula does not follow the grammar
+    """
+    if not formula:
+        raise FormulaError("Empty formula", formula, 0)
+
+    # one dictionary of counts for every open bracket
+    groups = [{}]
+    openings = []
+
+    position = 0
+    length = len(formula)
+
+    while position < length:
+        char = formula[position]
+
+        if "A" <= char <= "Z":
+            end = position + 1
+            while end < length and "a" <= formula[end] <= "z":
+                end += 1
+
+            element = formula[position:end]
+            count, position = _read_count(formula, end)
+
+            group = groups[-1]
+            group[element] = group.get(element, 0) + count
+
+        elif char in _CLOSING:
+            openings.append((char, position))
+            groups.append({})
+            position += 1
+
+        elif char == ")" or char == "]":
+            if not openings:
+                raise FormulaError(
+                    f"Unmatched {char!r}", formula, position
+                )
+
+            opening, opening_position = openings.pop()
+            if _CLOSING[opening] != char:
+                raise FormulaError(
+                    f"Expected {_CLOSING[opening]!r} to close {opening!r} "
+                    f"at position {opening_position}",
+                    formula,
+                    position
+                )
+
+            inner = groups.pop()
+            if not inner:
+                raise FormulaError("Empty group", formula, opening_position)
+
+            count, position = _read_count(formula, position + 1)
+
+            group = groups[-1]
+            for element, value in inner.items():
+                group[element] = group.get(element, 0) + value * count
+
+        else:
+            raise FormulaError(
+                f"Unexpected character {char!r}", formula, position
+            )
+
+    if openings:
+        opening, opening_position = openings[-1]
+        raise FormulaError(f"Unclosed {opening!r}", formula, opening_position)
+
+    return groups[0]
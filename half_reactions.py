@@ -0,0 +1,471 @@
+"""
+Balance a reaction by splitting it into half-reactions.
+
+The reaction is split into pairs of a reactant and a product that share an
+element other than H and O, e.g. MnO4- -> Mn2+ and Fe2+ -> Fe3+. A reactant
+and a product of only H and O, like H2O2 and O2, are paired when they are
+not part of a pair already, and such a species without a partner is paired
+with water, or with H+ if it has no O. H+, OH- and H2O written in the
+equation are not paired.
+
+Every pair is balanced on its own with the ion-electron method: the atoms
+with H2O and H+, the charge with electrons, and in basic solution the H+ is
+neutralized with OH-. The half-reactions are then multiplied so that the
+electrons given off equal the electrons taken up, using the least common
+multiple of their electrons, and added.
+
+A balanced half-reaction only depends on its two species and the pH, so it
+is cached and reused by every reaction that contains the pair. Use
+balance_half_reaction.cache_info() and balance_half_reaction.cache_clear()
+to inspect and clear the cache.
+
+Example:
+
+    from redox_reaction import RedoxReaction
+
+    for half in RedoxReaction("FeLp2 + MnO4Ln1 -> FeLp3 + MnLp2",
+                              "a").half_reactions():
+        print(half.to_text())
+
+    # FeLp2 -> FeLp3 + e-
+    # MnO4Ln1 + 8 HLp1 + 5 e- -> MnLp2 + 4 H2O
+"""
+
+from collections import namedtuple
+import functools
+import math
+
+from compound import Compound
+import instrumentation
+from instrumentation import timed
+from linear_balance import composition_matrix, integer_nullspace
+from redox_reaction import BalancedReaction
+from render import latex_renderer
+from validation import (
+    MISPLACED_SPECIES,
+    UNBALANCED_HALF_REACTION,
+    UNPAIRED_ELECTRONS,
+    ValidationError,
+    check_ph,
+)
+
+# the number of balanced half-reactions kept by balance_half_reaction()
+HALF_REACTION_CACHE_SIZE = 4096
+
+# the species the half-reactions are balanced with, in the order they are
+# added to a balanced reaction
+_MEDIUM = ("HLp1", "OHLn1", "H2O")
+
+# the parsed formula of an electron
+_ELECTRON = {"Ln": 1}
+
+
+class HalfReaction(
+    namedtuple("HalfReaction", ["reactants", "products", "electrons"])
+):
+    """
+    A balanced half-reaction. reactants and products are tuples of
+    (compound, coefficient) pairs like in a BalancedReaction, without the
+    electrons. electrons is the number of electrons taken up, negative when
+    they are given off.
+    """
+
+    __slots__ = ()
+
+    @property
+    def kind(self):
+        """
+        :return: "reduction" if electrons are taken up, else "oxidation"
+        """
+        return "reduction" if self.electrons > 0 else "oxidation"
+
+    def to_text(self):
+        """
+        :return: The half-reaction in the notation of the program with the
+        electrons as "e-", e.g. "FeLp2 -> FeLp3 + e-"
+        """
+        sides = []
+        for side, electrons in (
+            (self.reactants, self.electrons),
+            (self.products, -self.electrons),
+        ):
+            terms = [
+                compound if coefficient == 1
+                else f"{coefficient} {compound}"
+                for compound, coefficient in side
+            ]
+            if electrons > 0:
+                terms.append("e-" if electrons == 1 else f"{electrons} e-")
+
+            sides.append(" + ".join(terms))
+
+        return " -> ".join(sides)
+
+    def to_latex(self):
+        """
+        :return: The half-reaction as LaTeX, e.g.
+        "$ Fe^{2+} \\rightarrow Fe^{3+}+e^- $"
+        """
+        table = latex_renderer.table
+
+        sides = []
+        for side, electrons in (
+            (self.reactants, self.electrons),
+            (self.products, -self.electrons),
+        ):
+            text = latex_renderer.side(side)
+            if electrons > 0:
+                text += table["plus"] + (
+                    "e^-" if electrons == 1 else f"{electrons}e^-"
+                )
+
+            sides.append(text)
+
+        return table["begin"] + table["arrow"].join(sides) + table["end"]
+
+
+def _neutralize(terms, ph):
+    """
+    It rewrites terms balanced with H+ for the pH. In basic solution the H+
+    is neutralized with the same number of OH- on both sides, which form
+    water with it. In neutral solution that is only done if the H+ is on
+    the reactant side, so H+ or OH- ends up on the product side.
+
+    :param terms: A dictionary of signed coefficients, positive for
+    reactants, with the H+ under "HLp1" and the water under "H2O"
+    :param ph: The pH of the solution ("a", "b" or "n")
+    :return: The terms for the pH
+    """
+    protons = terms.get("HLp1", 0)
+
+    if ph == "b" and protons or ph == "n" and protons > 0:
+        terms = dict(terms)
+        del terms["HLp1"]
+        terms["OHLn1"] = terms.get("OHLn1", 0) - protons
+        terms["H2O"] = terms.get("H2O", 0) + protons
+
+    return terms
+
+
+def _signed_terms(half):
+    """
+    :param half: A HalfReaction
+    :return: A dictionary of its signed coefficients, positive for
+    reactants
+    """
+    terms = {}
+    for compound, coefficient in half.reactants:
+        terms[compound] = terms.get(compound, 0) + coefficient
+    for compound, coefficient in half.products:
+        terms[compound] = terms.get(compound, 0) - coefficient
+
+    return terms
+
+
+@functools.lru_cache(maxsize=HALF_REACTION_CACHE_SIZE)
+def balance_half_reaction(reactants, products, ph):
+    """
+    It balances the half-reaction of some reactants and products with H2O,
+    H+ or OH- and electrons
+
+    :param reactants: A tuple of the formulas of the reactants, e.g.
+    ("MnO4Ln1",)
+    :param products: A tuple of the formulas of the products, e.g.
+    ("MnLp2",)
+    :param ph: The pH of the solution ("a", "b" or "n")
+    :return: A HalfReaction. The H2O, H+ and OH- come after the reactants
+    and the products.
+    """
+    check_ph(ph)
+
+    if instrumentation.recorders:
+        instrumentation.count("half_reactions_balanced")
+
+    written = reactants + products
+    name = " + ".join(reactants) + " -> " + " + ".join(products)
+
+    # species of only H and O are balanced by their O, so water is only
+    # added if another element is part of the half-reaction
+    medium = ("HLp1", "H2O") if any(
+        element != "H" and element != "O"
+        for compound in written
+        for element in Compound.from_formula(compound).elements
+    ) else ("HLp1",)
+
+    species = written + tuple(
+        compound for compound in medium if compound not in written
+    )
+    signs = [1] * len(reactants) + [-1] * len(products) \
+        + [1] * (len(species) - len(written))
+
+    basis = integer_nullspace(composition_matrix(
+        [
+            (Compound.from_formula(compound), sign)
+            for compound, sign in zip(species, signs)
+        ]
+        + [(_ELECTRON, 1)]
+    ))
+
+    if len(basis) != 1:
+        raise ValidationError(
+            UNBALANCED_HALF_REACTION,
+            f"{name} cannot be balanced as a half-reaction",
+            name
+        )
+
+    vector = basis[0]
+    if vector[0] < 0:
+        vector = [-value for value in vector]
+
+    if any(value <= 0 for value in vector[:len(written)]):
+        raise ValidationError(
+            UNBALANCED_HALF_REACTION,
+            f"{name} cannot be balanced as a half-reaction",
+            name
+        )
+
+    *coefficients, electrons = vector
+    if not electrons:
+        raise ValidationError(
+            UNBALANCED_HALF_REACTION,
+            f"{name} does not transfer any electrons",
+            name
+        )
+
+    terms = {}
+    for compound, sign, coefficient in zip(species, signs, coefficients):
+        terms[compound] = sign * coefficient
+
+    terms = _neutralize(terms, ph)
+
+    return HalfReaction(
+        tuple(
+            (compound, coefficient)
+            for compound, coefficient in terms.items() if coefficient > 0
+        ),
+        tuple(
+            (compound, -coefficient)
+            for compound, coefficient in terms.items() if coefficient < 0
+        ),
+        electrons
+    )
+
+
+def split_species(parsed):
+    """
+    It groups the reactants and products of a reaction into the species of
+    its half-reactions. Species are grouped if they share an element other
+    than H and O, directly or through other species of the group.
+
+    :param parsed: The ParsedReaction of the equation
+    :return: A list of (reactants, products) pairs of tuples of formulas
+    """
+    reactants = [
+        compound for compound in dict.fromkeys(parsed.reactant_compounds)
+        if compound not in _MEDIUM
+    ]
+    products = [
+        compound for compound in dict.fromkeys(parsed.product_compounds)
+        if compound not in _MEDIUM
+    ]
+
+    # the groups are merged with a union-find over the shared elements
+    parent = {}
+
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+
+        return key
+
+    species_keys = {}
+    for compound in reactants + products:
+        keys = [
+            element for element in parsed.counts_for(compound).elements
+            if element != "H" and element != "O"
+        ]
+        species_keys[compound] = keys
+
+        for key in keys:
+            parent.setdefault(key, key)
+
+        for key in keys[1:]:
+            parent[find(key)] = find(keys[0])
+
+    groups = {}
+    loose = ([], [])
+    for side, compounds in enumerate((reactants, products)):
+        for compound in compounds:
+            keys = species_keys[compound]
+            if keys:
+                groups.setdefault(find(keys[0]), ([], []))[side].append(
+                    compound
+                )
+            else:
+                loose[side].append(compound)
+
+    # species of only H and O are grouped with each other, or with water
+    # or H+ if they contain no O
+    def partner(compound):
+        return "H2O" if "O" in parsed.counts_for(compound) else "HLp1"
+
+    loose_reactants, loose_products = loose
+    pairs = [
+        (tuple(group_reactants), tuple(group_products))
+        for group_reactants, group_products in groups.values()
+    ]
+
+    if loose_reactants and loose_products:
+        pairs += [
+            ((reactant,), (product,))
+            for reactant in loose_reactants
+            for product in loose_products
+        ]
+    else:
+        pairs += [
+            ((reactant,), (partner(reactant),))
+            for reactant in loose_reactants
+        ]
+        pairs += [
+            ((partner(product),), (product,))
+            for product in loose_products
+        ]
+
+    for group_reactants, group_products in pairs:
+        if not group_reactants or not group_products:
+            species = (group_reactants + group_products)[0]
+
+            raise ValidationError(
+                UNBALANCED_HALF_REACTION,
+                f"{species} is not part of any half-reaction",
+                species
+            )
+
+    return pairs
+
+
+def half_reactions(parsed, ph):
+    """
+    It balances every group of split_species() as one half-reaction. A
+    group that has no unique solution, like Cl2 -> Cl- + ClO3-, is split
+    into the half-reactions of every reactant and product of the group
+    that share an element.
+
+    :param parsed: The ParsedReaction of the equation
+    :param ph: The pH of the solution ("a", "b" or "n")
+    :return: A tuple of the balanced HalfReactions of the reaction
+    """
+    halves = []
+    for reactants, products in split_species(parsed):
+        try:
+            halves.append(balance_half_reaction(reactants, products, ph))
+        except ValidationError:
+            halves.extend(
+                balance_half_reaction((reactant,), (product,), ph)
+                for reactant in reactants
+                for product in products
+                if set(parsed.counts_for(reactant).elements)
+                & set(parsed.counts_for(product).elements) - {"H", "O"}
+            )
+
+    return tuple(halves)
+
+
+@timed("half")
+def balance_half_reactions(parsed, ph):
+    """
+    It balances the reaction by adding its half-reactions, multiplied so
+    that the electrons given off equal the electrons taken up
+
+    :param parsed: The ParsedReaction of the equation
+    :param ph: The pH of the solution ("a", "b" or "n")
+    :return: A BalancedReaction
+    """
+    check_ph(ph)
+
+    # the half-reactions are added in acid, so H+ and water cancel out,
+    # and the sum is rewritten for the pH
+    halves = half_reactions(parsed, "a")
+
+    reductions = [half for half in halves if half.electrons > 0]
+    oxidations = [half for half in halves if half.electrons < 0]
+
+    if not reductions or not oxidations:
+        raise ValidationError(
+            UNPAIRED_ELECTRONS,
+            "The reaction needs both an oxidation and a reduction "
+            "half-reaction"
+        )
+
+    # every reduction takes up and every oxidation gives off the same
+    # number of electrons, so the total taken up equals the total given off
+    multiple = math.lcm(*(abs(half.electrons) for half in halves))
+
+    terms = {}
+    for half in halves:
+        if half.electrons > 0:
+            scale = len(oxidations) * multiple // half.electrons
+        else:
+            scale = len(reductions) * multiple // -half.electrons
+
+        for compound, coefficient in _signed_terms(half).items():
+            terms[compound] = terms.get(compound, 0) + scale * coefficient
+
+    divisor = math.gcd(*terms.values())
+    terms = {compound: value // divisor for compound, value in terms.items()}
+
+    if ph == "n":
+        # H+ or OH- is preferably added to the products, like the matrix
+        # engine does
+        try:
+            return _balanced_reaction(parsed, _neutralize(terms, ph))
+        except ValidationError:
+            return _balanced_reaction(parsed, terms)
+
+    return _balanced_reaction(parsed, _neutralize(terms, ph))
+
+
+def _balanced_reaction(parsed, terms):
+    """
+    :param parsed: The ParsedReaction of the equation
+    :param terms: A dictionary of the signed coefficients of the summed
+    half-reactions, positive for reactants
+    :return: A BalancedReaction with the compounds in the order they are
+    written and the added H+, OH- and H2O last
+    """
+    reactants = []
+    for compound in parsed.reactant_compounds:
+        if terms.get(compound, 0) <= 0:
+            raise ValidationError(
+                MISPLACED_SPECIES,
+                f"The half-reactions do not leave {compound} as a reactant",
+                compound
+            )
+
+        reactants.append((compound, terms[compound]))
+
+    products = []
+    for compound in parsed.product_compounds:
+        if terms.get(compound, 0) >= 0:
+            raise ValidationError(
+                MISPLACED_SPECIES,
+                f"The half-reactions do not leave {compound} as a product",
+                compound
+            )
+
+        products.append((compound, -terms[compound]))
+
+    written = set(parsed.reactant_compounds + parsed.product_compounds)
+    for compound in _MEDIUM:
+        coefficient = terms.get(compound, 0)
+
+        if compound in written or not coefficient:
+            continue
+
+        if coefficient > 0:
+            reactants.append((compound, coefficient))
+        else:
+            products.append((compound, -coefficient))
+
+    return BalancedReaction(tuple(reactants), tuple(products))
@@ -0,0 +1,279 @@
+"""
+Opt-in timing and counters for the balancing.
+
+Nothing is recorded unless a recorder is active. While one is, every stage
+of the balancing reports its wall time and the balancer reports how many
+formulas it parsed, how many oxidation numbers it solved and how often the
+caches were hit. Without an active recorder each instrumented call only
+checks that `recorders` is empty.
+
+Example:
+
+    from instrumentation import instrument
+
+    with instrument() as metrics:
+        RedoxReaction("FeLp2 + MnO4Ln1 -> FeLp3 + MnLp2", "a").balance()
+
+    print(metrics.snapshot())
+    metrics.write_prometheus("/var/lib/node_exporter/redox.prom")
+
+A recorder is any object with a stage(name, seconds) and a
+count(name, amount) method, so the events can also be passed on to other
+metrics systems, e.g. with Callbacks(on_stage=..., on_count=...).
+"""
+
+from contextlib import contextmanager
+import functools
+import os
+import threading
+import time
+
+# the active recorders, every event is passed to each of them. The tuple is
+# replaced rather than changed, so it can be read without the lock.
+recorders = ()
+
+_lock = threading.Lock()
+
+# the time spent in nested stages, per thread, so every stage reports the
+# time spent in itself and not in the stages it calls
+_local = threading.local()
+
+# the help text of the counters in the Prometheus export
+COUNTERS = {
+    "reactions_parsed": "Equations split into compounds and parsed.",
+    "compounds_parsed": "Distinct compounds parsed per equation.",
+    "parse_formula_calls": "Formulas tokenized by parse_formula().",
+    "compounds_processed": "Compounds assigned oxidation numbers.",
+    "elements_processed": "Elements assigned an oxidation number.",
+    "solve_calls": "Oxidation numbers solved.",
+    "sympy_solve_calls": "Oxidation numbers solved with sympy.solve().",
+    "oxidation_table_hits": "Compounds found in the oxidation state table.",
+    "oxidation_table_misses": "Compounds not in the oxidation state table.",
+    "reactions_rejected": "Equations rejected by the validation.",
+    "half_reactions_balanced": "Half-reactions balanced, not from the cache.",
+    "reaction_cache_hits": "Reactions found in the in-memory cache.",
+    "reaction_cache_misses": "Reactions not found in the in-memory cache.",
+    "store_hits": "Reactions found in the second level store.",
+    "store_misses": "Reactions not found in the second level store.",
+}
+
+
+class Recorder:
+    """
+    A recorder that ignores every event. Subclasses override the events
+    they are interested in.
+    """
+
+    def stage(self, name, seconds):
+        """
+        :param name: The name of the stage, e.g. "parse"
+        :param seconds: The wall time spent in the stage itself
+        """
+
+    def count(self, name, amount):
+        """
+        :param name: The name of the counter, e.g. "solve_calls"
+        :param amount: The amount the counter is increased by
+        """
+
+
+class Callbacks(Recorder):
+    """
+    A recorder that passes every event on to callbacks.
+    """
+
+    def __init__(self, on_stage=None, on_count=None):
+        """
+        :param on_stage: Called with the name of the stage and the seconds
+        :param on_count: Called with the name of the counter and the amount
+        """
+        self.on_stage = on_stage
+        self.on_count = on_count
+
+    def stage(self, name, seconds):
+        if self.on_stage is not None:
+            self.on_stage(name, seconds)
+
+    def count(self, name, amount):
+        if self.on_count is not None:
+            self.on_count(name, amount)
+
+
+class Metrics(Recorder):
+    """
+    A thread safe recorder that sums the time and the number of calls of
+    every stage and the value of every counter.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage_seconds = {}
+        self.stage_calls = {}
+        self.counters = {}
+
+    def stage(self, name, seconds):
+        with self._lock:
+            seconds += self.stage_seconds.get(name, 0)
+            self.stage_seconds[name] = seconds
+            self.stage_calls[name] = self.stage_calls.get(name, 0) + 1
+
+    def count(self, name, amount):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self):
+        """
+        It sets every stage and counter back to zero
+        """
+        with self._lock:
+            self.stage_seconds.clear()
+            self.stage_calls.clear()
+            self.counters.clear()
+
+    def snapshot(self):
+        """
+        :return: A dictionary with copies of "stage_seconds", "stage_calls"
+        and "counters"
+        """
+        with self._lock:
+            return {
+                "stage_seconds": dict(self.stage_seconds),
+                "stage_calls": dict(self.stage_calls),
+                "counters": dict(self.counters),
+            }
+
+    def to_prometheus(self, prefix="redox"):
+        """
+        :param prefix: The prefix of every metric name
+        :return: The metrics in the Prometheus text exposition format
+        """
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_stage_seconds_total "
+            "Wall time spent in each balancing stage.",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        for name, seconds in sorted(snapshot["stage_seconds"].items()):
+            lines.append(
+                f'{prefix}_stage_seconds_total{{stage="{name}"}} {seconds!r}'
+            )
+
+        lines += [
+            f"# HELP {prefix}_stage_calls_total "
+            "Calls of each balancing stage.",
+            f"# TYPE {prefix}_stage_calls_total counter",
+        ]
+        for name, calls in sorted(snapshot["stage_calls"].items()):
+            lines.append(
+                f'{prefix}_stage_calls_total{{stage="{name}"}} {calls}'
+            )
+
+        for name, value in sorted(snapshot["counters"].items()):
+            metric = f"{prefix}_{name}_total"
+            lines += [
+                f"# HELP {metric} {COUNTERS.get(name, name)}",
+                f"# TYPE {metric} counter",
+                f"{metric} {value}",
+            ]
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, prefix="redox"):
+        """
+        It writes the metrics to a file, e.g. for the textfile collector of
+        the Prometheus node exporter. The file is replaced atomically, so a
+        scrape never reads a partly written file.
+
+        :param path: The path of the file
+        :param prefix: The prefix of every metric name
+        """
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus(prefix))
+
+        os.replace(temporary, path)
+
+
+def add_recorder(recorder):
+    """
+    :param recorder: The recorder that receives every event from now on
+    """
+    global recorders
+
+    with _lock:
+        recorders = recorders + (recorder,)
+
+
+def remove_recorder(recorder):
+    """
+    :param recorder: A recorder passed to add_recorder()
+    """
+    global recorders
+
+    with _lock:
+        remaining = list(recorders)
+        remaining.remove(recorder)
+        recorders = tuple(remaining)
+
+
+@contextmanager
+def instrument(recorder=None):
+    """
+    It records every event inside the with block
+
+    :param recorder: The recorder, a new Metrics if omitted
+    :return: The recorder
+    """
+    if recorder is None:
+        recorder = Metrics()
+
+    add_recorder(recorder)
+    try:
+        yield recorder
+    finally:
+        remove_recorder(recorder)
+
+
+def count(name, amount=1):
+    """
+    It passes a counter event to every active recorder. Callers check that
+    `recorders` is not empty first.
+
+    :param name: The name of the counter
+    :param amount: The amount the counter is increased by
+    """
+    for recorder in recorders:
+        recorder.count(name, amount)
+
+
+def timed(name):
+    """
+    A decorator that reports the wall time of every call of the function as
+    the stage `name`, excluding the time spent in other timed stages it
+    calls.
+
+    :param name: The name of the stage
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not recorders:
+                return function(*args, **kwargs)
+
+            nested = _local.__dict__.setdefault("nested", [])
+            nested.append(0.0)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                inner = nested.pop()
+                if nested:
+                    nested[-1] += elapsed
+
+                for recorder in recorders:
+                    recorder.stage(name, elapsed - inner)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,228 @@
+"""
+Balance a reaction by solving its composition matrix.
+
+Every species in the reaction is a column and every element, plus the
+charge, is a row of the composition matrix. Reactants count positively and
+products negatively. H+, OH- and H2O are added as columns whose side is
+unknown, depending on the pH:
+
+    - acid: H+ and H2O
+    - base: OH- and H2O
+    - neutral: H+ or OH- on the product side, and H2O
+
+The balanced coefficients are the smallest positive integer vector in the
+nullspace of the matrix. The nullspace is found with fraction-free integer
+elimination, so every step is exact and no rational arithmetic is needed.
+Unlike the oxidation number engine this also balances species of only H
+and O, like H2O2 and O2, and never needs the oxidation numbers.
+"""
+
+from fractions import Fraction
+import math
+
+from instrumentation import timed
+from redox_reaction import BalancedReaction
+from validation import NO_UNIQUE_SOLUTION, ValidationError, check_ph
+
+# the species that may be added to balance the reaction, by pH
+ADDED_SPECIES = {
+    "a": [("HLp1", "H2O")],
+    "b": [("OHLn1", "H2O")],
+    "n": [("HLp1", "H2O"), ("OHLn1", "H2O")],
+}
+
+
+def _normalize(vector):
+    """
+    :param vector: A list of ints
+    :return: The vector divided by the greatest common divisor of its
+    entries
+    """
+    divisor = math.gcd(*vector)
+
+    if divisor > 1:
+        return [value // divisor for value in vector]
+
+    return vector
+
+
+def integer_nullspace(matrix):
+    """
+    It finds a basis of the nullspace of an integer matrix with fraction-free
+    Gauss-Jordan elimination. Every row is divided by the greatest common
+    divisor of its entries after each step to keep the numbers small.
+
+    :param matrix: A list of rows, each a list of ints of the same length
+    :return: A list of nullspace basis vectors, each a list of ints with no
+    common divisor
+    """
+    rows = [list(row) for row in matrix]
+    column_count = len(rows[0]) if rows else 0
+
+    pivot_columns = []
+    for column in range(column_count):
+        pivot_row = len(pivot_columns)
+
+        for row_index in range(pivot_row, len(rows)):
+            if rows[row_index][column]:
+                break
+        else:
+            continue
+
+        rows[pivot_row], rows[row_index] = rows[row_index], rows[pivot_row]
+        pivot = rows[pivot_row]
+
+        for row_index, row in enumerate(rows):
+            if row_index != pivot_row and row[column]:
+                a, b = pivot[column], row[column]
+                rows[row_index] = _normalize(
+                    [a * y - b * x for x, y in zip(pivot, row)]
+                )
+
+        pivot_columns.append(column)
+
+    basis = []
+    for free_column in range(column_count):
+        if free_column in pivot_columns:
+            continue
+
+        multiple = math.lcm(*(
+            abs(rows[row_index][column])
+            for row_index, column in enumerate(pivot_columns)
+        )) if pivot_columns else 1
+
+        vector = [0] * column_count
+        vector[free_column] = multiple
+        for row_index, column in enumerate(pivot_columns):
+            vector[column] = (
+                -rows[row_index][free_column] * multiple
+                // rows[row_index][column]
+            )
+
+        basis.append(_normalize(vector))
+
+    return basis
+
+
+def composition_matrix(species_counts):
+    """
+    It builds the integer composition matrix of the species. Fractional
+    counts are made whole by scaling the row they appear in.
+
+    :param species_counts: A list of (counts, sign) pairs, where counts is
+    a parsed formula and sign is 1 for reactants and -1 for products
+    :return: A list of rows, one for each element and one for the charge
+    """
+    elements = {}
+    for counts, _ in species_counts:
+        for key in counts:
+            if key != "Lp" and key != "Ln":
+                elements[key] = None
+
+    rows = []
+    for element in list(elements) + ["charge"]:
+        row = []
+        for counts, sign in species_counts:
+            if element == "charge":
+                value = counts.get("Lp", 0) - counts.get("Ln", 0)
+            else:
+                value = counts.get(element, 0)
+
+            row.append(sign * Fraction(value))
+
+        multiple = math.lcm(*(value.denominator for value in row))
+        rows.append([int(value * multiple) for value in row])
+
+    return rows
+
+
+def _solve(parsed, added_species):
+    """
+    It solves the reaction with the given species added
+
+    :param parsed: The ParsedReaction of the equation
+    :param added_species: A tuple of the formulas of the added species.
+    Species that are already part of the equation are not added again.
+    :return: A tuple of the species that were added and the coefficients of
+    the species in the order of the columns, the added species last. Added
+    species on the product side have negative coefficients. None if the
+    reaction has no unique solution with positive coefficients.
+    """
+    compounds = parsed.reactant_compounds + parsed.product_compounds
+    added_species = tuple(
+        compound for compound in added_species if compound not in compounds
+    )
+
+    species_counts = (
+        [(parsed.counts_for(c), 1) for c in parsed.reactant_compounds]
+        + [(parsed.counts_for(c), -1) for c in parsed.product_compounds]
+        + [(parsed.counts_for(c), 1) for c in added_species]
+    )
+
+    basis = integer_nullspace(composition_matrix(species_counts))
+    if len(basis) != 1:
+        return None
+
+    vector = basis[0]
+    if vector[0] < 0:
+        vector = [-value for value in vector]
+
+    fixed_count = len(species_counts) - len(added_species)
+    if any(value <= 0 for value in vector[:fixed_count]):
+        return None
+
+    return (added_species, vector)
+
+
+@timed("matrix")
+def balance_matrix(parsed, ph):
+    """
+    It balances the reaction by solving its composition matrix
+
+    :param parsed: The ParsedReaction of the equation
+    :param ph: The pH of the solution ("a", "b" or "n")
+    :return: A BalancedReaction
+    :raises ValidationError: If the pH is unknown or the matrix has no
+    unique positive solution
+    """
+    check_ph(ph)
+
+    reactant_count = len(parsed.reactant_compounds)
+    fixed_count = reactant_count + len(parsed.product_compounds)
+
+    solutions = []
+    for added_species in ADDED_SPECIES[ph]:
+        solution = _solve(parsed, added_species)
+
+        if solution is not None:
+            solutions.append(solution)
+
+    if not solutions:
+        raise ValidationError(
+            NO_UNIQUE_SOLUTION,
+            "The reaction cannot be balanced with a unique set of "
+            "positive coefficients"
+        )
+
+    # in neutral solution H+ or OH- is preferably added to the products
+    added_species, vector = next(
+        (
+            (added_species, vector) for added_species, vector in solutions
+            if len(vector) == fixed_count or vector[fixed_count] <= 0
+        ),
+        solutions[0]
+    )
+
+    reactants = list(zip(parsed.reactant_compounds, vector[:reactant_count]))
+    products = list(zip(
+        parsed.product_compounds,
+        vector[reactant_count:fixed_count]
+    ))
+
+    for compound, coefficient in zip(added_species, vector[fixed_count:]):
+        if coefficient > 0:
+            reactants.append((compound, coefficient))
+        elif coefficient < 0:
+            products.append((compound, -coefficient))
+
+    return BalancedReaction(tuple(reactants), tuple(products))
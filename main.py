@@ -1,7 +1,45 @@
+import time
+
 import streamlit as st
 
 from redox_reaction import RedoxReaction
 
+
+@st.experimental_memo(max_entries=1024)
+def balance_equation(unbalanced_equation, ph, _reaction=None):
+    """
+    It balances and formats the equation. Streamlit memoizes the result per
+    (unbalanced_equation, ph) across reruns and sessions, so the reaction is
+    only balanced the first time it is requested.
+
+    :param unbalanced_equation: The unbalanced equation
+    :param ph: The pH of the solution ("a", "b" or "n")
+    :param _reaction: The RedoxReaction of the session, which is updated
+    so only the compounds that changed since the last rerun are processed
+    again. The leading underscore keeps Streamlit from hashing it.
+    :return: A tuple of the balanced equation, the formatted unbalanced
+    equation, the seconds it took to compute them and the time they were
+    computed at
+    """
+    start = time.perf_counter()
+
+    if _reaction is None:
+        equation = RedoxReaction(unbalanced_equation, ph)
+    else:
+        equation = _reaction
+        equation.update(unbalanced_equation, ph)
+
+    balanced_equation = equation.balance()
+    unbalanced_equation_output = equation.format_unbalanced_equation()
+
+    return (
+        balanced_equation,
+        unbalanced_equation_output,
+        time.perf_counter() - start,
+        time.time()
+    )
+
+
 st.title("Afstem en redoxreaktion")
 
 st.markdown(
@@ -10,8 +48,10 @@ st.markdown(
     oxidationstallet +1 og at O altid har oxidationstallet -2. Denne regel
     bliver for eksempel brudt ved peroxider, hvor O har oxidationstallet
     -1, eller i metalforbindelser, hvor H har oxidationstallet -1.
-    I sådanne tilfælde tager programmet ***IKKE*** højde for
-    uregelmæssigheden og vil sandsynligvis give en fejl.
+    Programmet kender dog oxidationstallene for en række almindelige
+    stoffer, fx peroxider og metalhydrider, fra tabellen i
+    oxidation_states.txt. For andre stoffer tager programmet ***IKKE***
+    højde for uregelmæssigheden og vil sandsynligvis give en fejl.
 
     Da programmet adskiller molekylerne fra hinanden med tegnet "+",
     kan "+"-tegnet ikke også bruges til at beskrive molekylets ladning.
@@ -41,10 +81,20 @@ elif ph_choice == "Basisk":
 else:
     ph = "n"
 
-equation = RedoxReaction(unbalanced_equation, ph)
+if "reaction" not in st.session_state:
+    st.session_state["reaction"] = RedoxReaction(unbalanced_equation, ph)
 
-balanced_equation = equation.balance()
-unbalanced_equation_output = equation.format_unbalanced_equation()
+requested_at = time.time()
+
+(balanced_equation,
+ unbalanced_equation_output,
+ compute_time,
+ computed_at) = balance_equation(
+    unbalanced_equation, ph, st.session_state["reaction"]
+)
+
+# a result computed before it was requested came from the cache
+from_cache = computed_at < requested_at
 
 st.header("Ikke-afstemt reaktion:")
 
@@ -53,3 +103,8 @@ st.markdown(unbalanced_equation_output)
 st.header("Afstemt reaktion:")
 
 st.markdown(balanced_equation)
+
+st.caption(
+    f"Beregningstid: {compute_time * 1000:.2f} ms "
+    + ("(hentet fra cache)" if from_cache else "(beregnet nu)")
+)
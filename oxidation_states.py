@@ -0,0 +1,196 @@
+"""
+A table of the oxidation states of known species.
+
+RedoxReaction derives oxidation numbers from the rule that H is +1 and O
+is -2, which is wrong for peroxides and metal hydrides. Species in the
+table get their oxidation numbers from the table instead, with either
+solver, which also saves the solver work for common ions like MnO4- and
+Cr2O7 2-. An empty OxidationStateTable() leaves every species to the
+solver.
+
+The table is read from oxidation_states.txt when this module is imported.
+More species can be added from code or from files in the same format:
+
+    from oxidation_states import default_table
+
+    default_table.add("SrO2", {"Sr": 2, "O": -1})
+    default_table.load("my_species.txt")
+
+    default_table.hits, default_table.misses
+
+Every entry is checked: it must give a state to every element of the
+formula, and the states must add up to the charge.
+"""
+
+from fractions import Fraction
+import os
+import re
+import threading
+
+from compound import Compound
+
+DEFAULT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "oxidation_states.txt"
+)
+
+_STATE = re.compile(r"([A-Z][a-z]*)([+-]?\d+(?:/\d+)?)$")
+
+
+def _number(value):
+    """
+    :return: The value as an int if it is whole, otherwise as a Fraction
+    """
+    if type(value) is int:
+        return value
+    if type(value) is str and "/" not in value:
+        return int(value)
+
+    value = Fraction(value)
+
+    return value.numerator if value.denominator == 1 else value
+
+
+class OxidationStateTable:
+    """
+    A mapping of formulas to the oxidation state of every element per atom.
+    """
+
+    def __init__(self, *paths):
+        """
+        :param paths: Files to load, see load()
+        """
+        self._states = {}  # formula -> {element: state}
+        self._lock = threading.Lock()  # guards hits and misses
+        self.hits = 0
+        self.misses = 0
+
+        for path in paths:
+            self.load(path)
+
+    def add(self, formula, states):
+        """
+        It adds a species, replacing an earlier entry for the formula
+
+        :param formula: The formula as entered in RedoxReaction, e.g.
+        "MnO4Ln1"
+        :param states: A dictionary of the oxidation state of every element
+        per atom, e.g. {"Mn": 7, "O": -2}. Fractions are allowed.
+        """
+        compound = Compound.from_formula(formula)
+        states = {element: _number(state) for element, state in states.items()}
+
+        if set(states) != set(compound.elements):
+            raise ValueError(
+                f"The oxidation states of {formula} must be given for "
+                f"exactly {', '.join(compound.elements)}"
+            )
+
+        total = sum(state * compound[element]
+                    for element, state in states.items())
+        if total != compound.charge:
+            raise ValueError(
+                f"The oxidation states of {formula} add up to {total}, "
+                f"not to its charge {compound.charge}"
+            )
+
+        self._states[compound.formula] = states
+
+    def loads(self, text, source="<string>"):
+        """
+        It adds every species of a text in the format of
+        oxidation_states.txt: one species per line, the formula followed by
+        a state per element like "Mn+7" or "Fe+8/3". Blank lines and lines
+        starting with # are skipped.
+
+        :param text: The text
+        :param source: The name of the text used in error messages
+        """
+        for number, line in enumerate(text.splitlines(), 1):
+            formula, *fields = line.split("#", 1)[0].split() or [None]
+            if formula is None:
+                continue
+
+            states = {}
+            for field in fields:
+                match = _STATE.match(field)
+                if match is None:
+                    raise ValueError(
+                        f"{source}:{number}: expected an element and an "
+                        f"oxidation state like Mn+7, got {field!r}"
+                    )
+
+                states[match[1]] = match[2]
+
+            try:
+                self.add(formula, states)
+            except ValueError as e:
+                raise ValueError(f"{source}:{number}: {e}") from None
+
+    def load(self, path):
+        """
+        :param path: A file in the format of oxidation_states.txt
+        """
+        with open(path, encoding="utf-8") as f:
+            self.loads(f.read(), path)
+
+    def dump(self, path):
+        """
+        It writes the table in the format read by load()
+
+        :param path: The file to write
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            for formula, states in self._states.items():
+                f.write(" ".join(
+                    [formula] + [
+                        f"{element}{'+' if state > 0 else ''}{state}"
+                        for element, state in states.items()
+                    ]
+                ) + "\n")
+
+    def lookup(self, formula):
+        """
+        :param formula: The formula of a compound
+        :return: A dictionary of the oxidation state of every element per
+        atom, or None if the species is not in the table. It must not be
+        mutated.
+        """
+        states = self._states.get(formula)
+
+        with self._lock:
+            if states is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return states
+
+    def differs_from_rule(self, formula):
+        """
+        :param formula: The formula of a compound
+        :return: True if the table gives an element a different oxidation
+        number than the H = +1, O = -2 rule does
+        """
+        states = self._states.get(formula)
+        if states is None:
+            return False
+
+        compound = Compound.from_formula(formula)
+        rule = compound.charge \
+            - (compound.get("H", 0) - 2 * compound.get("O", 0))
+
+        return any(
+            state != 1 if element == "H"
+            else state != -2 if element == "O"
+            else state * compound[element] != rule
+            for element, state in states.items()
+        )
+
+    def __contains__(self, formula):
+        return formula in self._states
+
+    def __len__(self):
+        return len(self._states)
+
+
+default_table = OxidationStateTable(DEFAULT_PATH)
@@ -0,0 +1,400 @@
+"""
+A structured, immutable result of balancing a reaction.
+
+RedoxReaction.balance() only returns LaTeX. RedoxReaction.balance_result()
+returns a ReactionResult instead, which holds every species with its
+integer coefficient and charge, marks the H+, OH- and H2O that were added,
+and carries the oxidation state of every element of every species and the
+number of electrons transferred. Text, LaTeX, HTML and JSON are only
+rendered when asked for.
+
+The electrons are counted per element as the least total increase of
+oxidation state that turns the atoms of the reactants into those of the
+products, so a disproportionation like 3 Cl2 -> 5 Cl- + ClO3- transfers
+5 electrons and not the 6 * 0 -> 5 * -1 + 1 * 5 difference of the sums.
+The rule that H is +1 and O is -2 only gives the summed oxidation number of
+a compound with several other elements, like As2S3 that is not in the
+oxidation state table, so those elements are counted together by the
+change of that sum.
+
+Example:
+
+    result = RedoxReaction("FeLp2 + MnO4Ln1 -> FeLp3 + MnLp2", "a") \\
+        .balance_result()
+
+    result.electrons   # 5
+    result.to_html()
+    data = result.to_compact()
+    ReactionResult.from_compact(data) == result   # True
+"""
+
+from collections import namedtuple
+from fractions import Fraction
+import json
+
+from compound import Compound
+from redox_reaction import BalancedReaction
+from render import html_renderer, latex_renderer
+
+# added is True for the H+, OH- and H2O added by the balancing
+Species = namedtuple(
+    "Species",
+    ["formula", "coefficient", "charge", "added"]
+)
+
+# the oxidation state per atom of an element in a species, as assigned by
+# RedoxReaction, None if the rule only gives the sum of several elements
+OxidationNumbers = namedtuple(
+    "OxidationNumbers",
+    ["formula", "element", "state"]
+)
+
+
+def _exact(value):
+    """
+    :param value: An oxidation number as an int, Fraction or SymPy number
+    :return: The value as an int, or as a Fraction if it is not whole
+    """
+    if value is None or type(value) is int:
+        return value
+
+    try:
+        value = Fraction(value)
+    except (TypeError, ValueError):
+        value = Fraction(str(value))
+
+    return value.numerator if value.denominator == 1 else value
+
+
+def _integer(coefficient):
+    """
+    :param coefficient: A coefficient returned by an engine
+    :return: The coefficient as an int
+    """
+    if coefficient != int(coefficient):
+        raise ValueError(f"The coefficient {coefficient} is not an integer")
+
+    return int(coefficient)
+
+
+def _dump_number(value):
+    """
+    :return: The value as an int, or "p/q" for a Fraction
+    """
+    return value if value is None or type(value) is int else str(value)
+
+
+def _load_number(value):
+    return Fraction(value) if isinstance(value, str) else value
+
+
+class ReactionResult(
+    namedtuple(
+        "ReactionResult",
+        ["ph", "engine", "reactants", "products", "oxidation_numbers",
+         "electrons"]
+    )
+):
+    """
+    The result of balancing a reaction. reactants and products are tuples
+    of Species in the order they are written, oxidation_numbers is a tuple
+    of OxidationNumbers, one for every element of every species, and
+    electrons is the number of electrons transferred in the balanced
+    reaction.
+    """
+
+    __slots__ = ()
+
+    @property
+    def balanced(self):
+        """
+        :return: The BalancedReaction of the result
+        """
+        return BalancedReaction(
+            tuple((s.formula, s.coefficient) for s in self.reactants),
+            tuple((s.formula, s.coefficient) for s in self.products)
+        )
+
+    @property
+    def added_species(self):
+        """
+        :return: The Species added by the balancing, reactants first
+        """
+        return tuple(s for s in self.reactants + self.products if s.added)
+
+    @property
+    def unbalanced_equation(self):
+        """
+        :return: The equation without coefficients and added species
+        """
+        return " -> ".join(
+            " + ".join(s.formula for s in side if not s.added)
+            for side in (self.reactants, self.products)
+        )
+
+    def to_text(self):
+        """
+        :return: The balanced equation in the notation it was entered in,
+        see BalancedReaction.to_text()
+        """
+        return self.balanced.to_text()
+
+    def to_latex(self):
+        """
+        :return: The balanced equation as LaTeX, as returned by
+        RedoxReaction.balance()
+        """
+        return latex_renderer.equation(*self.balanced)
+
+    def to_html(self):
+        """
+        :return: The balanced equation as HTML with <sub> and <sup> tags
+        """
+        return html_renderer.equation(*self.balanced)
+
+    def to_dict(self):
+        """
+        :return: The result as a dictionary of JSON types
+        """
+        def species(side):
+            return [s._asdict() for s in side]
+
+        return {
+            "ph": self.ph,
+            "engine": self.engine,
+            "reactants": species(self.reactants),
+            "products": species(self.products),
+            "oxidation_numbers": [
+                {
+                    "formula": on.formula,
+                    "element": on.element,
+                    "state": _dump_number(on.state),
+                }
+                for on in self.oxidation_numbers
+            ],
+            "electrons": _dump_number(self.electrons),
+        }
+
+    def to_json(self):
+        """
+        :return: The result as a readable JSON string
+        """
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    def to_compact(self):
+        """
+        It serializes the result without anything that can be derived from
+        the formulas, e.g. the charges.
+
+        :return: The result as a short JSON string
+        """
+        def species(side):
+            return [
+                [s.formula, s.coefficient, 1] if s.added
+                else [s.formula, s.coefficient]
+                for s in side
+            ]
+
+        return json.dumps(
+            [
+                self.ph,
+                self.engine,
+                species(self.reactants),
+                species(self.products),
+                [
+                    [on.formula, on.element, _dump_number(on.state)]
+                    for on in self.oxidation_numbers
+                ],
+                _dump_number(self.electrons),
+            ],
+            separators=(",", ":"),
+            ensure_ascii=False
+        )
+
+    @classmethod
+    def from_compact(cls, data):
+        """
+        :param data: A string returned by to_compact()
+        :return: The ReactionResult
+        """
+        (ph, engine, reactants, products, oxidation_numbers,
+         electrons) = json.loads(data)
+
+        def species(side):
+            return tuple(
+                Species(
+                    formula,
+                    coefficient,
+                    Compound.from_formula(formula).charge,
+                    bool(added)
+                )
+                for formula, coefficient, *added in side
+            )
+
+        return cls(
+            ph,
+            engine,
+            species(reactants),
+            species(products),
+            tuple(
+                OxidationNumbers(formula, element, _load_number(state))
+                for formula, element, state in oxidation_numbers
+            ),
+            _load_number(electrons)
+        )
+
+
+def _atom_states(reaction, formula, compound):
+    """
+    :param reaction: The RedoxReaction that assigned the oxidation numbers
+    :param formula: The formula of a species
+    :param compound: The Compound of the formula
+    :return: A dictionary of the oxidation state per atom of every element,
+    None for the elements the rule cannot tell apart
+    """
+    numbers = reaction.oxidation_numbers(formula)
+
+    # the rule gives every other element the summed oxidation number of
+    # the compound, which only splits into states if there is one of them
+    split = formula in reaction.table or len(numbers) <= 1
+
+    states = {}
+    for element, count in zip(compound.elements, compound.counts):
+        if element in numbers:
+            states[element] = _exact(
+                Fraction(_exact(numbers[element])) / Fraction(count)
+            ) if split else None
+        else:
+            states[element] = 1 if element == "H" else -2
+
+    return states
+
+
+def _lost(atoms):
+    """
+    :param atoms: A list of (state, count) pairs of the atoms of one
+    element, with a positive count for the reactants and a negative one for
+    the products
+    :return: The electrons the element gives off, i.e. the least total
+    increase of oxidation state that turns the reactant atoms into the
+    product atoms
+    """
+    lost = 0
+    surplus = 0  # the reactant atoms at or below the state not yet matched
+    previous = None
+    for state, count in sorted(atoms):
+        if surplus > 0:
+            lost += surplus * (state - previous)
+
+        surplus += count
+        previous = state
+
+    return lost
+
+
+def _count_electrons(sides, compounds, states, sums):
+    """
+    :param sides: The reactants and the products as (formula, coefficient)
+    pairs
+    :param compounds: A dictionary of the Compound of every formula
+    :param states: A dictionary of the states of every formula, see
+    _atom_states()
+    :param sums: A dictionary of the summed oxidation number of every
+    formula whose states the rule cannot tell apart
+    :return: The number of electrons transferred
+    """
+    # the elements that share a compound the rule cannot split are counted
+    # together by the change of their summed oxidation number
+    group = {}
+    for formula in sums:
+        joined = set().union(*(
+            group.get(element, {element})
+            for element, state in states[formula].items() if state is None
+        ))
+        for element in joined:
+            group[element] = joined
+
+    atoms = {}
+    changes = {}
+    for side, sign in zip(sides, (1, -1)):
+        for formula, coefficient in side:
+            compound = compounds[formula]
+            grouped = {}
+            for element, count in zip(compound.elements, compound.counts):
+                state = states[formula][element]
+                if element not in group:
+                    atoms.setdefault(element, []).append(
+                        (state, sign * coefficient * count)
+                    )
+                elif state is not None:
+                    key = id(group[element])
+                    grouped[key] = grouped.get(key, 0) + state * count
+
+            if formula in sums:
+                key = id(group[next(
+                    element for element, state in states[formula].items()
+                    if state is None
+                )])
+                grouped[key] = sums[formula]
+
+            for key, number in grouped.items():
+                changes[key] = changes.get(key, 0) \
+                    - sign * coefficient * number
+
+    electrons = sum(_lost(element_atoms) for element_atoms in atoms.values())
+    electrons += sum(change for change in changes.values() if change > 0)
+
+    return _exact(electrons)
+
+
+def build_result(reaction, engine="oxidation"):
+    """
+    It balances a reaction and collects the structured result
+
+    :param reaction: A RedoxReaction
+    :param engine: The engine passed to balance_coefficients()
+    :return: A ReactionResult
+    """
+    balanced = reaction.balance_coefficients(engine)
+    parsed = reaction.parsed
+
+    def species(side, original_count):
+        return tuple(
+            Species(
+                formula,
+                _integer(coefficient),
+                _exact(parsed.counts_for(formula).charge),
+                index >= original_count
+            )
+            for index, (formula, coefficient) in enumerate(side)
+        )
+
+    compounds = {}
+    states = {}
+    sums = {}
+    for formula, _ in balanced.reactants + balanced.products:
+        if formula in compounds:
+            continue
+
+        compound = compounds[formula] = parsed.counts_for(formula)
+        states[formula] = _atom_states(reaction, formula, compound)
+
+        if None in states[formula].values():
+            sums[formula] = _exact(reaction.oxidation_total(formula))
+
+    oxidation_numbers = tuple(
+        OxidationNumbers(formula, element, state)
+        for formula, formula_states in states.items()
+        for element, state in formula_states.items()
+    )
+
+    return ReactionResult(
+        reaction.ph,
+        engine,
+        species(balanced.reactants, len(parsed.reactant_compounds)),
+        species(balanced.products, len(parsed.product_compounds)),
+        oxidation_numbers,
+        _count_electrons(
+            (balanced.reactants, balanced.products), compounds, states, sums
+        )
+    )
@@ -0,0 +1,402 @@
+"""
+Group the species of a reaction into redox couples and balance the electrons
+between them for the "oxidation" engine.
+
+Every reactant and product with an element other than H and O is a node of
+a bipartite graph, with an edge between a reactant and a product that
+share such an element. H and O only link the species the oxidation state
+table gives another state than +1 and -2, like H2O2, O2, H2 and NaH. Each
+connected component is a redox couple, e.g. MnO4- -> Mn2+,
+As2S3 -> H3AsO4 + SO4^2-, Cl2 -> Cl- + ClO3- or H2O2 -> O2. The components
+are found with a union-find over the elements, which links the same
+species as the edges and takes time linear in the number of species.
+
+Within a couple the coefficients conserve every element other than H and
+O, which H+, OH- and H2O supply. A couple of one reactant and one product
+is balanced by the counts of their shared element, a larger couple by the
+integer nullspace of its element rows, see linear_balance.py. When the
+elements leave more than one degree of freedom, as in a disproportionation,
+the couple also has to balance its own electrons. A couple that is linked
+by H or O alone may have a single species, e.g. the H2O2 that is reduced to
+water.
+
+The electrons a couple gives off are the increase of the summed oxidation
+numbers of its species. The couples that give off electrons are then scaled
+against the couples that take them up with the least common multiple of
+their electrons, and couples that give off none, like spectator ions, keep
+their own coefficients.
+
+Example:
+
+    from redox_reaction import RedoxReaction
+
+    RedoxReaction("Cl2 -> ClLn1 + ClO3Ln1", "a").balance_coefficients()
+    # 3 Cl2 + 3 H2O -> 5 ClLn1 + ClO3Ln1 + 6 HLp1
+"""
+
+from collections import namedtuple
+from fractions import Fraction
+import math
+
+from linear_balance import integer_nullspace
+from redox_reaction import exact, lcm, normalize
+from validation import (
+    NO_OXIDATION_CHANGE,
+    UNBALANCED_COUPLE,
+    UNPAIRED_ELECTRONS,
+    ValidationError,
+)
+
+
+class RedoxCouple(
+    namedtuple(
+        "RedoxCouple",
+        ["species", "coefficients", "electrons", "self_balanced"]
+    )
+):
+    """
+    A connected group of species. species holds their indices in
+    ParsedReaction.all_compounds, reactants first, and coefficients the
+    smallest whole numbers that conserve their elements. electrons is the
+    number of electrons the couple gives off with these coefficients,
+    negative when it takes them up. self_balanced is True for a couple that
+    balances its own electrons, like a disproportionation.
+    """
+
+    __slots__ = ()
+
+
+def _integer_row(values):
+    """
+    :param values: Exact numbers, see redox_reaction.exact()
+    :return: The values as ints, multiplied by the least common multiple of
+    their denominators
+    """
+    values = [Fraction(value) for value in values]
+    multiple = math.lcm(*(value.denominator for value in values))
+
+    return [int(value * multiple) for value in values]
+
+
+def _positive(vector):
+    """
+    :param vector: A nullspace vector
+    :return: The vector with positive entries, or None if its entries do
+    not all have the same sign
+    """
+    if all(value > 0 for value in vector):
+        return vector
+
+    if all(value < 0 for value in vector):
+        return [-value for value in vector]
+
+    return None
+
+
+def _without(atoms, elements):
+    """
+    :param atoms: The atoms of the species of a couple, see find_couples()
+    :param elements: The elements to leave out, like ("H", "O")
+    :return: The atoms without the elements, or None if they have none of
+    them
+    """
+    if not any(element in counts for counts in atoms for element in elements):
+        return None
+
+    return [
+        {
+            element: count for element, count in counts.items()
+            if element not in elements
+        }
+        for counts in atoms
+    ]
+
+
+def _balance_couple(compounds, reactant_count, totals, species, atoms):
+    """
+    It finds the coefficients and the electrons of one couple. The H and O
+    that link the couple are conserved like the other elements if that has
+    a solution, e.g. 2 NaH -> 2 NaOH + H2, and are otherwise left to H+,
+    OH- and H2O, e.g. for H2O2 -> O2 or the H2O2 that is reduced to water.
+
+    :param compounds: ParsedReaction.all_compounds
+    :param reactant_count: The number of reactants among the compounds
+    :param totals: The summed oxidation number of every compound
+    :param species: The indices of the species of the couple, reactants
+    first
+    :param atoms: A dictionary of the exact count of every element that
+    links each species of the couple
+    :return: A RedoxCouple
+    :raises ValidationError: If the elements of the couple cannot be
+    balanced with a unique set of positive coefficients
+    """
+    coefficients = None
+    self_balanced = False
+
+    if len(species) == 2 and species[0] < reactant_count <= species[1] \
+            and atoms[0]:
+        # one reactant and one product, e.g. Cr2O7^2- -> Cr3+
+        reactant, product = atoms
+
+        if reactant.keys() == product.keys():
+            element = next(iter(reactant))
+            first, second = product[element], reactant[element]
+
+            if type(first) is int and type(second) is int:
+                divisor = math.gcd(first, second)
+                coefficients = [first // divisor, second // divisor]
+            else:
+                coefficients = normalize([first, second])
+
+            if len(reactant) > 1 and any(
+                coefficients[0] * reactant[element]
+                != coefficients[1] * product[element]
+                for element in reactant
+            ):
+                coefficients = None
+
+        if coefficients is not None:
+            electrons = coefficients[1] * totals[species[1]] \
+                - coefficients[0] * totals[species[0]]
+    else:
+        signs = [1 if index < reactant_count else -1 for index in species]
+        elements = dict.fromkeys(
+            element for counts in atoms for element in counts
+        )
+        rows = [
+            _integer_row(
+                sign * counts.get(element, 0)
+                for counts, sign in zip(atoms, signs)
+            )
+            for element in elements
+        ]
+
+        # without such elements every species is free
+        basis = integer_nullspace(rows) if rows else [
+            [int(row == column) for column in range(len(species))]
+            for row in range(len(species))
+        ]
+
+        if len(basis) > 1:
+            # the couple also has to balance its own electrons
+            rows.append(_integer_row(
+                sign * totals[index] for index, sign in zip(species, signs)
+            ))
+            basis = integer_nullspace(rows)
+            self_balanced = True
+
+        if len(basis) == 1:
+            coefficients = _positive(basis[0])
+
+        if coefficients is not None:
+            electrons = -sum(
+                sign * coefficient * totals[index]
+                for index, sign, coefficient in zip(
+                    species, signs, coefficients
+                )
+            )
+
+    if coefficients is None:
+        # the H goes to H+ first, e.g. for H2O2 -> O2, then the O to water
+        for elements in (("H",), ("H", "O")):
+            free = _without(atoms, elements)
+            if free is not None:
+                return _balance_couple(
+                    compounds, reactant_count, totals, species, free
+                )
+
+        formulas = " + ".join(compounds[index].formula for index in species)
+
+        raise ValidationError(
+            UNBALANCED_COUPLE,
+            f"The elements of {formulas} cannot be balanced with a unique "
+            f"set of positive coefficients",
+            compounds[species[0]].formula
+        )
+
+    return RedoxCouple(
+        tuple(species),
+        tuple(coefficients),
+        electrons if type(electrons) is int else exact(electrons),
+        self_balanced
+    )
+
+
+def find_components(compounds, oxidation_numbers=None):
+    """
+    It groups the species into the connected components of the bipartite
+    reactant/product graph
+
+    :param compounds: ParsedReaction.all_compounds
+    :param oxidation_numbers: The oxidation numbers RedoxReaction assigned
+    to every compound. Its H and O link the compound like the other
+    elements do. None links the compounds by their elements other than H
+    and O only.
+    :return: A list of (species, atoms) pairs in the order of their first
+    species. species are the indices of the compounds, reactants first, and
+    atoms a dictionary of the exact count of every element that links each
+    of them.
+    """
+    parent = list(range(len(compounds)))
+
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+
+        return index
+
+    # linking every species to the first species with the same element
+    # gives the same components as the reactant/product edges
+    first = {}
+    atoms = {}
+    for index, compound in enumerate(compounds):
+        numbers = () if oxidation_numbers is None \
+            else oxidation_numbers[index]
+
+        counts = {}
+        for element, count in zip(compound.elements, compound.counts):
+            if element == "H" or element == "O":
+                if element not in numbers:
+                    continue
+
+            counts[element] = count if type(count) is int else exact(count)
+
+            other = first.get(element)
+            if other is None:
+                first[element] = index
+            else:
+                parent[find(index)] = find(other)
+
+        if counts:
+            atoms[index] = counts
+
+    components = {}
+    for index in atoms:
+        components.setdefault(find(index), []).append(index)
+
+    return [
+        (species, [atoms[index] for index in species])
+        for species in components.values()
+    ]
+
+
+def find_couples(compounds, reactant_count, totals, oxidation_numbers=None,
+                 conserve_hydrogen_oxygen=True):
+    """
+    It groups the species into redox couples and balances each of them
+
+    :param compounds: ParsedReaction.all_compounds
+    :param reactant_count: The number of reactants among the compounds
+    :param totals: The summed oxidation number of every compound, see
+    RedoxReaction._assign_oxidation_totals()
+    :param oxidation_numbers: The oxidation numbers of every compound, see
+    find_components()
+    :param conserve_hydrogen_oxygen: False to leave the H and O that link a
+    couple to H+, OH- and H2O, e.g. for H2O2 -> H2O + O2
+    :return: A list of RedoxCouples in the order of their first species
+    :raises ValidationError: If a couple cannot be balanced
+    """
+    couples = []
+    for species, atoms in find_components(compounds, oxidation_numbers):
+        if not conserve_hydrogen_oxygen:
+            atoms = _without(atoms, ("H", "O")) or atoms
+
+        couples.append(_balance_couple(
+            compounds, reactant_count, totals, species, atoms
+        ))
+
+    return couples
+
+
+def _count_directions(couples):
+    """
+    :return: A tuple of the number of couples that give off electrons and
+    the number that take them up
+    """
+    oxidations = reductions = 0
+    for couple in couples:
+        if couple.electrons > 0:
+            oxidations += 1
+        elif couple.electrons < 0:
+            reductions += 1
+
+    return (oxidations, reductions)
+
+
+def balance_couples(compounds, reactant_count, totals,
+                    oxidation_numbers=None):
+    """
+    It balances the electrons of a reaction over its redox couples. Every
+    couple that gives off electrons is scaled to give off the least common
+    multiple of the electrons of all couples times the number of couples
+    that take them up, and the other way around, so the electrons given off
+    equal those taken up.
+
+    :param compounds: ParsedReaction.all_compounds
+    :param reactant_count: The number of reactants among the compounds
+    :param totals: The summed oxidation number of every compound, see
+    RedoxReaction._assign_oxidation_totals()
+    :param oxidation_numbers: The oxidation numbers of every compound, see
+    find_components()
+    :return: A list of the exact coefficient of every compound, 1 for the
+    compounds that are not part of a couple, like H2O
+    :raises ValidationError: If the electrons cannot be balanced
+    """
+    couples = find_couples(
+        compounds, reactant_count, totals, oxidation_numbers
+    )
+    oxidations, reductions = _count_directions(couples)
+
+    if bool(oxidations) != bool(reductions) \
+            and oxidation_numbers is not None:
+        # a species like H2O2 that both gives off and takes up electrons,
+        # e.g. in H2O2 -> H2O + O2, only balances when its O may go to water
+        couples = find_couples(
+            compounds, reactant_count, totals, oxidation_numbers, False
+        )
+        oxidations, reductions = _count_directions(couples)
+
+    if not oxidations and not reductions \
+            and not any(couple.self_balanced for couple in couples):
+        raise ValidationError(
+            NO_OXIDATION_CHANGE, "No element changes oxidation number"
+        )
+
+    if bool(oxidations) != bool(reductions):
+        couple = next(couple for couple in couples if couple.electrons)
+        kind = "an oxidation" if oxidations else "a reduction"
+
+        raise ValidationError(
+            UNPAIRED_ELECTRONS,
+            f"The equation has {kind} but nothing to balance its electrons "
+            f"with, try the matrix or half engine",
+            compounds[couple.species[0]].formula
+        )
+
+    multiple = lcm(
+        abs(couple.electrons) for couple in couples if couple.electrons
+    )
+
+    coefficients = [1] * len(compounds)
+    for couple in couples:
+        electrons = couple.electrons
+        if electrons > 0:
+            scale = multiple * reductions
+        elif electrons < 0:
+            scale = multiple * oxidations
+            electrons = -electrons
+        else:
+            scale = electrons = 1
+
+        if type(scale) is int and type(electrons) is int:
+            scale //= electrons
+        else:
+            scale = exact(Fraction(scale) / electrons)
+
+        for index, coefficient in zip(couple.species, couple.coefficients):
+            value = scale * coefficient
+            coefficients[index] = value if type(value) is int \
+                else exact(value)
+
+    return coefficients
@@ -8,7 +8,8 @@ AFSTEM EN REDOXREAKTION
     - forbindelsers samlede OT -> ladningen
 
 2) Find ændring i oxidationstal
-    - skal findes for de grundstoffer, der oxideres eller reduceres
+    - skal findes for de stoffer, der oxideres eller reduceres
+    - stoffer med et fælles grundstof (ikke H og O) udgør et redoxpar
 
 3) Afstem oxidationstal med koefficienter
     - mindste fælles multiplum
@@ -21,17 +22,353 @@ AFSTEM EN REDOXREAKTION
 5) Afstem O og H med H2O
 """
 
-import chemparse as cp
-import sympy as smp
+from collections import namedtuple
+from fractions import Fraction
+import functools
+import math
+
+from compound import Compound
+from formula import FormulaError, tokenize_formula
+import instrumentation
+from instrumentation import timed
+from render import latex_renderer
+from validation import (
+    INVALID_FORMULA,
+    MISPLACED_SPECIES,
+    ValidationError,
+    check_oxidation_change,
+    check_parsed,
+    check_ph,
+    split_equation,
+)
+
+# SymPy is slow to import and only needed by the "sympy" solver, so it is
+# imported by _sympy() the first time it is used
+smp = None
+_x = None
+
+# engines that can solve for the oxidation number of an element
+SOLVERS = ("fraction", "sympy")
+
+# engines that can balance a reaction, see RedoxReaction.balance_coefficients
+ENGINES = ("oxidation", "matrix", "half")
+
+# increase when a change to the balancing gives different results, so that
+# stored results from the old algorithm are discarded
+ALGORITHM_VERSION = 7
+
+# the species added by the charge and water stages. When the equation
+# already has one of them, its coefficient is found by those stages too.
+ADDED_SPECIES = ("HLp1", "OHLn1", "H2O")
+
+# the number of parsed formulas kept by parse_formula()
+FORMULA_CACHE_SIZE = 4096
+
+
+def _sympy():
+    """
+    It imports SymPy and creates the symbol x the first time it is called
+
+    :return: A tuple of the sympy module and the symbol x
+    """
+    global smp, _x
+
+    if smp is None:
+        import sympy
+
+        _x = sympy.symbols("x", real=True)
+        smp = sympy
+
+    return (smp, _x)
+
+
+def __getattr__(name):
+    """
+    It keeps the module level symbol x available without importing SymPy
+    when the module is imported
+
+    :param name: The name of the attribute
+    :return: The symbol x
+    """
+    if name == "x":
+        return _sympy()[1]
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def solve_oxidation_number(prev_on, compound_charge, solver="fraction"):
+    """
+    It solves x + prev_on - compound_charge = 0 for x, the oxidation number
+    of the element that is not H or O.
+
+    The "fraction" solver does the arithmetic exactly with int and Fraction
+    and only falls back to SymPy for values it cannot represent, e.g. NaN.
+    The "sympy" solver always uses smp.solve and is kept for comparison.
+
+    :param prev_on: The summed oxidation numbers of H and O in the compound
+    :param compound_charge: The charge of the compound
+    :param solver: "fraction" or "sympy"
+    :return: The oxidation number as an int, a Fraction or a SymPy number
+    """
+    if solver not in SOLVERS:
+        raise ValueError(
+            f"Unknown solver {solver!r}, expected one of {SOLVERS}"
+        )
+
+    if solver == "fraction":
+        if type(prev_on) is int and type(compound_charge) is int:
+            return compound_charge - prev_on
+
+        try:
+            on = Fraction(compound_charge) - Fraction(prev_on)
+        except (TypeError, ValueError, OverflowError):
+            pass
+        else:
+            if on.denominator == 1:
+                return on.numerator
+
+            return on
+
+    if instrumentation.recorders:
+        instrumentation.count("sympy_solve_calls")
+
+    sympy, x = _sympy()
+
+    return sympy.solve(x + prev_on - compound_charge)[0]
+
+
+def exact(value):
+    """
+    It converts a number to an exact Python number, so the coefficients are
+    computed without floats or SymPy objects
+
+    :param value: An int, a Fraction, a float or a SymPy number
+    :return: The value as an int if it is whole, otherwise as a Fraction.
+    Floats are read by their shortest decimal representation, e.g. 0.1 is
+    1/10.
+    """
+    if type(value) is int:
+        return value
+
+    if isinstance(value, float):
+        value = Fraction(repr(value))
+    else:
+        try:
+            value = Fraction(value)
+        except TypeError:
+            value = Fraction(str(value))
+
+    return value.numerator if value.denominator == 1 else value
+
+
+def lcm(values):
+    """
+    :param values: Exact numbers, see exact()
+    :return: The least common multiple of the values, the smallest number
+    that every value divides into a whole number. It is 0 if a value is 0.
+    """
+    values = list(values)
+
+    if all(type(value) is int for value in values):
+        return math.lcm(*values)
+
+    values = [Fraction(value) for value in values]
+
+    return exact(Fraction(
+        math.lcm(*(value.numerator for value in values)),
+        math.gcd(*(value.denominator for value in values))
+    ))
+
+
+def normalize(coefficients):
+    """
+    It turns exact coefficients into the smallest whole numbers with the
+    same ratios
+
+    :param coefficients: A list of exact numbers, see exact()
+    :return: A list of ints without a common divisor
+    """
+    if not all(type(value) is int for value in coefficients):
+        coefficients = [Fraction(value) for value in coefficients]
+        multiple = math.lcm(*(value.denominator for value in coefficients))
+        coefficients = [
+            int(value * multiple) for value in coefficients
+        ]
+
+    divisor = math.gcd(*coefficients)
+    if divisor > 1:
+        return [value // divisor for value in coefficients]
+
+    return coefficients
+
+
+@functools.lru_cache(maxsize=FORMULA_CACHE_SIZE)
+def parse_formula(formula):
+    """
+    It parses a formula with formula.tokenize_formula() and remembers the
+    result, since compounds like H2O, HLp1 and OHLn1 recur in most
+    reactions. Use parse_formula.cache_info() and parse_formula.cache_clear()
+    to inspect and clear the cache.
+
+    :param formula: The formula of the compound, e.g. "MnO4Ln1"
+    :return: A dictionary of elements and their counts. The dictionary is
+    shared between all callers and must not be mutated.
+    """
+    return tokenize_formula(formula)
+
+
+class ParsedReaction:
+    """
+    A chemical equation that has been split into its compounds and parsed
+    exactly once. Every stage of the balancing reads from this object
+    instead of parsing the equation again.
+    """
+
+    __slots__ = (
+        "reactant_compounds",
+        "product_compounds",
+        "parse_count",
+        "compounds",
+        "unique_elements",
+    )
+
+    @timed("parse")
+    def __init__(self, unbalanced_equation, previous=None):
+        """
+        It splits the equation into reactants and products, splits those
+        into individual compounds and parses every distinct compound once
+
+        :param unbalanced_equation: The unbalanced equation, e.g.
+        "FeLp2 + MnO4Ln1 -> FeLp3 + MnLp2"
+        :param previous: The ParsedReaction of an earlier version of the
+        equation, whose compounds are reused instead of parsed again
+        """
+        reactants, products = split_equation(unbalanced_equation)
+
+        self.reactant_compounds = [c.strip() for c in reactants.split("+")]
+        self.product_compounds = [c.strip() for c in products.split("+")]
+
+        self.parse_count = 0
+        self.compounds = {}  # formula -> Compound
+
+        if previous is not None:
+            for compound in self.reactant_compounds + self.product_compounds:
+                if compound in previous.compounds:
+                    self.compounds[compound] = previous.compounds[compound]
+
+        unique_elements = {}
+        for compound in self.reactant_compounds + self.product_compounds:
+            for key in self.counts_for(compound).elements:
+                unique_elements[key] = ""
+
+        self.unique_elements = tuple(unique_elements)
+
+        # share the interned formula strings of the compounds
+        self.reactant_compounds = [
+            self.compounds[c].formula for c in self.reactant_compounds
+        ]
+        self.product_compounds = [
+            self.compounds[c].formula for c in self.product_compounds
+        ]
+
+        if instrumentation.recorders:
+            instrumentation.count("reactions_parsed")
+            instrumentation.count("compounds_parsed", self.parse_count)
+
+    @classmethod
+    def from_compounds(cls, reactants, products):
+        """
+        It builds a ParsedReaction from compounds that have already been
+        parsed, e.g. read from a compiled corpus, without splitting an
+        equation or parsing a formula
+
+        :param reactants: A list of the Compounds of the reactants
+        :param products: A list of the Compounds of the products
+        :return: The ParsedReaction
+        """
+        self = cls.__new__(cls)
+
+        self.reactant_compounds = [compound.formula for compound in reactants]
+        self.product_compounds = [compound.formula for compound in products]
+        self.parse_count = 0
+        self.compounds = {}
+
+        unique_elements = {}
+        for compound in reactants + products:
+            self.compounds[compound.formula] = compound
+
+            for key in compound.elements:
+                unique_elements[key] = ""
+
+        self.unique_elements = tuple(unique_elements)
+
+        return self
+
+    def counts_for(self, compound):
+        """
+        It returns the parsed formula of a compound, parsing it only the
+        first time the compound is seen in this reaction
+
+        :param compound: The formula of the compound, e.g. "MnO4Ln1"
+        :return: The interned Compound, which reads like the dictionary of
+        elements and counts returned by parse_formula()
+        """
+        if compound not in self.compounds:
+            self.compounds[compound] = Compound.from_formula(compound)
+            self.parse_count += 1
+
+        return self.compounds[compound]
 
-x = smp.symbols("x", real=True)
+    @property
+    def sides(self):
+        """
+        :return: A tuple of the reactant compounds and the product compounds
+        """
+        return (self.reactant_compounds, self.product_compounds)
+
+    @property
+    def all_compounds(self):
+        """
+        :return: The parsed formula of every compound in the equation,
+        reactants first and then products
+        """
+        return [
+            self.compounds[compound]
+            for compound in self.reactant_compounds + self.product_compounds
+        ]
+
+
+class BalancedReaction(
+    namedtuple("BalancedReaction", ["reactants", "products"])
+):
+    """
+    The immutable result of balancing a reaction. reactants and products are
+    tuples of (compound, coefficient) pairs in the order they are written.
+    """
+
+    __slots__ = ()
+
+    def to_text(self):
+        """
+        :return: The balanced equation in the notation it was entered in,
+        e.g. "5 FeLp2 + MnO4Ln1 + 8 HLp1 -> 5 FeLp3 + MnLp2 + 4 H2O"
+        """
+        sides = []
+        for side in (self.reactants, self.products):
+            sides.append(" + ".join(
+                compound if coefficient == 1
+                else f"{coefficient} {compound}"
+                for compound, coefficient in side
+            ))
+
+        return " -> ".join(sides)
 
 
 # > A class that represents a redox reaction.
 class RedoxReaction:
-    balanced_coefficients = {}
 
-    def __init__(self, unbalanced_equation, ph):
+    def __init__(self, unbalanced_equation, ph, solver="fraction",
+                 table=None, parsed=None):
         """
         The function __init__() is a special function in Python classes.
         It is known as a constructor in object oriented concepts.
@@ -40,321 +377,435 @@ class RedoxReaction:
 
         :param unbalanced_equation: The unbalanced equation you want to balance
         :param ph: The pH of the solution ("a", "b" or "n")
+        :param solver: The engine used to solve for oxidation numbers
+        ("fraction" or "sympy")
+        :param table: The OxidationStateTable consulted before either
+        solver, None for oxidation_states.default_table. An empty
+        OxidationStateTable() leaves every compound to the solver.
+        :param parsed: The ParsedReaction of the equation if it has already
+        been parsed, e.g. by ParsedReaction.from_compounds()
         """
+        if solver not in SOLVERS:
+            raise ValueError(
+                f"Unknown solver {solver!r}, expected one of {SOLVERS}"
+            )
+
+        if table is None:
+            # imported here, as the table parses its formulas on import
+            from oxidation_states import default_table as table
+
         self.unbalanced_equation = unbalanced_equation
         self.ph = ph  # "a" for acid, "b" for base, "n" for neutral
+        self.solver = solver
+        self.table = table
+        self._parsed = parsed
+
+        # The oxidation numbers and their sum of every compound and the
+        # result of _balance_oxidation_numbers() for _parsed. None of them
+        # depends on the pH, and the oxidation numbers of a compound do not
+        # depend on the rest of the equation, so update() keeps what is
+        # still valid.
+        self._compound_oxidation_numbers = {}
+        self._compound_totals = {}
+        self._oxidation_balance = None
+
+        # the ParsedReaction, the pH and the engine of the last validate()
+        # that passed
+        self._validated = None
+
+    def update(self, unbalanced_equation=None, ph=None):
+        """
+        It changes the equation or the pH and keeps the work that is still
+        valid, so the next call only redoes what depends on the change:
+
+        - a new pH only balances the charge and the water again,
+        - a new equation only parses and assigns oxidation numbers to the
+          compounds that were not in the previous equation. As formulas
+          are cached by parse_formula() anyway, this is only as fast as a
+          new RedoxReaction.
+
+        The results are the same as those of a new RedoxReaction. It must
+        not be called while the reaction is being balanced in another
+        thread.
+
+        :param unbalanced_equation: The new equation, None keeps the current
+        :param ph: The new pH ("a", "b" or "n"), None keeps the current
+        """
+        if ph is not None:
+            self.ph = ph
+
+        if unbalanced_equation is None \
+                or unbalanced_equation == self.unbalanced_equation:
+            return
+
+        parsed = ParsedReaction(unbalanced_equation, previous=self._parsed)
+
+        self.unbalanced_equation = unbalanced_equation
+        self._parsed = parsed
+        self._oxidation_balance = None
+        self._validated = None
+        self._compound_oxidation_numbers = {
+            compound: numbers
+            for compound, numbers in self._compound_oxidation_numbers.items()
+            if compound in parsed.compounds
+        }
+        self._compound_totals = {
+            compound: total
+            for compound, total in self._compound_totals.items()
+            if compound in parsed.compounds
+        }
 
     def _parse(self):
         """
-        It takes a chemical equation, splits it into reactants and products,
-        splits the reactants and products into individual compounds,
-        and then parses the compounds into a dictionary of elements
-        and their coefficients
+        It parses the equation the first time it is called and returns the
+        same ParsedReaction on every later call
 
-        :return: A tuple of the reactants, products, unique elements, and all
-        compounds.
+        :return: The ParsedReaction of the equation
         """
-        reactants, products = self.unbalanced_equation.split("->")
+        if self._parsed is None:
+            self._parsed = ParsedReaction(self.unbalanced_equation)
 
-        reactant_compounds = reactants.split("+")
-        product_compounds = products.split("+")
+        return self._parsed
 
-        reactant_compounds = [c.strip() for c in reactant_compounds]
-        product_compounds = [c.strip() for c in product_compounds]
+    @property
+    def parsed(self):
+        """
+        :return: The ParsedReaction of the equation, parsed the first time
+        it is needed
+        """
+        return self._parse()
 
-        all_compounds = []
-        unique_elements = {}
+    @property
+    def parse_count(self):
+        """
+        :return: The number of formulas that have been parsed for this
+        reaction. Formulas found in the parse_formula() cache are included.
+        """
+        if self._parsed is None:
+            return 0
 
-        for compound in reactant_compounds:
-            num_elements = cp.parse_formula(compound)
+        return self._parsed.parse_count
 
-            for key in num_elements:
-                if key != "Lp" and key != "Ln":
-                    unique_elements[key] = ""
+    def oxidation_numbers(self, compound):
+        """
+        It returns the oxidation numbers the reaction assigns to the
+        elements of a compound, assigning them the first time they are
+        needed
+
+        :param compound: The formula of a compound of the equation or of
+        one added by the balancing, e.g. "MnO4Ln1" or "H2O"
+        :return: A dictionary of the oxidation number of every element
+        except H and O, summed over its atoms, see _oxidation_numbers_of()
+        """
+        return dict(self._oxidation_numbers_of(
+            compound, self._parse().counts_for(compound)
+        ))
 
-            all_compounds.append(num_elements)
+    def oxidation_total(self, compound):
+        """
+        :param compound: The formula of a compound of the equation or of
+        one added by the balancing, e.g. "MnO4Ln1" or "H2O"
+        :return: The electrons the compound would give off to reach the
+        oxidation number 0, see _assign_oxidation_totals()
+        """
+        self._oxidation_numbers_of(
+            compound, self._parse().counts_for(compound)
+        )
 
-        for compound in product_compounds:
-            num_elements = cp.parse_formula(compound)
+        return self._compound_totals[compound]
 
-            num_elements = {key: -val for key, val in num_elements.items()}
+    def _get_charges(self, parsed, scales=None):
+        """
+        This function sums the charges of the reactants and of the products,
+        optionally after each compound has been multiplied by a coefficient
+
+        :param parsed: The ParsedReaction of the equation
+        :param scales: A list of factors, one for each compound in
+        parsed.all_compounds, that the charge of the compound is multiplied
+        by
+        :return: A tuple of the summed charges of the reactants and products
+        """
+        reactant_compounds, product_compounds = parsed.sides
 
-            all_compounds.append(num_elements)
+        if scales is None:
+            scales = [1] * (len(reactant_compounds) + len(product_compounds))
 
-        return (
-            reactant_compounds,
-            product_compounds,
-            unique_elements,
-            all_compounds
-        )
+        reactants_charge = 0
+        for compound_index, compound in enumerate(reactant_compounds):
+            reactants_charge += parsed.compounds[compound].charge * scales[
+                compound_index
+            ]
 
-        all_compounds_new = []
-        for compound in all_compounds:
-            compound_new = {}
-            for key, value in compound.items():
-                if key != "Lp" and key != "Ln":
-                    compound_new[key] = value
+        products_charge = 0
+        for compound_index, compound in enumerate(product_compounds):
+            products_charge += parsed.compounds[compound].charge * scales[
+                compound_index + len(reactant_compounds)
+            ]
+
+        return (reactants_charge, products_charge)
 
-            all_compounds_new.append(compound_new)
+    def _oxidation_numbers_of(self, compound, num_elements):
+        """
+        The function assigns oxidation numbers to the elements of one
+        compound, remembering them for the next call. Species in the
+        oxidation state table get theirs from the table, the others from
+        the rule that H is +1 and O is -2.
+
+        :param compound: The formula of the compound
+        :param num_elements: The Compound of the formula
+        :return: A dictionary of the oxidation number of every element
+        except H and O, summed over its atoms. H and O are included when
+        the table gives them another state than the rule, e.g. O in H2O2
+        or H in NaH, so they take part in the redox couples.
+        """
+        oxidation_numbers = self._compound_oxidation_numbers.get(compound)
+        if oxidation_numbers is not None:
+            return oxidation_numbers
+
+        states = self.table.lookup(compound)
+        if states is not None:
+            oxidation_numbers = {}
+
+            # the electrons relative to H at +1 and O at -2, as in the H+,
+            # OH- and H2O the charge and water stages add
+            total = 0
+            for key, state in states.items():
+                if key == "H" and state == 1 or key == "O" and state == -2:
+                    continue
+
+                on = state * num_elements[key]
+                oxidation_numbers[key] = on if type(on) is int \
+                    else on.numerator if on.denominator == 1 else on
+
+                total += on
+                if key == "H":
+                    total -= num_elements[key]
+                elif key == "O":
+                    total += 2 * num_elements[key]
+
+            if instrumentation.recorders:
+                instrumentation.count("oxidation_table_hits")
+
+            self._compound_oxidation_numbers[compound] = oxidation_numbers
+            self._compound_totals[compound] = exact(total)
+
+            return oxidation_numbers
+
+        compound_charge = num_elements.charge
+
+        # assign oxidation numbers for H and O
+        prev_on = 0
+        for key, value in num_elements.items():
+            if key == "O":
+                prev_on += -2 * value
+            elif key == "H":
+                prev_on += 1 * value
+
+        # assign oxidation numbers for the remaining elements
+        oxidation_numbers = {}
+        for key in num_elements:
+            if key != "O" and key != "H" \
+                    and key != "Lp" and key != "Ln":
+                on = solve_oxidation_number(
+                    prev_on,
+                    compound_charge,
+                    self.solver
+                )
 
-        return all_compounds_new
+                oxidation_numbers[key] = on
 
-    def _get_charges(
-        self,
-        reactant_compounds,
-        product_compounds,
-        all_compounds
-    ):
+        if instrumentation.recorders:
+            instrumentation.count("oxidation_table_misses")
+            instrumentation.count("compounds_processed")
+            instrumentation.count(
+                "elements_processed", len(num_elements.elements)
+            )
+            instrumentation.count("solve_calls", len(oxidation_numbers))
+
+        # every element gets the oxidation number of the whole compound, so
+        # their sum is that number
+        self._compound_oxidation_numbers[compound] = oxidation_numbers
+        self._compound_totals[compound] = exact(
+            next(iter(oxidation_numbers.values()), 0)
+        )
+
+        return oxidation_numbers
+
+    @timed("assign")
+    def _assign_oxidation_totals(self, parsed):
+        """
+        The function sums the oxidation numbers of the elements other than H
+        and O of every compound, i.e. the electrons the compound would give
+        off to reach the oxidation number 0. H and O count by how far the
+        table puts them from +1 and -2, e.g. -2 for H2 and +2 for H2O2.
+
+        :param parsed: The ParsedReaction of the equation
+        :return: A list of the sums in the order of parsed.all_compounds
         """
-        This function takes in a list of reactant compounds,
-        a list of product compounds, and a list of all compounds,
-        and returns a dictionary of charges for each compound
-
-        :param reactant_compounds: a list of the reactant compounds
-        :param product_compounds: a list of the products of the reaction
-        :param all_compounds: a list of all compounds in the reaction
-        :return charges: a dictionary of charges for each compound
-        """
-        charges = {}
-        for compound_index, compound in enumerate(all_compounds):
-            for key, value in compound.items():
-                if value > 0:  # reactants
-                    if key == "Lp":
-                        charges[reactant_compounds[compound_index]] = value
-                    elif key == "Ln":
-                        charges[reactant_compounds[compound_index]] = -value
-                    else:
-                        charges[reactant_compounds[compound_index]] = 0
-
-                if value < 0:  # products
-                    if key == "Lp":
-                        charges[
-                            product_compounds[
-                                compound_index - len(reactant_compounds)
-                            ]
-                        ] = value
-                    elif key == "Ln":
-                        charges[
-                            product_compounds[
-                                compound_index - len(reactant_compounds)
-                            ]
-                        ] = -value
-                    else:
-                        charges[
-                            product_compounds[
-                                compound_index - len(reactant_compounds)
-                            ]
-                        ] = 0
-
-        return charges
-
-    def _assign_oxidation_numbers(self):
+        totals = []
+        for compound in parsed.reactant_compounds + parsed.product_compounds:
+            total = self._compound_totals.get(compound)
+            if total is None:
+                self._oxidation_numbers_of(
+                    compound, parsed.compounds[compound]
+                )
+                total = self._compound_totals[compound]
+
+            totals.append(total)
+
+        return totals
+
+    @timed("assign")
+    def _assign_oxidation_numbers(self, parsed):
         """
         The function assigns oxidation numbers to the
         reactants and products of a chemical reaction
 
+        :param parsed: The ParsedReaction of the equation
         :return: A tuple of two dictionaries containing oxidation numbers
         for reactants and products
         """
-        (reactant_compounds,
-         product_compounds,
-         _,
-         all_compounds) = self._parse()
-
-        charges = self._get_charges(
-            reactant_compounds,
-            product_compounds,
-            all_compounds
-        )
-
         reactant_oxidation_numbers = {}
         product_oxidation_numbers = {}
 
-        for compound_index, compound in enumerate(all_compounds):
-            reactants_on_dict = {}
-            products_on_dict = {}
-
-            # assign oxidation numbers for H and O
-            for key, value in compound.items():
-                if value > 0:  # reactants
-                    if reactant_compounds[compound_index] in reactants_on_dict:
-                        if key == "O":
-                            reactants_on_dict[
-                                reactant_compounds[compound_index]
-                            ] += -2 * value
-
-                        elif key == "H":
-                            reactants_on_dict[
-                                reactant_compounds[compound_index]
-                            ] += 1 * value
-                    else:
-                        if key == "O":
-                            reactants_on_dict[
-                                reactant_compounds[compound_index]
-                            ] = -2 * value
-
-                        elif key == "H":
-                            reactants_on_dict[
-                                reactant_compounds[compound_index]
-                            ] = 1 * value
-
-                elif value < 0:  # products
-                    if product_compounds[
-                        compound_index - len(reactant_compounds)
-                    ] in products_on_dict:
-                        if key == "O":
-                            products_on_dict[
-                                product_compounds[
-                                    compound_index - len(reactant_compounds)
-                                ]
-                            ] += -2 * abs(value)
-
-                        elif key == "H":
-                            products_on_dict[
-                                product_compounds[
-                                    compound_index - len(reactant_compounds)
-                                ]
-                            ] += 1 * abs(value)
-                    else:
-                        if key == "O":
-                            products_on_dict[
-                                product_compounds[
-                                    compound_index - len(reactant_compounds)
-                                ]
-                            ] = -2 * abs(value)
-
-                        elif key == "H":
-                            products_on_dict[
-                                product_compounds[
-                                    compound_index - len(reactant_compounds)
-                                ]
-                            ] = 1 * abs(value)
-
-            # assign oxidation numbers for the remaining elements
-            for key, value in compound.items():
-                if value > 0:  # reactants
-                    compound_charge = charges[
-                        reactant_compounds[compound_index]
-                    ]
-
-                    if key != "O" and key != "H" \
-                            and key != "Lp" and key != "Ln":
-                        if reactant_compounds[compound_index] \
-                                in reactants_on_dict:
-                            prev_on = reactants_on_dict[
-                                reactant_compounds[compound_index]
-                            ]
-
-                            on = smp.solve(x + prev_on - compound_charge)[0]
-
-                            reactant_oxidation_numbers[key] = on
-
-                        else:
-                            on = smp.solve(x - compound_charge)[0]
-
-                            reactant_oxidation_numbers[key] = on
-
-                elif value < 0:  # products
-                    compound_charge = -charges[
-                        product_compounds[
-                            compound_index - len(reactant_compounds)
-                        ]
-                    ]
-
-                    if key != "O" and key != "H" \
-                            and key != "Lp" and key != "Ln":
-                        if product_compounds[
-                            compound_index - len(reactant_compounds)
-                        ] in products_on_dict:
-                            prev_on = products_on_dict[
-                                product_compounds[
-                                    compound_index - len(reactant_compounds)
-                                ]
-                            ]
-
-                            on = smp.solve(x + prev_on - compound_charge)[0]
-
-                            product_oxidation_numbers[key] = on
-
-                        else:
-                            on = smp.solve(x - compound_charge)[0]
-
-                            product_oxidation_numbers[key] = on
+        for compounds, oxidation_numbers in (
+            (parsed.reactant_compounds, reactant_oxidation_numbers),
+            (parsed.product_compounds, product_oxidation_numbers)
+        ):
+            for compound in compounds:
+                oxidation_numbers.update(self._oxidation_numbers_of(
+                    compound, parsed.compounds[compound]
+                ))
 
         return (reactant_oxidation_numbers, product_oxidation_numbers)
 
-    def _balance_oxidation_numbers(self):
+    @timed("oxidation")
+    def _balance_oxidation_numbers(self, parsed, balanced_coefficients):
         """
-        The function takes the oxidation numbers of the reactants and products,
-        and then finds the difference between the oxidation numbers of each
-        element in the reactants and products.
-
-        The function then finds the product of all of the differences,
-        and then divides the product by each difference to find the
-        coefficient that needs to be multiplied by each compound to balance
-        the oxidation numbers.
-
-        The function then multiplies each compound by the coefficient that was
-        found, and then returns the balanced compounds.
+        The function balances the electrons given off and taken up by the
+        redox couples of the reaction, see redox_couples.py. The species
+        are linked on a graph of the reactants and products that share an
+        element other than H and O, or an H or O the oxidation state table
+        gives another state than the rule, so any number of couples, and
+        couples with several species like Cl2 -> Cl- + ClO3-, are balanced.
+        The arithmetic is exact, see exact().
 
         The function also updates the `balanced_coefficients` dictionary with
-        the coefficients that were found.
-
-        The function also returns the reactant compounds, product compounds,
-        unique elements, and all compounds.
-
-        :return: The return statement is returning the reactant_compounds,
-        product_compounds, unique_elements, and all_compounds.
+        the coefficients that were found. The result only depends on the
+        equation, so it is remembered until update() changes the equation.
+
+        :param parsed: The ParsedReaction of the equation
+        :param balanced_coefficients: The coefficients found so far in this
+        call, keyed by compound
+        :return: The reactant_compounds, product_compounds and the factor
+        each compound in parsed.all_compounds has been multiplied by.
+        :raises ValidationError: If the electrons cannot be balanced
         """
-        (reactant_compounds,
-         product_compounds,
-         unique_elements,
-         all_compounds) = self._parse()
-
-        (reactant_oxidation_numbers,
-         product_oxidation_numbers) = self._assign_oxidation_numbers()
-
-        on_differences = {}
-        for key, reactant_on in reactant_oxidation_numbers.items():
-            product_on = product_oxidation_numbers[key]
-
-            on_difference = reactant_on - product_on
-
-            on_differences[key] = on_difference
-
-        multiple = abs(smp.prod(on_differences.values()))
+        if self._oxidation_balance is not None \
+                and self._oxidation_balance[0] is parsed:
+            _, reactant_compounds, product_compounds, scales, found = \
+                self._oxidation_balance
+            balanced_coefficients.update(found)
+
+            return (
+                list(reactant_compounds),
+                list(product_compounds),
+                list(scales)
+            )
 
-        coefficients = {}
-        for key, value in on_differences.items():
-            coefficients[key] = abs(int(multiple) // int(value))
+        # imported here, as redox_couples imports this module
+        from redox_couples import balance_couples
 
-        for element, coeff in coefficients.items():
-            for compound in all_compounds:
-                if element in compound:
-                    compound.update(
-                        (k, v * coeff) for k, v in compound.items()
-                    )
+        reactant_compounds, product_compounds = parsed.sides
 
-            for compound in reactant_compounds:
-                if element in cp.parse_formula(compound):
-                    self.balanced_coefficients[compound] = coeff
+        totals = self._assign_oxidation_totals(parsed)
+        scales = balance_couples(
+            parsed.all_compounds,
+            len(reactant_compounds),
+            totals,
+            [
+                self._compound_oxidation_numbers[compound]
+                for compound in reactant_compounds + product_compounds
+            ]
+        )
 
-            for compound in product_compounds:
-                if element in cp.parse_formula(compound):
-                    self.balanced_coefficients[compound] = coeff
+        # H+, OH- and H2O written in the equation are left to the charge and
+        # water stages
+        for index, compound in enumerate(
+            reactant_compounds + product_compounds
+        ):
+            if compound in ADDED_SPECIES:
+                scales[index] = 0
+
+        found = dict(zip(reactant_compounds + product_compounds, scales))
+
+        balanced_coefficients.update(found)
+        self._oxidation_balance = (
+            parsed,
+            tuple(reactant_compounds),
+            tuple(product_compounds),
+            tuple(scales),
+            found
+        )
 
         return (
-            reactant_compounds,
-            product_compounds,
-            unique_elements,
-            all_compounds
+            list(reactant_compounds),
+            list(product_compounds),
+            scales
         )
 
+    def _add_species(
+        self,
+        compound,
+        amount,
+        to_reactants,
+        reactant_compounds,
+        product_compounds,
+        balanced_coefficients
+    ):
+        """
+        It adds H+, OH- or H2O to one side of the reaction. If the equation
+        already has the species on that side, its coefficient is increased
+        instead, so no species is written twice.
+
+        :param compound: "HLp1", "OHLn1" or "H2O"
+        :param amount: The exact coefficient to add
+        :param to_reactants: True to add it to the reactants, False to add
+        it to the products
+        :param reactant_compounds: A list of reactant compounds
+        :param product_compounds: A list of product compounds
+        :param balanced_coefficients: The coefficients found so far in this
+        call, keyed by compound
+        :raises ValidationError: If the equation has the species on the
+        other side only
+        """
+        if to_reactants:
+            compounds, others = reactant_compounds, product_compounds
+        else:
+            compounds, others = product_compounds, reactant_compounds
+
+        if compound in compounds:
+            balanced_coefficients[compound] = exact(
+                balanced_coefficients.get(compound, 0) + amount
+            )
+        elif compound in others:
+            side = "reactants" if to_reactants else "products"
+
+            raise ValidationError(
+                MISPLACED_SPECIES,
+                f"{compound} is needed among the {side}",
+                compound
+            )
+        else:
+            compounds.append(compound)
+            balanced_coefficients[compound] = exact(amount)
+
     def _balance_charge_if_acid(
         self,
         summed_charges,
         reactant_compounds,
-        product_compounds
+        product_compounds,
+        balanced_coefficients
     ):
         """
         If the reactants have a lower charge than the products,
@@ -365,19 +816,22 @@ class RedoxReaction:
         reactants and products
         :param reactant_compounds: A list of reactant compounds
         :param product_compounds: A list of product compounds
+        :param balanced_coefficients: The coefficients found so far in this
+        call, keyed by compound
         :return: The reactant_compounds and product_compounds lists are being
         returned.
         """
         reactants_charge, products_charge = summed_charges
 
-        if reactants_charge < products_charge:
-            reactant_compounds.append("HLp1")
-            self.balanced_coefficients["HLp1"] = \
-                int(products_charge - reactants_charge)
-        elif reactants_charge > products_charge:
-            product_compounds.append("HLp1")
-            self.balanced_coefficients["HLp1"] = \
-                int(reactants_charge - products_charge)
+        if reactants_charge != products_charge:
+            self._add_species(
+                "HLp1",
+                abs(products_charge - reactants_charge),
+                reactants_charge < products_charge,
+                reactant_compounds,
+                product_compounds,
+                balanced_coefficients
+            )
 
         return (reactant_compounds, product_compounds)
 
@@ -385,7 +839,8 @@ class RedoxReaction:
         self,
         summed_charges,
         reactant_compounds,
-        product_compounds
+        product_compounds,
+        balanced_coefficients
     ):
         """
         If the reactants have a lower charge than the products,
@@ -396,19 +851,22 @@ class RedoxReaction:
         reactants and products
         :param reactant_compounds: A list of reactant compounds
         :param product_compounds: A list of product compounds
+        :param balanced_coefficients: The coefficients found so far in this
+        call, keyed by compound
         :return: The reactant_compounds and product_compounds lists are being
         returned.
         """
         reactants_charge, products_charge = summed_charges
 
-        if reactants_charge < products_charge:
-            product_compounds.append("OHLn1")
-            self.balanced_coefficients["OHLn1"] = \
-                int(products_charge - reactants_charge)
-        elif reactants_charge > products_charge:
-            reactant_compounds.append("OHLn1")
-            self.balanced_coefficients["OHLn1"] = \
-                int(reactants_charge - products_charge)
+        if reactants_charge != products_charge:
+            self._add_species(
+                "OHLn1",
+                abs(products_charge - reactants_charge),
+                reactants_charge > products_charge,
+                reactant_compounds,
+                product_compounds,
+                balanced_coefficients
+            )
 
         return (reactant_compounds, product_compounds)
 
@@ -416,7 +874,8 @@ class RedoxReaction:
         self,
         summed_charges,
         reactant_compounds,
-        product_compounds
+        product_compounds,
+        balanced_coefficients
     ):
         """
         If the reactants have a net charge of less than the products, add a
@@ -427,285 +886,377 @@ class RedoxReaction:
         reactants and products
         :param reactant_compounds: A list of the reactant compounds
         :param product_compounds: A list of the product compounds
+        :param balanced_coefficients: The coefficients found so far in this
+        call, keyed by compound
         :return: The reactant_compounds and product_compounds lists are being
         returned.
         """
         reactants_charge, products_charge = summed_charges
 
-        if reactants_charge < products_charge:
-            product_compounds.append("OHLn1")
-            self.balanced_coefficients["OHLn1"] = \
-                int(products_charge - reactants_charge)
-        elif reactants_charge > products_charge:
-            product_compounds.append("HLp1")
-            self.balanced_coefficients["HLp1"] = \
-                int(reactants_charge - products_charge)
+        if reactants_charge != products_charge:
+            self._add_species(
+                "OHLn1" if reactants_charge < products_charge else "HLp1",
+                abs(products_charge - reactants_charge),
+                False,
+                reactant_compounds,
+                product_compounds,
+                balanced_coefficients
+            )
 
         return (reactant_compounds, product_compounds)
 
-    def _balance_charge(self):
+    def _balance_charge_if_written(
+        self,
+        summed_charges,
+        reactant_compounds,
+        product_compounds,
+        balanced_coefficients
+    ):
+        """
+        If the equation has H+ or OH- on the side that balances the charge,
+        e.g. "Mg + HLp1 -> MgLp2 + H2", its coefficient is increased
+        whatever the pH
+
+        :param summed_charges: A tuple of the summed charges of the
+        reactants and products
+        :param reactant_compounds: A list of the reactant compounds
+        :param product_compounds: A list of the product compounds
+        :param balanced_coefficients: The coefficients found so far in this
+        call, keyed by compound
+        :return: True if the charge was balanced
+        """
+        reactants_charge, products_charge = summed_charges
+        difference = products_charge - reactants_charge
+
+        # H+ raises the charge of its side and OH- lowers it
+        for compound, to_reactants in (
+            ("HLp1", difference > 0),
+            ("OHLn1", difference < 0)
+        ):
+            written = reactant_compounds if to_reactants \
+                else product_compounds
+
+            if compound in written:
+                self._add_species(
+                    compound,
+                    abs(difference),
+                    to_reactants,
+                    reactant_compounds,
+                    product_compounds,
+                    balanced_coefficients
+                )
+
+                return True
+
+        return False
+
+    @timed("charge")
+    def _balance_charge(self, parsed, balanced_coefficients):
         """
         Balance the equation based on whether the solution is an acid, a base,
         or neutral
 
-        :return: The reactant_compounds, product_compounds, unique_elements,
-        and all_compounds are being returned.
+        :param parsed: The ParsedReaction of the equation
+        :param balanced_coefficients: The coefficients found so far in this
+        call, keyed by compound
+        :return: The reactant_compounds, product_compounds and scales are
+        being returned.
+        :raises ValidationError: If the equation has H+ or OH- on a side
+        the charge cannot be balanced with
         """
         (reactant_compounds,
          product_compounds,
-         unique_elements,
-         all_compounds) = self._balance_oxidation_numbers()
-
-        charges = self._get_charges(
-            reactant_compounds,
-            product_compounds,
-            all_compounds
+         scales) = self._balance_oxidation_numbers(
+            parsed,
+            balanced_coefficients
         )
 
-        reactants_charge = 0
-        products_charge = 0
-        for compound in reactant_compounds:
-            if compound in charges:
-                reactants_charge += charges[compound]
-
-        for compound in product_compounds:
-            if compound in charges:
-                products_charge += -charges[compound]
+        summed_charges = self._get_charges(parsed, scales)
 
-        summed_charges = (reactants_charge, products_charge)
-
-        if self.ph == "a":  # acid
-            result = self._balance_charge_if_acid(
+        if summed_charges[0] == summed_charges[1]:
+            pass
+        elif self._balance_charge_if_written(
+            summed_charges,
+            reactant_compounds,
+            product_compounds,
+            balanced_coefficients
+        ):
+            pass
+        elif self.ph == "a":  # acid
+            self._balance_charge_if_acid(
                 summed_charges,
                 reactant_compounds,
-                product_compounds
+                product_compounds,
+                balanced_coefficients
             )
         elif self.ph == "b":  # base
-            result = self._balance_charge_if_base(
+            self._balance_charge_if_base(
                 summed_charges,
                 reactant_compounds,
-                product_compounds
+                product_compounds,
+                balanced_coefficients
             )
         elif self.ph == "n":  # neutral
-            result = self._balance_charge_if_neutral(
+            self._balance_charge_if_neutral(
                 summed_charges,
                 reactant_compounds,
-                product_compounds
+                product_compounds,
+                balanced_coefficients
             )
 
-        reactant_compounds, product_compounds = result
-
         return (
             reactant_compounds,
             product_compounds,
-            unique_elements,
-            all_compounds
+            scales
         )
 
-    def _balance_water(self):
+    @timed("water")
+    def _balance_water(self, parsed, balanced_coefficients):
         """
         If there is a net oxygen count greater than 0, add water to the
         products. If there is a net oxygen count less than 0, add water to the
-        reactants
-
-        :return: the reactant_compounds, product_compounds, unique_elements,
-        and all_compounds are being returned.
+        reactants. The O of the OH- added by _balance_charge() is counted,
+        and the H then balances by itself, as the electrons, the charge and
+        every other element already do.
+
+        :param parsed: The ParsedReaction of the equation
+        :param balanced_coefficients: The coefficients found so far in this
+        call, keyed by compound
+        :return: the reactant_compounds, product_compounds and scales are
+        being returned.
+        :raises ValidationError: If the equation has H+, OH- or H2O on a
+        side the reaction does not need it on
         """
         (reactant_compounds,
          product_compounds,
-         unique_elements,
-         all_compounds) = self._balance_charge()
+         scales) = self._balance_charge(
+            parsed,
+            balanced_coefficients
+        )
 
         oxygen_count = 0
-        for compound in all_compounds:
-            for element, count in compound.items():
-                if element == "O":
-                    oxygen_count += count
-
-        if oxygen_count > 0:
-            product_compounds.append("H2O")
-            self.balanced_coefficients["H2O"] = int(abs(oxygen_count))
-        elif oxygen_count < 0:
-            reactant_compounds.append("H2O")
-            self.balanced_coefficients["H2O"] = int(abs(oxygen_count))
+        for compound_index, compound in enumerate(parsed.all_compounds):
+            count = compound.get("O", 0) * scales[compound_index]
+
+            if compound_index < len(parsed.reactant_compounds):
+                oxygen_count += count
+            else:
+                oxygen_count -= count
+
+        hydroxide = balanced_coefficients.get("OHLn1", 0)
+        if "OHLn1" in reactant_compounds:
+            oxygen_count += hydroxide
+        elif "OHLn1" in product_compounds:
+            oxygen_count -= hydroxide
+
+        if oxygen_count:
+            self._add_species(
+                "H2O",
+                abs(oxygen_count),
+                oxygen_count < 0,
+                reactant_compounds,
+                product_compounds,
+                balanced_coefficients
+            )
+
+        for compound in ADDED_SPECIES:
+            if balanced_coefficients.get(compound, 1) == 0:
+                raise ValidationError(
+                    MISPLACED_SPECIES,
+                    f"{compound} is not needed to balance the reaction",
+                    compound
+                )
 
         return (
             reactant_compounds,
             product_compounds,
-            unique_elements,
-            all_compounds
+            scales
         )
 
-    def balance(self):
+    @timed("validate")
+    def validate(self, engine="oxidation"):
+        """
+        The function checks the pH and the parsed equation before anything
+        is solved, see validation.py: every engine needs known elements and
+        every element other than H and O on both sides, and the "oxidation"
+        engine an element that changes oxidation number. The checks do not
+        balance anything, so what only shows while balancing, like redox
+        couples whose electrons cannot be balanced, is raised by
+        balance_coefficients() instead.
+
+        :param engine: The engine the equation is checked for, see
+        balance_coefficients()
+        :raises ValidationError: If the equation cannot be balanced, with
+        the reason in its code, INVALID_FORMULA if a formula cannot be
+        parsed
+        """
+        try:
+            parsed = self._parse()
+
+            if self._validated == (parsed, self.ph, engine):
+                return
+
+            check_ph(self.ph)
+            check_parsed(parsed)
+
+            if engine == "oxidation":
+                totals = self._assign_oxidation_totals(parsed)
+                check_oxidation_change(parsed, [
+                    self._compound_oxidation_numbers[compound]
+                    for compound in
+                    parsed.reactant_compounds + parsed.product_compounds
+                ], totals)
+        except (ValidationError, FormulaError) as e:
+            if instrumentation.recorders:
+                instrumentation.count("reactions_rejected")
+
+            if isinstance(e, FormulaError):
+                raise ValidationError(
+                    INVALID_FORMULA, str(e), e.formula
+                ) from e
+            raise
+
+        self._validated = (parsed, self.ph, engine)
+
+    def balance_coefficients(self, engine="oxidation"):
         """
-        The function takes the reactants and products of the reaction, and then
-        creates a list of strings that represent the balanced equation.
+        The function balances the reaction and returns the coefficient of
+        every compound, including the H+, OH- and H2O that were added.
+
+        The engine only decides how the coefficients are found; every
+        engine validates the equation first and returns the coefficients
+        in the same form.
+
+        The call fills the caches of the reaction: _parsed, _validated,
+        _compound_oxidation_numbers, _compound_totals and
+        _oxidation_balance. Each cached value only depends on the equation,
+        and _validated also on the pH and the engine, so threads that
+        balance the same reaction at once store equal values and get the
+        same results, see benchmarks/stress_threads.py. update() must not
+        run at the same time. update() keeps the caches that are still
+        valid, so after a new pH only the charge and the water are
+        balanced again; benchmarks/bench_incremental.py times the edits.
+
+        :param engine: "oxidation" balances the changes in oxidation number
+        as described at the top of this module. "matrix" solves the
+        composition matrix of the reaction, see linear_balance.py. "half"
+        adds the balanced half-reactions, see half_reactions.py.
+        :return: A BalancedReaction
+        :raises ValidationError: If the equation cannot be balanced, see
+        validate() and validation.py for the codes of every engine
+        """
+        if engine not in ENGINES:
+            raise ValueError(
+                f"Unknown engine {engine!r}, expected one of {ENGINES}"
+            )
 
-        :return: A string of the balanced equation.
+        self.validate(engine)
+
+        try:
+            return self._balance_with(engine)
+        except ValidationError:
+            if instrumentation.recorders:
+                instrumentation.count("reactions_rejected")
+            raise
+
+    def _balance_with(self, engine):
+        """
+        :param engine: The engine, see balance_coefficients()
+        :return: A BalancedReaction
+        :raises ValidationError: If the engine cannot balance the equation
         """
+        parsed = self._parse()
+
+        if engine == "matrix":
+            from linear_balance import balance_matrix
+
+            return balance_matrix(parsed, self.ph)
+
+        if engine == "half":
+            from half_reactions import balance_half_reactions
+
+            return balance_half_reactions(parsed, self.ph)
+
+        balanced_coefficients = {}
+
         (reactant_compounds,
          product_compounds,
-         _,
-         _) = self._balance_water()
+         _) = self._balance_water(parsed, balanced_coefficients)
+
+        # the coefficients are exact, so dividing by their greatest common
+        # divisor gives the smallest whole numbers
+        coefficients = normalize([
+            balanced_coefficients.get(compound, 1)
+            for compound in reactant_compounds + product_compounds
+        ])
+
+        return BalancedReaction(
+            tuple(zip(reactant_compounds, coefficients)),
+            tuple(zip(
+                product_compounds, coefficients[len(reactant_compounds):]
+            ))
+        )
 
-        balanced_equation_list = ["$ "]
+    def half_reactions(self):
+        """
+        The function splits the reaction into its oxidation and reduction
+        half-reactions, balanced for the pH with the electrons shown.
 
-        for reactant in reactant_compounds:
-            if reactant in self.balanced_coefficients \
-                    and self.balanced_coefficients[reactant] != 1:
-                balanced_equation_list.append(
-                    f"{self.balanced_coefficients[reactant]}"
-                )
+        :return: A tuple of HalfReactions, see half_reactions.py
+        """
+        from half_reactions import half_reactions
 
-            split_reactant = cp.parse_formula(reactant)
-            for element, count in split_reactant.items():
-                if element == "Lp":
-                    if count != 1:
-                        balanced_equation_list.append(
-                            fr"^{{{int(count)}+}}"
-                        )
-                    else:
-                        balanced_equation_list.append(r"^+")
-
-                elif element == "Ln":
-                    if count != 1:
-                        balanced_equation_list.append(
-                            fr"^{int(count)}"
-                        )
-                    else:
-                        balanced_equation_list.append(r"^-")
-
-                else:
-                    balanced_equation_list.append(f"{element}")
-
-                    if count != 1:
-                        balanced_equation_list.append(
-                            fr"_{int(count)}"
-                        )
-
-            balanced_equation_list.append("+")
-
-        balanced_equation_list.pop()
-
-        balanced_equation_list.append(r" \rightarrow ")
-
-        for product in product_compounds:
-            if product in self.balanced_coefficients \
-                    and self.balanced_coefficients[product] != 1:
-                balanced_equation_list.append(
-                    f"{self.balanced_coefficients[product]}"
-                )
+        return half_reactions(self._parse(), self.ph)
 
-            split_product = cp.parse_formula(product)
-            for element, count in split_product.items():
-                if element == "Lp":
-                    if count != 1:
-                        balanced_equation_list.append(
-                            fr"^{{{int(count)}+}}"
-                        )
-                    else:
-                        balanced_equation_list.append(r"^+")
+    def balance_result(self, engine="oxidation"):
+        """
+        The function balances the reaction and returns a structured result
+        with the coefficients, charges and oxidation numbers, which can be
+        rendered as text, LaTeX, HTML or JSON, see reaction_result.py.
 
-                elif element == "Ln":
-                    if count != 1:
-                        balanced_equation_list.append(
-                            fr"^{{{int(count)}-}}"
-                        )
-                    else:
-                        balanced_equation_list.append(r"^-")
+        :param engine: The engine used to balance the reaction, see
+        balance_coefficients()
+        :return: A ReactionResult
+        """
+        from reaction_result import build_result
 
-                else:
-                    balanced_equation_list.append(f"{element}")
+        return build_result(self, engine)
 
-                    if count != 1:
-                        balanced_equation_list.append(
-                            fr"_{int(count)}"
-                        )
+    def balance(self, engine="oxidation"):
+        """
+        The function balances the reaction and formats it as LaTeX.
 
-            balanced_equation_list.append("+")
+        :param engine: The engine used to balance the reaction, see
+        balance_coefficients()
+        :return: A string of the balanced equation.
+        """
+        return self.format_balanced_equation(
+            self.balance_coefficients(engine)
+        )
 
-        balanced_equation_list.pop()
+    @timed("latex")
+    def format_balanced_equation(self, result):
+        """
+        The function renders the balanced equation as LaTeX, e.g.
+        "$ 5Fe^{2+}+MnO_{4}^-+8H^+ \\rightarrow 5Fe^{3+}+Mn^{2+}+4H_{2}O $"
 
-        balanced_equation_list.append(" $")
+        :param result: The BalancedReaction returned by
+        balance_coefficients()
+        :return: A string of the balanced equation.
+        """
+        return latex_renderer.equation(result.reactants, result.products)
 
-        balanced_equation = "".join(balanced_equation_list)
+    @timed("latex")
+    def format_unbalanced_equation(self):
+        """
+        The function creates a string that represents the equation as it was
+        entered, before it has been balanced.
 
-        return balanced_equation
+        :return: A string of the unbalanced equation.
+        """
+        reactant_compounds, product_compounds = self._parse().sides
 
-    def format_unbalanced_equation(self):
-        (reactant_compounds,
-         product_compounds,
-         _,
-         _) = self._parse()
-
-        unbalanced_equation_list = ["$ "]
-
-        for reactant in reactant_compounds:
-            split_reactant = cp.parse_formula(reactant)
-            for element, count in split_reactant.items():
-                if element == "Lp":
-                    if count != 1:
-                        unbalanced_equation_list.append(
-                            fr"^{{{int(count)}+}}"
-                        )
-                    else:
-                        unbalanced_equation_list.append(r"^+")
-
-                elif element == "Ln":
-                    if count != 1:
-                        unbalanced_equation_list.append(
-                            fr"^{{{int(count)}-}}"
-                        )
-                    else:
-                        unbalanced_equation_list.append(r"^-")
-
-                else:
-                    unbalanced_equation_list.append(f"{element}")
-
-                    if count != 1:
-                        unbalanced_equation_list.append(
-                            fr"_{int(count)}"
-                        )
-
-            unbalanced_equation_list.append("+")
-
-        unbalanced_equation_list.pop()
-
-        unbalanced_equation_list.append(r" \rightarrow ")
-
-        for product in product_compounds:
-            split_product = cp.parse_formula(product)
-            for element, count in split_product.items():
-                if element == "Lp":
-                    if count != 1:
-                        unbalanced_equation_list.append(
-                            fr"^{{{int(count)}+}}"
-                        )
-                    else:
-                        unbalanced_equation_list.append(r"^+")
-
-                elif element == "Ln":
-                    if count != 1:
-                        unbalanced_equation_list.append(
-                            fr"^{{{int(count)}-}}"
-                        )
-                    else:
-                        unbalanced_equation_list.append(r"^-")
-
-                else:
-                    unbalanced_equation_list.append(f"{element}")
-
-                    if count != 1:
-                        unbalanced_equation_list.append(
-                            fr"_{int(count)}"
-                        )
-
-            unbalanced_equation_list.append("+")
-
-        unbalanced_equation_list.pop()
-
-        unbalanced_equation_list.append(" $")
-
-        unbalanced_equation = "".join(unbalanced_equation_list)
-
-        return unbalanced_equation
+        return latex_renderer.equation(
+            [(compound, 1) for compound in reactant_compounds],
+            [(compound, 1) for compound in product_compounds]
+        )
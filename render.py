@@ -0,0 +1,148 @@
+"""
+Render formulas and equations as LaTeX or HTML.
+
+How every part of a formula is written is looked up in a table, so LaTeX
+and HTML share one renderer. Every distinct formula is rendered once and
+its fragment is cached; an equation is then assembled by joining the cached
+fragments with their coefficients.
+
+Example:
+
+    from render import latex_renderer
+
+    latex_renderer.equation([("FeLp2", 5), ("MnO4Ln1", 1)], [("FeLp3", 5)])
+    # '$ 5Fe^{2+}+MnO_{4}^- \\rightarrow 5Fe^{3+} $'
+"""
+
+from decimal import Decimal
+from fractions import Fraction
+import functools
+
+from compound import Compound
+
+# the number of rendered formulas kept by every renderer
+FRAGMENT_CACHE_SIZE = 4096
+
+
+def _latex_count(count):
+    """
+    :param count: The count of an element or the charge, e.g. 2 or 0.5
+    :return: The exact count in LaTeX, e.g. "2" or "\\tfrac{1}{2}"
+    """
+    if count == int(count):
+        return str(int(count))
+
+    fraction = Fraction(repr(count))
+
+    return rf"\tfrac{{{fraction.numerator}}}{{{fraction.denominator}}}"
+
+
+def _decimal_count(count):
+    """
+    :param count: The count of an element or the charge, e.g. 2 or 0.5
+    :return: The exact count in decimal notation, e.g. "2" or "0.5"
+    """
+    if count == int(count):
+        return str(int(count))
+
+    return format(Decimal(repr(count)), "f")
+
+
+# Every part of a formula is a pair of templates: one for a count of 1 and
+# one for any other count. "count" formats the count that is filled into the
+# templates and "coefficient" formats the coefficient of a compound.
+LATEX = {
+    "element": ("{element}", "{element}_{{{count}}}"),
+    "Lp": ("^+", "^{{{count}+}}"),
+    "Ln": ("^-", "^{{{count}-}}"),
+    "count": _latex_count,
+    "coefficient": str,
+    "plus": "+",
+    "arrow": r" \rightarrow ",
+    "begin": "$ ",
+    "end": " $",
+}
+
+HTML = {
+    "element": ("{element}", "{element}<sub>{count}</sub>"),
+    "Lp": ("<sup>+</sup>", "<sup>{count}+</sup>"),
+    "Ln": ("<sup>&minus;</sup>", "<sup>{count}&minus;</sup>"),
+    "count": _decimal_count,
+    "coefficient": "{} ".format,
+    "plus": " + ",
+    "arrow": " &rarr; ",
+    "begin": "",
+    "end": "",
+}
+
+
+class Renderer:
+    """
+    Renders formulas and equations with a table like LATEX or HTML.
+    """
+
+    def __init__(self, table, cache_size=FRAGMENT_CACHE_SIZE):
+        """
+        :param table: The templates of every part of a formula
+        :param cache_size: The number of rendered formulas that are kept
+        """
+        self.table = table
+        self.fragment = functools.lru_cache(maxsize=cache_size)(
+            self._render_formula
+        )
+
+    def _render_formula(self, formula):
+        """
+        :param formula: The formula of a compound, e.g. "MnO4Ln1"
+        :return: The rendered formula, e.g. "MnO_{4}^-"
+        """
+        table = self.table
+        format_count = table["count"]
+
+        parts = []
+        for element, count in Compound.from_formula(formula).items():
+            once, many = table[element] if element == "Lp" \
+                or element == "Ln" else table["element"]
+
+            if count == 1:
+                parts.append(once.format(element=element))
+            else:
+                parts.append(
+                    many.format(element=element, count=format_count(count))
+                )
+
+        return "".join(parts)
+
+    def side(self, compounds):
+        """
+        :param compounds: (formula, coefficient) pairs
+        :return: The rendered compounds joined by plus signs
+        """
+        fragment = self.fragment
+        format_coefficient = self.table["coefficient"]
+
+        return self.table["plus"].join([
+            fragment(formula) if coefficient == 1
+            else format_coefficient(coefficient) + fragment(formula)
+            for formula, coefficient in compounds
+        ])
+
+    def equation(self, reactants, products):
+        """
+        :param reactants: (formula, coefficient) pairs of the reactants
+        :param products: (formula, coefficient) pairs of the products
+        :return: The rendered equation
+        """
+        table = self.table
+
+        return (
+            table["begin"]
+            + self.side(reactants)
+            + table["arrow"]
+            + self.side(products)
+            + table["end"]
+        )
+
+
+latex_renderer = Renderer(LATEX)
+html_renderer = Renderer(HTML)
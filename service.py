@@ -0,0 +1,520 @@
+"""
+Serve balancing over HTTP.
+
+An asyncio server that balances reactions in a pool of worker processes, so
+the event loop only parses requests and writes responses. Concurrent
+requests for the same reaction and pH share one computation, and requests
+wait in a bounded queue; when the queue is full the server answers
+503 Service Unavailable instead of piling up work.
+
+Endpoints, all answering JSON:
+
+    GET  /health
+    GET  /balance?equation=...&ph=a
+    POST /balance        {"equation": "...", "ph": "a"}
+    POST /balance/batch  {"items": [{"equation": "...", "ph": "a"}, ...]}
+
+Every balanced reaction is returned as
+{"equation": ..., "ph": ..., "balanced": ..., "error": ...} like the jsonl
+output of cli.py.
+
+Run with `python service.py --port 8080 --workers 4`.
+"""
+
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+import json
+import os
+import signal
+from urllib.parse import parse_qs, urlsplit
+
+from batch import BatchResult, balance_chunk, warm_worker
+from cache import canonical_equation
+from redox_reaction import ENGINES, SOLVERS
+
+PH_VALUES = ("a", "b", "n")
+
+# the largest request body and batch that are accepted
+MAX_BODY = 8 * 1024 * 1024
+MAX_BATCH = 10_000
+
+
+class ServiceOverloaded(RuntimeError):
+    """
+    Raised when the request queue has no room for more reactions.
+    """
+
+
+class RequestError(ValueError):
+    """
+    Raised for a request the service cannot answer, with the HTTP status
+    to answer it with.
+    """
+
+    def __init__(self, message, status=HTTPStatus.BAD_REQUEST):
+        super().__init__(message)
+        self.status = status
+
+
+def result_to_json(result):
+    """
+    :param result: A BatchResult
+    :return: A dictionary that can be serialized as JSON
+    """
+    return {
+        "equation": result.equation,
+        "ph": result.ph,
+        "balanced": None if result.result is None else result.result.to_text(),
+        "error": result.error,
+    }
+
+
+class BalancingService:
+    """
+    Balances reactions in a worker pool behind a bounded queue and coalesces
+    identical requests that are in flight at the same time.
+
+    Every method must be called from the event loop the service was started
+    in.
+    """
+
+    def __init__(self, workers=None, max_pending=1024, chunksize=64,
+                 solver="fraction", engine="oxidation"):
+        """
+        :param workers: The number of worker processes, defaults to the
+        number of CPUs. 0 balances in a single thread of this process.
+        :param max_pending: The number of distinct reactions that may wait
+        in the queue before requests are rejected
+        :param chunksize: The largest number of queued reactions sent to a
+        worker at a time
+        :param solver: The solver passed to RedoxReaction
+        :param engine: The engine passed to balance_coefficients()
+        """
+        if max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        if chunksize < 1:
+            raise ValueError("chunksize must be at least 1")
+        if solver not in SOLVERS:
+            raise ValueError(
+                f"Unknown solver {solver!r}, expected one of {SOLVERS}"
+            )
+        if engine not in ENGINES:
+            raise ValueError(
+                f"Unknown engine {engine!r}, expected one of {ENGINES}"
+            )
+
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending
+        self.chunksize = chunksize
+        self.solver = solver
+        self.engine = engine
+
+        self.coalesced = 0
+        self.rejected = 0
+
+        self._executor = None
+        self._queue = None
+        self._dispatchers = []
+        self._in_flight = {}  # (canonical equation, ph) -> asyncio.Future
+
+    async def start(self):
+        """
+        It starts the worker pool and waits until every worker is warm
+        """
+        loop = asyncio.get_running_loop()
+
+        if self.workers == 0:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+            dispatchers = 1
+        else:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=warm_worker
+            )
+            # a second chunk per worker is sent while the first one's
+            # results travel back, so the workers never wait for the loop
+            dispatchers = 2 * self.workers
+
+        await asyncio.gather(*(
+            loop.run_in_executor(
+                self._executor, balance_chunk, [], self.solver, self.engine
+            )
+            for _ in range(max(self.workers, 1))
+        ))
+
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._dispatchers = [
+            asyncio.create_task(self._dispatch()) for _ in range(dispatchers)
+        ]
+
+    async def close(self):
+        """
+        It stops the dispatchers and shuts the worker pool down
+        """
+        for task in self._dispatchers:
+            task.cancel()
+
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        self._dispatchers = []
+
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @property
+    def pending(self):
+        """
+        :return: The number of distinct reactions that are queued or being
+        balanced
+        """
+        return len(self._in_flight)
+
+    async def _dispatch(self):
+        """
+        It takes reactions off the queue in chunks and balances every chunk
+        in the worker pool
+        """
+        loop = asyncio.get_running_loop()
+
+        while True:
+            jobs = [await self._queue.get()]
+            while len(jobs) < self.chunksize and not self._queue.empty():
+                jobs.append(self._queue.get_nowait())
+
+            try:
+                results = await loop.run_in_executor(
+                    self._executor,
+                    balance_chunk,
+                    [key for key, _ in jobs],
+                    self.solver,
+                    self.engine
+                )
+            except asyncio.CancelledError:
+                for _, future in jobs:
+                    future.cancel()
+                raise
+            except Exception as e:
+                for _, future in jobs:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future), result in zip(jobs, results):
+                    if not future.done():
+                        future.set_result(result)
+
+    def _key(self, equation, ph):
+        """
+        :return: The key that identical requests share
+        """
+        if not isinstance(equation, str) or ph not in PH_VALUES:
+            raise RequestError(
+                f"Expected an equation and a ph in {PH_VALUES}"
+            )
+
+        try:
+            return (canonical_equation(equation), ph)
+        except ValueError:
+            # the worker reports why the equation cannot be balanced
+            return (equation, ph)
+
+    def _futures(self, keys):
+        """
+        It returns the future of every key, queueing the keys that are not
+        in flight yet. Either every new key is queued or none is.
+
+        :param keys: A list of (canonical equation, ph) keys
+        :return: A list of futures in the same order as the keys
+        :raises RequestError: If there are more new keys than max_pending
+        :raises ServiceOverloaded: If the queue has no room for them now
+        """
+        new = {key for key in keys if key not in self._in_flight}
+
+        # a retry could never fit, so this is not an overload
+        if len(new) > self.max_pending:
+            raise RequestError(
+                f"A batch holds at most {self.max_pending} distinct "
+                "reactions",
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+            )
+
+        if len(new) > self._queue.maxsize - self._queue.qsize():
+            self.rejected += 1
+            raise ServiceOverloaded(
+                f"The queue has no room for {len(new)} more reactions"
+            )
+
+        self.coalesced += len(keys) - len(new)
+
+        loop = asyncio.get_running_loop()
+        for key in new:
+            future = loop.create_future()
+            future.add_done_callback(
+                lambda _, key=key: self._in_flight.pop(key, None)
+            )
+            self._in_flight[key] = future
+            self._queue.put_nowait((key, future))
+
+        return [self._in_flight[key] for key in keys]
+
+    async def balance(self, equation, ph):
+        """
+        :param equation: The unbalanced equation
+        :param ph: The pH of the solution ("a", "b" or "n")
+        :return: A BatchResult
+        """
+        key = self._key(equation, ph)
+        future, = self._futures([key])
+
+        # a client that disconnects must not cancel the shared computation
+        result = await asyncio.shield(future)
+
+        return result._replace(equation=equation)
+
+    async def balance_batch(self, items):
+        """
+        An item without an equation or with an unknown pH gets an error
+        on its BatchResult instead of failing the batch.
+
+        :param items: A list of (equation, ph) pairs
+        :return: A list of BatchResults in the same order as the items
+        """
+        if len(items) > MAX_BATCH:
+            raise RequestError(
+                f"A batch holds at most {MAX_BATCH} reactions",
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+            )
+
+        results = [None] * len(items)
+        keys = {}  # index in items -> key
+        for index, (equation, ph) in enumerate(items):
+            try:
+                keys[index] = self._key(equation, ph)
+            except RequestError as e:
+                results[index] = BatchResult(
+                    equation, ph, None, f"{type(e).__name__}: {e}"
+                )
+
+        futures = self._futures(list(keys.values()))
+        balanced = await asyncio.shield(asyncio.gather(*futures))
+
+        for index, result in zip(keys, balanced):
+            results[index] = result._replace(equation=items[index][0])
+
+        return results
+
+    async def handle(self, method, target, body):
+        """
+        It answers one HTTP request
+
+        :param method: The HTTP method, e.g. "POST"
+        :param target: The request target, e.g. "/balance?ph=a"
+        :param body: The request body as bytes
+        :return: A tuple of the HTTPStatus and the JSON response
+        """
+        url = urlsplit(target)
+        routes = {
+            "/health": ("GET",),
+            "/balance": ("GET", "POST"),
+            "/balance/batch": ("POST",),
+        }
+
+        if url.path not in routes:
+            return HTTPStatus.NOT_FOUND, {"error": "Not found"}
+        if method not in routes[url.path]:
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Wrong method"}
+
+        if url.path == "/health":
+            return HTTPStatus.OK, {
+                "status": "ok",
+                "pending": self.pending,
+                "coalesced": self.coalesced,
+                "rejected": self.rejected,
+            }
+
+        try:
+            if method == "GET":
+                query = parse_qs(url.query)
+                request = {
+                    name: values[0] for name, values in query.items()
+                }
+            else:
+                request = json.loads(body or b"null")
+
+            if url.path == "/balance":
+                if not isinstance(request, dict):
+                    raise RequestError("Expected a JSON object")
+
+                result = await self.balance(
+                    request.get("equation"), request.get("ph", "a")
+                )
+                return HTTPStatus.OK, result_to_json(result)
+
+            items = request.get("items") if isinstance(request, dict) \
+                else request
+            if not isinstance(items, list) \
+                    or not all(isinstance(i, dict) for i in items):
+                raise RequestError("Expected a list of JSON objects")
+
+            results = await self.balance_batch(
+                [(i.get("equation"), i.get("ph", "a")) for i in items]
+            )
+            return HTTPStatus.OK, {
+                "results": [result_to_json(r) for r in results]
+            }
+
+        except json.JSONDecodeError as e:
+            return HTTPStatus.BAD_REQUEST, {"error": f"Invalid JSON: {e}"}
+        except RequestError as e:
+            return e.status, {"error": str(e)}
+        except ServiceOverloaded as e:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(e)}
+        except Exception as e:
+            # e.g. a BrokenProcessPool, the connection must still get an
+            # answer
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {
+                "error": f"{type(e).__name__}: {e}"
+            }
+
+    async def handle_connection(self, reader, writer):
+        """
+        It answers the HTTP/1.1 requests of one connection until the client
+        closes it
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+
+                try:
+                    method, target, version = \
+                        request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(
+                        writer, HTTPStatus.BAD_REQUEST,
+                        {"error": "Malformed request line"}, False
+                    )
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = version == "HTTP/1.1" \
+                    and headers.get("connection", "").lower() != "close"
+
+                try:
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    length = -1
+
+                if not 0 <= length <= MAX_BODY:
+                    await self._respond(
+                        writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                        {"error": f"The body must be 0 to {MAX_BODY} bytes"},
+                        False
+                    )
+                    break
+
+                body = await reader.readexactly(length)
+                status, response = await self.handle(method, target, body)
+                await self._respond(writer, status, response, keep_alive)
+
+                if not keep_alive:
+                    break
+
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, response, keep_alive):
+        body = json.dumps(response, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        )
+        if status == HTTPStatus.SERVICE_UNAVAILABLE:
+            head += "Retry-After: 1\r\n"
+
+        writer.write(head.encode("latin-1") + b"\r\n" + body)
+        await writer.drain()
+
+
+async def serve(host="127.0.0.1", port=8080, **options):
+    """
+    It runs the service until it is cancelled or receives SIGTERM
+
+    :param host: The address to listen on
+    :param port: The port to listen on
+    :param options: The options passed to BalancingService
+    """
+    # stop cleanly on SIGTERM too, so the worker processes are shut down
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except NotImplementedError:  # Windows
+        pass
+
+    async with BalancingService(**options) as service:
+        server = await asyncio.start_server(
+            service.handle_connection, host, port
+        )
+        async with server:
+            try:
+                await server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve redox reaction balancing over HTTP."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="the number of worker processes, 0 balances in a thread"
+    )
+    parser.add_argument("--max-pending", type=int, default=1024)
+    parser.add_argument("--chunksize", type=int, default=64)
+    parser.add_argument("--solver", choices=SOLVERS, default="fraction")
+    parser.add_argument("--engine", choices=ENGINES, default="oxidation")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(
+            args.host,
+            args.port,
+            workers=args.workers,
+            max_pending=args.max_pending,
+            chunksize=args.chunksize,
+            solver=args.solver,
+            engine=args.engine
+        ))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Cheap checks that reject an equation right after it has been parsed.
+
+A malformed or non-redox equation used to fail deep inside the balancing,
+e.g. with a KeyError for an element that is missing from the products. The
+checks here only look at the pH and the parsed formulas, so they take a
+fraction of the time of a balance, and raise a ValidationError with one of
+the codes below. What only shows while balancing, like the redox couples of
+the "oxidation" engine, see redox_couples.py, or a matrix without a unique
+solution, raises a ValidationError with a code too, so batch jobs can skip
+bad rows by their code either way.
+
+Example:
+
+    from validation import validate_equation
+
+    error = validate_equation("Fe + O2 -> H2O")
+    if error is not None:
+        print(error.code, error.subject)  # one_sided_element Fe
+"""
+
+from fractions import Fraction
+
+from compound import is_known_element
+
+# the pH is not "a", "b" or "n"
+INVALID_PH = "invalid_ph"
+
+# the equation has no "->"
+MISSING_ARROW = "missing_arrow"
+
+# the equation has more than one "->"
+MULTIPLE_ARROWS = "multiple_arrows"
+
+# a formula does not follow the grammar of formula.py
+INVALID_FORMULA = "invalid_formula"
+
+# a formula has a symbol that is not in the periodic table
+UNKNOWN_ELEMENT = "unknown_element"
+
+# an element other than H and O is only on one side, and H+, OH- and H2O
+# cannot balance it
+ONE_SIDED_ELEMENT = "one_sided_element"
+
+# no element changes oxidation number, so the reaction is not a redox
+# reaction for the "oxidation" engine
+NO_OXIDATION_CHANGE = "no_oxidation_change"
+
+# the elements of a redox couple cannot be balanced with a unique set of
+# positive coefficients, see redox_couples.py
+UNBALANCED_COUPLE = "unbalanced_couple"
+
+# the reaction has an oxidation without a reduction or the other way
+# around, so the "oxidation" engine cannot balance its electrons
+UNPAIRED_ELECTRONS = "unpaired_electrons"
+
+# the equation has H+, OH- or H2O on a side the "oxidation" engine does not
+# need it on, e.g. H2O among the reactants when it is formed, or the
+# half-reactions of the "half" engine cancel out a written species
+MISPLACED_SPECIES = "misplaced_species"
+
+# the composition matrix of the "matrix" engine has no unique positive
+# solution, see linear_balance.py
+NO_UNIQUE_SOLUTION = "no_unique_solution"
+
+# a half-reaction of the "half" engine cannot be balanced or transfers no
+# electrons, see half_reactions.py
+UNBALANCED_HALF_REACTION = "unbalanced_half_reaction"
+
+# the pH values, acid, base and neutral
+PH_VALUES = ("a", "b", "n")
+
+CODES = (
+    INVALID_PH,
+    MISSING_ARROW,
+    MULTIPLE_ARROWS,
+    INVALID_FORMULA,
+    UNKNOWN_ELEMENT,
+    ONE_SIDED_ELEMENT,
+    NO_OXIDATION_CHANGE,
+    UNBALANCED_COUPLE,
+    UNPAIRED_ELECTRONS,
+    MISPLACED_SPECIES,
+    NO_UNIQUE_SOLUTION,
+    UNBALANCED_HALF_REACTION,
+)
+
+
+class ValidationError(ValueError):
+    """
+    The equation cannot be balanced. code is one of CODES and subject is
+    the element or formula the error is about, or None.
+    """
+
+    def __init__(self, code, message, subject=None):
+        self.code = code
+        self.message = message
+        self.subject = subject
+
+        super().__init__(f"{code}: {message}")
+
+
+def check_ph(ph):
+    """
+    :param ph: The pH of the solution
+    :raises ValidationError: If it is not one of PH_VALUES
+    """
+    if ph not in PH_VALUES:
+        raise ValidationError(
+            INVALID_PH, f"Unknown pH {ph!r}, expected 'a', 'b' or 'n'"
+        )
+
+
+def split_equation(unbalanced_equation):
+    """
+    It splits an equation at its arrow
+
+    :param unbalanced_equation: The unbalanced equation
+    :return: A tuple of the reactant and the product side
+    :raises ValidationError: If there is not exactly one "->"
+    """
+    sides = unbalanced_equation.split("->")
+
+    if len(sides) == 1:
+        raise ValidationError(
+            MISSING_ARROW, "The equation has no '->' between its sides"
+        )
+
+    if len(sides) > 2:
+        raise ValidationError(
+            MULTIPLE_ARROWS, f"The equation has {len(sides) - 1} '->'"
+        )
+
+    return sides
+
+
+def check_parsed(parsed):
+    """
+    It checks that every symbol is an element and that every element other
+    than H and O is on both sides
+
+    :param parsed: The ParsedReaction of the equation
+    :raises ValidationError: If a check fails
+    """
+    compounds = parsed.compounds
+
+    reactant_elements = set()
+    for compound in parsed.reactant_compounds:
+        reactant_elements.update(compounds[compound].elements)
+
+    product_elements = set()
+    for compound in parsed.product_compounds:
+        product_elements.update(compounds[compound].elements)
+
+    for element in parsed.unique_elements:
+        if not is_known_element(element):
+            raise ValidationError(
+                UNKNOWN_ELEMENT, f"{element} is not an element", element
+            )
+
+        if element == "H" or element == "O":
+            continue
+
+        if element not in product_elements:
+            raise ValidationError(
+                ONE_SIDED_ELEMENT,
+                f"{element} is only among the reactants",
+                element
+            )
+
+        if element not in reactant_elements:
+            raise ValidationError(
+                ONE_SIDED_ELEMENT,
+                f"{element} is only among the products",
+                element
+            )
+
+
+def check_oxidation_change(parsed, oxidation_numbers, totals):
+    """
+    It checks that an element changes oxidation number, for the "oxidation"
+    engine. Every element gets its state per atom from the compounds where
+    it is the only element with an oxidation number. When each element has
+    one state and every other compound's total is the sum of those states,
+    e.g. Ag+ + Cl- -> AgCl, no couple can give off electrons. A compound
+    with H or O at another state than the rule, or an element without a
+    state of its own, is left to the balancing.
+
+    :param parsed: The ParsedReaction of the equation
+    :param oxidation_numbers: The oxidation numbers of every compound, in
+    the order of parsed.all_compounds, see redox_couples.find_components()
+    :param totals: The summed oxidation number of every compound, in the
+    same order, see RedoxReaction._assign_oxidation_totals()
+    :raises ValidationError: If no element changes oxidation number
+    """
+    states = {}
+    mixed = []
+    for compound, numbers, total in zip(
+        parsed.all_compounds, oxidation_numbers, totals
+    ):
+        if "H" in numbers or "O" in numbers:
+            return
+
+        if len(numbers) == 1:
+            element, = numbers
+            count = compound[element]
+            if type(total) is int and type(count) is int \
+                    and total % count == 0:
+                state = total // count
+            else:
+                state = Fraction(total) / Fraction(count)
+
+            if states.setdefault(element, state) != state:
+                return
+        elif numbers:
+            mixed.append((compound, numbers, total))
+
+    for compound, numbers, total in mixed:
+        if any(element not in states for element in numbers) \
+                or total != sum(
+                    compound[element] * states[element]
+                    for element in numbers
+                ):
+            return
+
+    raise ValidationError(
+        NO_OXIDATION_CHANGE, "No element changes oxidation number"
+    )
+
+
+def validate_equation(unbalanced_equation, ph="a", engine="oxidation",
+                      solver="fraction"):
+    """
+    It parses and validates an equation without balancing it. Only the
+    pH, the parsed formulas and, for the "oxidation" engine, the change in
+    oxidation numbers are checked, see RedoxReaction.validate(), so an
+    equation that passes may still be rejected while it is balanced.
+
+    :param unbalanced_equation: The unbalanced equation
+    :param ph: The pH of the solution ("a", "b" or "n")
+    :param engine: The engine the equation is validated for, see
+    RedoxReaction.validate()
+    :param solver: The solver passed to RedoxReaction
+    :return: A ValidationError, or None if the equation passed every check
+    """
+    from redox_reaction import RedoxReaction
+
+    try:
+        RedoxReaction(unbalanced_equation, ph, solver).validate(engine)
+    except ValidationError as e:
+        return e
+
+    return None
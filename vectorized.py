@@ -0,0 +1,412 @@
+"""
+Balance many reactions at once with NumPy.
+
+The reactions are parsed and packed into padded arrays indexed as
+(reaction, compound, element), with the charge as an extra element column.
+The charges, the oxygen counts, the oxidation numbers, the coefficients and
+the added H+, OH- and H2O of the "oxidation" engine are then computed with
+whole-array operations instead of per-compound Python loops.
+
+The results are identical to RedoxReaction.balance_coefficients(). The
+arrays handle reactions whose redox couples, see redox_couples.py, are each
+one reactant and one product with a single element other than H and O. The
+other reactions, and those the arrays cannot represent exactly, e.g.
+fractional counts, coefficients that would overflow 64-bit integers,
+reactions that fail to balance or species whose oxidation numbers come from
+the oxidation state table, are balanced by RedoxReaction instead.
+
+Example:
+
+    from vectorized import balance_vectorized
+
+    results = balance_vectorized([
+        ("FeLp2 + MnO4Ln1 -> FeLp3 + MnLp2", "a"),
+        ("Cu + NO3Ln1 -> CuLp2 + NO", "b"),
+    ])
+"""
+
+import numpy as np
+
+from batch import BatchResult, balance_one
+from oxidation_states import default_table
+from redox_reaction import ADDED_SPECIES, BalancedReaction, ParsedReaction
+from validation import check_parsed
+
+# coefficients are only computed in the arrays when the product of the
+# electrons of the couples stays well inside the range of int64
+_MAX_MULTIPLE = 2 ** 53
+
+
+def _parse_all(items, parsed_items=None):
+    """
+    It parses every distinct equation once and picks the reactions the
+    arrays can represent
+
+    :param items: A list of (equation, ph) pairs
+    :param parsed_items: An optional list of the ParsedReaction of every
+    item, None for the items that are parsed from their equation
+    :return: A tuple of the indices and ParsedReactions of the reactions
+    that can be balanced in the arrays
+    """
+    indices = []
+    parsed_list = []
+
+    # equations that cannot be balanced in the arrays map to None
+    parsed_equations = {}
+
+    for index, (equation, ph) in enumerate(items):
+        if ph not in ("a", "b", "n"):
+            continue
+
+        if equation not in parsed_equations:
+            parsed = parsed_items[index] if parsed_items is not None \
+                else None
+
+            try:
+                if parsed is None:
+                    parsed = ParsedReaction(equation)
+
+                check_parsed(parsed)
+            except Exception:
+                parsed = None
+            else:
+                if any(
+                    formula in ADDED_SPECIES or not compound.integral
+                    or default_table.differs_from_rule(formula)
+                    for formula, compound in parsed.compounds.items()
+                ):
+                    parsed = None
+
+            parsed_equations[equation] = parsed
+
+        if parsed_equations[equation] is not None:
+            indices.append(index)
+            parsed_list.append(parsed_equations[equation])
+
+    return (indices, parsed_list)
+
+
+def pack(parsed_list):
+    """
+    It packs the reactions into padded arrays. Every distinct formula is
+    converted to a row of counts once and the rows are then gathered into
+    the reactions with fancy indexing.
+
+    :param parsed_list: A list of ParsedReactions
+    :return: A tuple of
+        - elements: a list of the element symbols of the element columns
+        - counts: an int64 array of shape (reactions, compounds,
+          elements + 1) with the count of every element in every compound
+          and the charge of the compound in the last column
+        - present: a bool array of shape (reactions, compounds, elements)
+          that is True where the element is part of the formula
+        - side: an int8 array of shape (reactions, compounds) that is 1 for
+          reactants, -1 for products and 0 for padding
+    """
+    elements = {}
+    formulas = {}
+    for parsed in parsed_list:
+        for element in parsed.unique_elements:
+            elements.setdefault(element, len(elements))
+
+        for formula, compound in parsed.compounds.items():
+            formulas.setdefault(formula, compound)
+
+    reaction_count = len(parsed_list)
+    compound_count = max(
+        (
+            len(parsed.reactant_compounds) + len(parsed.product_compounds)
+            for parsed in parsed_list
+        ),
+        default=0
+    )
+    element_count = len(elements)
+
+    # one row per distinct formula and a last row of zeros for padding
+    formula_index = {
+        compound: index for index, compound in enumerate(formulas)
+    }
+    formula_counts = np.zeros(
+        (len(formulas) + 1, element_count + 1),
+        dtype=np.int64
+    )
+    formula_present = np.zeros(
+        (len(formulas) + 1, element_count),
+        dtype=bool
+    )
+    for index, compound in enumerate(formulas.values()):
+        for element, value in zip(compound.elements, compound.counts):
+            formula_counts[index, elements[element]] = value
+            formula_present[index, elements[element]] = True
+
+        formula_counts[index, -1] = compound.charge
+
+    compound_formulas = np.full(
+        (reaction_count, compound_count),
+        len(formulas),
+        dtype=np.int64
+    )
+    side = np.zeros((reaction_count, compound_count), dtype=np.int8)
+
+    for reaction_index, parsed in enumerate(parsed_list):
+        reactant_count = len(parsed.reactant_compounds)
+        compounds = parsed.reactant_compounds + parsed.product_compounds
+
+        compound_formulas[reaction_index, :len(compounds)] = [
+            formula_index[compound] for compound in compounds
+        ]
+        side[reaction_index, :reactant_count] = 1
+        side[reaction_index, reactant_count:len(compounds)] = -1
+
+    return (
+        list(elements),
+        formula_counts[compound_formulas],
+        formula_present[compound_formulas],
+        side
+    )
+
+
+def _last_compound(mask):
+    """
+    :param mask: A bool array of shape (reactions, compounds, elements)
+    :return: An array of shape (reactions, elements) with the index of the
+    last compound where mask is True, or -1
+    """
+    compound_indices = np.arange(mask.shape[1]).reshape(1, -1, 1)
+
+    return np.where(mask, compound_indices, -1).max(axis=1, initial=-1)
+
+
+def balance_arrays(elements, counts, present, side, ph):
+    """
+    It runs the "oxidation" engine on packed reactions
+
+    :param elements: The element symbols of the element columns
+    :param counts: The counts array returned by pack()
+    :param present: The present array returned by pack()
+    :param side: The side array returned by pack()
+    :param ph: An array of shape (reactions,) of "a", "b" or "n"
+    :return: A tuple of
+        - ok: a bool array of shape (reactions,) that is False for the
+          reactions the arrays could not balance exactly
+        - shown: an int64 array of shape (reactions, compounds) with the
+          coefficient of every compound
+        - ion: an int64 array of shape (reactions,) with the coefficient of
+          the added H+ or OH-, positive on the reactant side
+        - hydroxide: a bool array of shape (reactions,) that is True where
+          the added ion is OH- and False where it is H+
+        - water: an int64 array of shape (reactions,) with the coefficient
+          of the added H2O, positive on the reactant side
+    """
+    charge = counts[:, :, -1]
+
+    hydrogen = counts[:, :, elements.index("H")] if "H" in elements \
+        else np.zeros_like(charge)
+    oxygen = counts[:, :, elements.index("O")] if "O" in elements \
+        else np.zeros_like(charge)
+
+    # the summed oxidation number of the elements that are not H or O
+    total = charge - (hydrogen - 2 * oxygen)
+
+    assignable = present.copy()
+    for element in ("H", "O"):
+        if element in elements:
+            assignable[:, :, elements.index(element)] = False
+
+    reactant_mask = assignable & (side == 1)[:, :, None]
+    product_mask = assignable & (side == -1)[:, :, None]
+
+    # every couple must be one reactant and one product with one element
+    # that is not H or O
+    ok = (assignable.sum(axis=2) <= 1).all(axis=1)
+    ok &= (reactant_mask.sum(axis=1) <= 1).all(axis=1)
+    ok &= (product_mask.sum(axis=1) <= 1).all(axis=1)
+
+    reactant = _last_compound(reactant_mask)
+    product = _last_compound(product_mask)
+    couple = reactant >= 0
+    ok &= (couple == (product >= 0)).all(axis=1)
+
+    reactant = np.maximum(reactant, 0)
+    product = np.maximum(product, 0)
+
+    # the coefficients that conserve the element of each couple
+    element_counts = counts[:, :, :-1]
+    reactant_atoms = np.take_along_axis(
+        element_counts, reactant[:, None, :], axis=1
+    )[:, 0, :]
+    product_atoms = np.take_along_axis(
+        element_counts, product[:, None, :], axis=1
+    )[:, 0, :]
+
+    divisor = np.maximum(np.gcd(reactant_atoms, product_atoms), 1)
+    reactant_coefficient = np.where(couple, product_atoms // divisor, 1)
+    product_coefficient = np.where(couple, reactant_atoms // divisor, 1)
+
+    # the electrons each couple gives off, negative when it takes them up
+    electrons = np.where(
+        couple,
+        product_coefficient * np.take_along_axis(total, product, axis=1)
+        - reactant_coefficient * np.take_along_axis(total, reactant, axis=1),
+        0
+    )
+
+    oxidations = (electrons > 0).sum(axis=1)
+    reductions = (electrons < 0).sum(axis=1)
+    ok &= (oxidations > 0) & (reductions > 0)
+
+    magnitude = np.prod(
+        np.maximum(np.abs(electrons), 1).astype(np.float64), axis=1
+    ) * np.maximum(oxidations, reductions) * np.maximum(
+        reactant_coefficient, product_coefficient
+    ).max(axis=1, initial=1)
+    ok &= magnitude < _MAX_MULTIPLE
+
+    electrons = np.where(ok[:, None], electrons, 0)
+    multiple = np.lcm.reduce(np.maximum(np.abs(electrons), 1), axis=1)
+
+    # the couples that give off electrons give off the multiple times the
+    # number of couples that take them up, and the other way around
+    scale = np.where(
+        electrons > 0,
+        multiple[:, None] * reductions[:, None]
+        // np.maximum(electrons, 1),
+        np.where(
+            electrons < 0,
+            multiple[:, None] * oxidations[:, None]
+            // np.maximum(-electrons, 1),
+            1
+        )
+    )
+
+    # every compound gets the coefficient of the couple of its element
+    column = assignable.argmax(axis=2)
+    linked = assignable.any(axis=2)
+    coefficient = np.where(
+        side == 1,
+        np.take_along_axis(scale * reactant_coefficient, column, axis=1),
+        np.take_along_axis(scale * product_coefficient, column, axis=1)
+    )
+    scales = np.where(linked, coefficient, 1)
+
+    reactants_charge = (charge * scales * (side == 1)).sum(axis=1)
+    products_charge = (charge * scales * (side == -1)).sum(axis=1)
+    charge_difference = products_charge - reactants_charge
+
+    # acid: H+ on the side with the lower charge
+    # base: OH- on the side with the higher charge
+    # neutral: OH- or H+ on the product side
+    ion = np.select(
+        [ph == "a", ph == "b"],
+        [charge_difference, -charge_difference],
+        -np.abs(charge_difference)
+    )
+    hydroxide = (ph == "b") | ((ph == "n") & (charge_difference > 0))
+
+    # the O of the added OH- is balanced with the rest
+    water = -(oxygen * scales * side).sum(axis=1) \
+        - np.where(hydroxide, ion, 0)
+
+    # divide every coefficient by their greatest common divisor, ignoring
+    # the padding
+    divisor = np.gcd.reduce(
+        np.concatenate(
+            [np.where(side != 0, scales, 0), ion[:, None], water[:, None]],
+            axis=1
+        ),
+        axis=1
+    )
+    divisor = np.maximum(divisor, 1)
+
+    shown = scales // divisor[:, None]
+    ion = ion // divisor
+    water = water // divisor
+
+    return (ok, shown, ion, hydroxide, water)
+
+
+def _result(parsed, shown, ion, hydroxide, water):
+    """
+    It builds the BalancedReaction of one reaction from its row of the
+    arrays
+
+    :param parsed: The ParsedReaction of the equation
+    :param shown: The coefficients of the compounds
+    :param ion: The coefficient of the added H+ or OH-, positive on the
+    reactant side
+    :param hydroxide: True if the added ion is OH-, False if it is H+
+    :param water: The coefficient of the added H2O, positive on the
+    reactant side
+    :return: A BalancedReaction
+    """
+    reactant_count = len(parsed.reactant_compounds)
+
+    reactants = [
+        (compound, int(shown[index]))
+        for index, compound in enumerate(parsed.reactant_compounds)
+    ]
+    products = [
+        (compound, int(shown[reactant_count + index]))
+        for index, compound in enumerate(parsed.product_compounds)
+    ]
+
+    species = "OHLn1" if hydroxide else "HLp1"
+    if ion > 0:
+        reactants.append((species, int(ion)))
+    elif ion < 0:
+        products.append((species, int(-ion)))
+
+    if water > 0:
+        reactants.append(("H2O", int(water)))
+    elif water < 0:
+        products.append(("H2O", int(-water)))
+
+    return BalancedReaction(tuple(reactants), tuple(products))
+
+
+def balance_vectorized(items, parsed_items=None):
+    """
+    It balances the reactions with the "oxidation" engine, computing all of
+    them at once in NumPy arrays
+
+    :param items: An iterable of (equation, ph) pairs
+    :param parsed_items: An optional list of the ParsedReaction of every
+    item, e.g. from a compiled corpus, None for the items that are parsed
+    from their equation
+    :return: A list of BatchResults in input order
+    """
+    items = list(items)
+    results = [None] * len(items)
+
+    indices, parsed_list = _parse_all(items, parsed_items)
+
+    if parsed_list:
+        elements, counts, present, side = pack(parsed_list)
+        ph = np.array([items[index][1] for index in indices])
+
+        ok, shown, ion, hydroxide, water = balance_arrays(
+            elements, counts, present, side, ph
+        )
+
+        for row, (index, parsed) in enumerate(zip(indices, parsed_list)):
+            if ok[row]:
+                equation, reaction_ph = items[index]
+                results[index] = BatchResult(
+                    equation,
+                    reaction_ph,
+                    _result(
+                        parsed,
+                        shown[row],
+                        ion[row],
+                        hydroxide[row],
+                        water[row]
+                    ),
+                    None
+                )
+
+    # the reactions the arrays could not balance exactly
+    for index, (equation, ph) in enumerate(items):
+        if results[index] is None:
+            results[index] = balance_one(equation, ph)
+
+    return results